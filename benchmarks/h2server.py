@@ -0,0 +1,138 @@
+# coding: utf-8
+"""Cleartext HTTP/2 (prior knowledge) front end for a fake YOURLS server.
+
+Requires the ``h2`` package, which is installed with ``yourls[http2]``.
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+import h2.settings
+from six.moves.urllib.parse import parse_qsl, urlsplit
+
+
+class H2Server(object):
+    """Serve requests for `fake` (a :class:`~yourls.fake.FakeYOURLS`) over
+    HTTP/2. Streams are handled concurrently by a thread pool.
+    """
+    def __init__(self, fake, host='127.0.0.1', port=0, workers=256):
+        self.fake = fake
+        self.connections = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(128)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._thread = None
+
+    @property
+    def apiurl(self):
+        host, port = self._sock.getsockname()[:2]
+        return 'http://{}:{}/yourls-api.php'.format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._sock.close()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except (OSError, socket.error):
+                return
+            self.connections += 1
+            thread = threading.Thread(target=self._serve, args=(sock,))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        config = h2.config.H2Configuration(client_side=False, header_encoding='utf-8')
+        conn = h2.connection.H2Connection(config=config)
+        conn.local_settings = h2.settings.Settings(
+            client=False,
+            initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 1000})
+        # Used for all connection state changes and socket writes.
+        cond = threading.Condition()
+        requests = {}
+
+        with cond:
+            conn.initiate_connection()
+            sock.sendall(conn.data_to_send())
+
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    return
+                with cond:
+                    events = conn.receive_data(data)
+                    for event in events:
+                        if isinstance(event, h2.events.RequestReceived):
+                            requests[event.stream_id] = (dict(event.headers), [])
+                        elif isinstance(event, h2.events.DataReceived):
+                            requests[event.stream_id][1].append(event.data)
+                            conn.acknowledge_received_data(
+                                event.flow_controlled_length, event.stream_id)
+                        elif isinstance(event, h2.events.StreamEnded):
+                            headers, body = requests.pop(event.stream_id)
+                            self._executor.submit(
+                                self._respond, sock, conn, cond, event.stream_id,
+                                headers, b''.join(body))
+                        elif isinstance(event, h2.events.WindowUpdated):
+                            cond.notify_all()
+                        elif isinstance(event, h2.events.ConnectionTerminated):
+                            return
+                    sock.sendall(conn.data_to_send())
+        except (OSError, socket.error, h2.exceptions.ProtocolError):
+            return
+        finally:
+            sock.close()
+
+    def _respond(self, sock, conn, cond, stream_id, headers, body):
+        params = dict(parse_qsl(urlsplit(headers[':path']).query))
+        if body:
+            params.update(parse_qsl(body.decode('utf-8')))
+
+        status, data = self.fake.handle(params)
+        data = json.dumps(data).encode('utf-8')
+
+        try:
+            with cond:
+                conn.send_headers(stream_id, [
+                    (':status', str(status)),
+                    ('content-type', 'application/json'),
+                    ('content-length', str(len(data))),
+                ])
+                while data:
+                    window = conn.local_flow_control_window(stream_id)
+                    if window < 1:
+                        sock.sendall(conn.data_to_send())
+                        cond.wait()
+                        continue
+                    size = min(window, len(data), conn.max_outbound_frame_size)
+                    conn.send_data(stream_id, data[:size])
+                    data = data[size:]
+                conn.end_stream(stream_id)
+                sock.sendall(conn.data_to_send())
+        except (OSError, socket.error, h2.exceptions.StreamClosedError):
+            pass
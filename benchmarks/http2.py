@@ -0,0 +1,71 @@
+# coding: utf-8
+"""Compare concurrent expand throughput and connection count of pooled
+HTTP/1.1 (requests) and multiplexed HTTP/2 (httpx).
+
+Usage: python benchmarks/http2.py [--requests N] [--concurrency N] [--latency S]
+
+Requires ``pip install yourls[http2]``.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import os
+import sys
+from timeit import default_timer
+
+from h2server import H2Server
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from yourls import YOURLSClient  # noqa: E402
+from yourls.batch import imap_ordered  # noqa: E402
+from yourls.fake import FakeYOURLS  # noqa: E402
+from yourls.transport import HTTPXTransport  # noqa: E402
+
+
+def run(client, fake, args):
+    def expand(i):
+        return client.expand(fake.keyword(i % 1000))
+
+    start = default_timer()
+    for _ in imap_ordered(expand, range(args.requests), workers=args.concurrency):
+        pass
+    return args.requests / (default_timer() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=200,
+                        help='Number of threads making requests.')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Server latency per request, in seconds.')
+    args = parser.parse_args()
+
+    import httpx
+    from requests.adapters import HTTPAdapter
+
+    fake = FakeYOURLS(links=1000, latency=args.latency)
+
+    with fake:
+        client = fake.client()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.concurrency)
+        client.session.mount('http://', adapter)
+        ops = run(client, fake, args)
+        print('{:<22} {:>8.1f} requests/s {:>5} connections'.format(
+            'HTTP/1.1 (requests)', ops, fake.connections))
+
+    with H2Server(fake) as server:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        transport = HTTPXTransport(http1=False, http2=True, limits=limits)
+        client = YOURLSClient(server.apiurl, transport=transport)
+        ops = run(client, fake, args)
+        print('{:<22} {:>8.1f} requests/s {:>5} connections'.format(
+            'HTTP/2 (httpx)', ops, server.connections))
+        transport.close()
+
+
+if __name__ == '__main__':
+    main()
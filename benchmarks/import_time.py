@@ -0,0 +1,53 @@
+# coding: utf-8
+"""Measure how long it takes to import yourls and start the CLI.
+
+Usage: python benchmarks/import_time.py [--repeat N]
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import re
+import subprocess
+import sys
+import timeit
+
+STATEMENTS = [
+    'import yourls',
+    'import yourls.__main__',
+    'from yourls import YOURLSClient',
+]
+
+
+def import_time(statement):
+    """Return cumulative import time of `statement` in microseconds, as
+    reported by ``python -X importtime``.
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.STDOUT)
+    total = 0
+    for line in output.decode('utf-8').splitlines():
+        # Top level imports aren't indented.
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S.*)$', line)
+        if match and match.group(2).startswith(('yourls', 'click')):
+            total += int(match.group(1))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for statement in STATEMENTS:
+        best = min(import_time(statement) for _ in range(args.repeat))
+        print('{:<40} {:>8.1f} ms'.format(statement, best / 1000))
+
+    command = [sys.executable, '-m', 'yourls', '--help']
+    best = min(timeit.repeat(
+        lambda: subprocess.check_output(command), number=1, repeat=args.repeat))
+    print('{:<40} {:>8.1f} ms'.format('yourls --help (wall)', best * 1000))
+
+
+if __name__ == '__main__':
+    main()
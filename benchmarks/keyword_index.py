@@ -0,0 +1,56 @@
+# coding: utf-8
+"""Measure keyword index build time, file size, and lookup rate.
+
+Usage: python benchmarks/keyword_index.py [--links N] [--lookups N]
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from yourls.fake import _base36  # noqa: E402
+from yourls.snapshot import KeywordIndex, write_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--links', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'links.index')
+        links = (('{}'.format(_base36(i)),
+                  'http://example.com/{}?utm_source=newsletter'.format(i))
+                 for i in range(args.links))
+
+        start = default_timer()
+        write_index(path, links)
+        elapsed = default_timer() - start
+        print('build   {:>10.1f} links/s  {:>8.1f} bytes/link'.format(
+            args.links / elapsed, os.path.getsize(path) / args.links))
+
+        keywords = [_base36(random.randrange(args.links * 2))
+                    for _ in range(args.lookups)]
+        with KeywordIndex(path) as index:
+            start = default_timer()
+            found = sum(1 for keyword in keywords if index.get(keyword) is not None)
+            elapsed = default_timer() - start
+        print('lookup  {:>10.1f} keys/s   {:>8.1%} found'.format(
+            args.lookups / elapsed, found / args.lookups))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
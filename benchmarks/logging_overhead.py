@@ -0,0 +1,66 @@
+# coding: utf-8
+"""Measure the cost of debug logging when validating responses.
+
+Usage: python benchmarks/logging_overhead.py [--number N]
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import logbook  # noqa: E402
+import requests  # noqa: E402
+from yourls import log  # noqa: E402
+from yourls.data import _validate_yourls_response  # noqa: E402
+
+
+def make_response():
+    response = requests.Response()
+    response.status_code = 200
+    response.encoding = 'utf-8'
+    response._content = json.dumps({
+        'keyword': 'abcde', 'shorturl': 'http://example.com/abcde',
+        'longurl': 'http://example.com/' + 'x' * 200, 'message': 'success',
+        'statusCode': 200}).encode('utf-8')
+    return response
+
+
+def configure(scenario):
+    logger = log.logger
+    logger.disabled = scenario == 'disabled'
+    logger.level = logbook.INFO if scenario == 'level filtered' else logbook.NOTSET
+    log.set_debug_rate_limit(100 if scenario == 'rate limited' else None)
+
+
+SCENARIOS = ['disabled', 'level filtered', 'rate limited', 'enabled']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    response = make_response()
+    params = dict(action='expand', shorturl='abcde', format='json')
+
+    def validate():
+        _validate_yourls_response(response, params)
+
+    # Records are created and dispatched, but not written anywhere.
+    with logbook.NullHandler():
+        for scenario in SCENARIOS:
+            configure(scenario)
+            best = min(timeit.repeat(validate, number=args.number, repeat=5))
+            print('{:<16} {:>8.2f} us per response'.format(
+                scenario, best / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# coding: utf-8
+"""Compare shorten throughput of GET and POST requests for long URLs.
+
+Usage: python benchmarks/post.py [--requests N] [--workers N] [--lengths N,N,...]
+
+GET requests put the URL and authentication parameters in the request line.
+Many servers and proxies limit its length; the fake server rejects request
+lines over 64 KiB, which is reported as an error.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import os
+import sys
+from timeit import default_timer
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from requests.adapters import HTTPAdapter  # noqa: E402
+from yourls.batch import imap_ordered  # noqa: E402
+from yourls.fake import FakeYOURLS  # noqa: E402
+
+
+def run(fake, method, length, args):
+    post_actions = ['shorturl'] if method == 'POST' else []
+    client = fake.client(post_actions=post_actions)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.workers)
+    client.session.mount('http://', adapter)
+
+    prefix = 'http://example.org/{}/{}/?utm_content='.format(method, length)
+    padding = 'x' * max(0, length - len(prefix) - 8)
+
+    def shorten(i):
+        try:
+            client.shorten('{}{}{:08d}'.format(prefix, padding, i))
+        except Exception as exc:
+            return exc
+
+    start = default_timer()
+    results = list(imap_ordered(shorten, range(args.requests), workers=args.workers))
+    elapsed = default_timer() - start
+    errors = [result for result in results if result is not None]
+    client.transport.close()
+    return args.requests / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--lengths', default='100,2000,16000,80000',
+                        help='Comma separated long URL lengths.')
+    args = parser.parse_args()
+
+    print('{:>8} {:>16} {:>16}'.format('length', 'GET (req/s)', 'POST (req/s)'))
+    with FakeYOURLS(signature='6f344c2a8p') as fake:
+        for length in [int(n) for n in args.lengths.split(',')]:
+            columns = []
+            for method in ('GET', 'POST'):
+                ops, errors = run(fake, method, length, args)
+                if errors:
+                    columns.append('{} errors'.format(len(errors)))
+                else:
+                    columns.append('{:.1f}'.format(ops))
+            print('{:>8} {:>16} {:>16}'.format(length, *columns))
+
+
+if __name__ == '__main__':
+    main()
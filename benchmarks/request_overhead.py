@@ -0,0 +1,101 @@
+# coding: utf-8
+"""Measure the client CPU time per expand call, without network I/O.
+
+Usage: python benchmarks/request_overhead.py [--number N] [--repeat N]
+
+Responses are returned by a requests adapter that doesn't send anything, so
+the timings are the cost of building, sending, and validating each request.
+CPU time is measured, and the clients take turns so that they're affected
+equally by other load on the machine.
+
+``merged params`` merges the authentication parameters into each call's
+parameters and lets requests encode them. ``prepare per call`` encodes the
+query string but lets ``Session.request`` prepare each request.
+``request template`` is the current implementation, which reuses a prepared
+request.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+from functools import partial
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+from requests.adapters import BaseAdapter  # noqa: E402
+from yourls import YOURLSClient  # noqa: E402
+from yourls.core import _urlencode  # noqa: E402
+
+BODY = json.dumps({
+    'keyword': 'abcde', 'shorturl': 'http://example.com/abcde',
+    'longurl': 'http://example.com/', 'message': 'success',
+    'statusCode': 200}).encode('utf-8')
+
+
+class CannedAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response._content = BODY
+        return response
+
+    def close(self):
+        pass
+
+
+class MergedParamsClient(YOURLSClient):
+    def _send_http(self, params, stream=False):
+        params = params.copy()
+        params.update(self._data)
+        return self.transport.send('GET', self.apiurl, params=params, stream=stream)
+
+
+class PreparePerCallClient(YOURLSClient):
+    def _send_http(self, params, stream=False):
+        url = self.apiurl + '?' + _urlencode(params) + '&' + self._static_query
+        return self.transport.send('GET', url, stream=stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    timer = getattr(time, 'process_time', None) or time.clock
+    clients = [('merged params', MergedParamsClient),
+               ('prepare per call', PreparePerCallClient),
+               ('request template', YOURLSClient)]
+    timers = []
+    for name, cls in clients:
+        client = cls('http://example.com/yourls-api.php', signature='6f344c2a8p')
+        client.session.mount('http://', CannedAdapter())
+        # Don't read .netrc for every request.
+        client.session.trust_env = False
+        client.expand('abcde')
+        timers.append(timeit.Timer(partial(client.expand, 'abcde'), timer=timer))
+
+    times = [[] for _ in clients]
+    for _ in range(args.repeat):
+        for i, t in enumerate(timers):
+            times[i].append(t.timeit(args.number) / args.number * 1e6)
+
+    print('{:<18} {:>10} {:>10}'.format('', 'min µs', 'median µs'))
+    for (name, _), results in zip(clients, times):
+        results.sort()
+        print('{:<18} {:>10.2f} {:>10.2f}'.format(
+            name, results[0], results[len(results) // 2]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# coding: utf-8
+"""Benchmark the client against a local fake YOURLS server.
+
+Usage: python benchmarks/run.py [--output report.json] [--compare baseline.json]
+
+Reports can be compared across versions by checking out each version, running
+this script with ``--output``, and passing the older report to ``--compare``.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from timeit import default_timer
+
+import six
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yourls  # noqa: E402
+from yourls.batch import imap_ordered  # noqa: E402
+from yourls.export import iter_links  # noqa: E402
+from yourls.fake import FakeYOURLS  # noqa: E402
+from yourls.journal import shorten_all  # noqa: E402
+
+# Metrics where a higher value is better. Lower is better for the rest.
+HIGHER_IS_BETTER = ('ops_per_sec', 'links_per_sec')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def make_client(server, pool_size):
+    from requests.adapters import HTTPAdapter
+
+    client = server.client()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    client.session.mount('http://', adapter)
+    return client
+
+
+def bench_single_call(server, args):
+    """Sequential ``expand`` calls."""
+    client = make_client(server, 1)
+    durations = []
+    errors = 0
+    for i in range(args.requests):
+        start = default_timer()
+        try:
+            client.expand(server.keyword(i % args.links))
+        except Exception:
+            errors += 1
+        durations.append(default_timer() - start)
+
+    return dict(median_ms=percentile(durations, 0.5) * 1000,
+                p95_ms=percentile(durations, 0.95) * 1000,
+                errors=errors)
+
+
+def bench_bulk_shorten(server, args):
+    """Concurrent ``shorturl`` calls for new URLs."""
+    client = make_client(server, args.workers)
+    urls = ('http://example.org/bulk/{}/{}'.format(os.getpid(), i)
+            for i in range(args.requests))
+
+    start = default_timer()
+    entries = list(shorten_all(client, urls, workers=args.workers))
+    duration = default_timer() - start
+
+    errors = sum(1 for entry in entries if entry.status == 'error')
+    return dict(ops_per_sec=len(entries) / duration, errors=errors)
+
+
+def bench_bulk_expand(server, args):
+    """Concurrent ``expand`` calls."""
+    client = make_client(server, args.workers)
+
+    def expand(i):
+        try:
+            client.expand(server.keyword(i % args.links))
+        except Exception:
+            return False
+        return True
+
+    start = default_timer()
+    results = list(imap_ordered(expand, range(args.requests), workers=args.workers))
+    duration = default_timer() - start
+
+    return dict(ops_per_sec=len(results) / duration,
+                errors=results.count(False))
+
+
+def bench_stats_paging(server, args):
+    """Page through every link with streamed ``stats`` calls."""
+    client = make_client(server, 1)
+
+    start = default_timer()
+    count = sum(1 for _ in iter_links(client, page_size=args.page_size))
+    duration = default_timer() - start
+
+    return dict(links_per_sec=count / duration, links=count)
+
+
+def bench_cli_startup(server, args):
+    """Wall time of ``yourls --help`` in a new process."""
+    command = [sys.executable, '-m', 'yourls', '--help']
+    best = min(timeit.repeat(
+        lambda: subprocess.check_output(command, cwd=ROOT), number=1, repeat=5))
+    return dict(wall_ms=best * 1000)
+
+
+BENCHMARKS = [
+    ('single_call', bench_single_call),
+    ('bulk_shorten', bench_bulk_shorten),
+    ('bulk_expand', bench_bulk_expand),
+    ('stats_paging', bench_stats_paging),
+    ('cli_startup', bench_cli_startup),
+]
+
+
+def git_revision():
+    try:
+        output = subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+            stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('utf-8').strip()
+
+
+def compare(report, baseline):
+    """Print change of each metric relative to `baseline` report."""
+    print('\nCompared with {} ({}):'.format(
+        baseline.get('revision'), baseline.get('version')))
+    for name, metrics in sorted(report['results'].items()):
+        old_metrics = baseline['results'].get(name, {})
+        for key, new in sorted(metrics.items()):
+            old = old_metrics.get(key)
+            if not old or key in ('errors', 'links'):
+                continue
+            change = (new - old) / old * 100
+            better = change > 0 if key in HIGHER_IS_BETTER else change < 0
+            print('  {:<14} {:<14} {:>10.2f} -> {:>10.2f}  {:+7.1f}% {}'.format(
+                name, key, old, new, change, 'better' if better else 'worse'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--links', type=int, default=10000,
+                        help='Number of links in the fake database.')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Server latency per request, in seconds.')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='Fraction of shorten/expand requests that fail.')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='Requests per single call and bulk benchmark.')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help='Run only the named benchmark. May be repeated.')
+    parser.add_argument('--output', help='Write JSON report to this file.')
+    parser.add_argument('--compare', metavar='REPORT',
+                        help='Compare with an earlier JSON report.')
+    args = parser.parse_args()
+
+    config = dict(links=args.links, latency=args.latency,
+                  error_rate=args.error_rate, requests=args.requests,
+                  workers=args.workers, page_size=args.page_size)
+    report = dict(version=yourls.__version__, revision=git_revision(),
+                  python=platform.python_version(), config=config, results={})
+
+    # Paging isn't retried, so only inject errors where they're counted.
+    server = FakeYOURLS(links=args.links, latency=args.latency,
+                        error_rate=args.error_rate,
+                        error_actions=('shorturl', 'expand'))
+    with server:
+        for name, bench in BENCHMARKS:
+            if args.only and name not in args.only:
+                continue
+            results = report['results'][name] = bench(server, args)
+            print('{:<14} {}'.format(name, '  '.join(
+                '{}={:.2f}'.format(key, value)
+                for key, value in sorted(results.items()))))
+
+    if args.output:
+        with io.open(args.output, 'w', encoding='utf-8') as f:
+            f.write(six.text_type(json.dumps(report, indent=2, sort_keys=True)))
+
+    if args.compare:
+        with io.open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# coding: utf-8
+"""Measure expand throughput of one client shared by increasing numbers of
+threads, with a shared connection pool or per-thread sessions.
+
+Usage: python benchmarks/threads.py [--requests N] [--threads N,N,...] [--latency S]
+
+With server latency, throughput should grow in proportion to the number of
+threads until the server or the GIL is saturated. The ``in-process`` rows use
+a fake transport without latency or HTTP, so they show the cost of the client
+itself, including any lock contention, as threads are added.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import os
+import sys
+from timeit import default_timer
+
+# Benchmark the working tree rather than an installed version.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from yourls.batch import imap_ordered  # noqa: E402
+from yourls.fake import FakeYOURLS  # noqa: E402
+from yourls.transport import RequestsTransport  # noqa: E402
+
+
+def run(client, fake, threads, requests):
+    def expand(i):
+        return client.expand(fake.keyword(i % 1000))
+
+    start = default_timer()
+    for _ in imap_ordered(expand, range(requests), workers=threads):
+        pass
+    return requests / (default_timer() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--threads', default='1,8,32,64,128',
+                        help='Comma separated thread counts.')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='Server latency per request, in seconds.')
+    args = parser.parse_args()
+    thread_counts = [int(n) for n in args.threads.split(',')]
+
+    print('{:<14}'.format('') + ''.join(
+        '{:>12}'.format('{} threads'.format(n)) for n in thread_counts))
+
+    with FakeYOURLS(links=1000, latency=args.latency) as fake:
+        for name, options in [('shared pool', dict(pool_size=max(thread_counts))),
+                              ('per-thread', dict(per_thread=True))]:
+            row = []
+            for threads in thread_counts:
+                transport = RequestsTransport(**options)
+                client = fake.client(transport=transport)
+                # Fewer requests for one thread, which is slow with latency.
+                requests = min(args.requests, threads * 100)
+                row.append(run(client, fake, threads, requests))
+                transport.close()
+            print('{:<14}'.format(name) + ''.join('{:>12.1f}'.format(ops) for ops in row))
+
+    fake = FakeYOURLS(links=1000)
+    client = fake.client(transport=fake.transport())
+    client.enable_metrics()
+    row = [run(client, fake, threads, args.requests * 5) for threads in thread_counts]
+    print('{:<14}'.format('in-process') + ''.join('{:>12.1f}'.format(ops) for ops in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -56,6 +56,9 @@ extras_require['dev'] = [
     'responses',
 ]
 
+extras_require['http2'] = ['httpx[http2]']
+
+extras_require[':python_version<"3.2"'] = ['futures']
 extras_require['test:python_version<"3.3"'] = ['mock']
 extras_require['dev:python_version<"3.3"'] = ['mock']
 
@@ -102,6 +105,6 @@ setup(
     extras_require=extras_require,
     entry_points={
         'console_scripts': [
-            'yourls=yourls.__main__:cli'
+            'yourls=yourls.server:main'
         ]
     })
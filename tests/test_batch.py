@@ -0,0 +1,51 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import random
+import threading
+import time
+
+import pytest
+from yourls.batch import imap_ordered
+
+
+def test_imap_ordered():
+    def slow_square(x):
+        time.sleep(random.random() / 1000)
+        return x * x
+
+    assert list(imap_ordered(slow_square, range(100), workers=8)) == [
+        x * x for x in range(100)]
+    assert list(imap_ordered(slow_square, range(5), workers=1)) == [
+        0, 1, 4, 9, 16]
+
+
+def test_imap_ordered_window():
+    lock = threading.Lock()
+    state = dict(in_flight=0, max_in_flight=0)
+
+    def track(x):
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        time.sleep(0.001)
+        with lock:
+            state['in_flight'] -= 1
+        return x
+
+    assert list(imap_ordered(track, range(50), workers=4, window=4)) == list(range(50))
+    assert state['max_in_flight'] <= 4
+
+
+def test_imap_ordered_exception():
+    def fail_on_three(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    results = []
+    with pytest.raises(ValueError):
+        for result in imap_ordered(fail_on_three, range(10), workers=4):
+            results.append(result)
+
+    assert results == [0, 1, 2]
@@ -0,0 +1,198 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import threading
+from timeit import default_timer
+
+import pytest
+from yourls import DBStats, YOURLSHTTPError
+from yourls.cache import StaleWhileRevalidateCache
+from yourls.fake import FakeYOURLS
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_stale_while_revalidate():
+    clock = Clock()
+    cache = StaleWhileRevalidateCache(soft_ttl=5, hard_ttl=60, clock=clock)
+    values = iter(range(10))
+    fetch = lambda: next(values)  # noqa: E731
+
+    assert cache.get('a', fetch) == (0, False)
+    clock.now = 4
+    assert cache.get('a', fetch) == (0, True)
+
+    # Stale value is returned while it's refreshed.
+    clock.now = 5
+    assert cache.get('a', fetch) == (0, True)
+    cache.wait()
+    assert cache.get('a', fetch) == (1, True)
+
+    # Caller waits after the hard TTL.
+    clock.now = 65
+    assert cache.get('a', fetch) == (2, False)
+
+    cache.clear()
+    assert cache.get('a', fetch) == (3, False)
+    cache.close()
+
+    with pytest.raises(ValueError):
+        StaleWhileRevalidateCache(soft_ttl=10, hard_ttl=5)
+
+
+def test_refresh_errors():
+    clock = Clock()
+    cache = StaleWhileRevalidateCache(soft_ttl=5, hard_ttl=60, clock=clock)
+
+    def fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        cache.get('a', fail)
+
+    assert cache.get('a', lambda: 1) == (1, False)
+
+    # Failed refresh keeps the stale value.
+    clock.now = 10
+    assert cache.get('a', fail) == (1, True)
+    cache.wait()
+    assert cache.get('a', lambda: 2) == (1, True)
+    cache.wait()
+    assert cache.get('a', lambda: 3) == (2, True)
+
+    clock.now = 100
+    with pytest.raises(ValueError):
+        cache.get('a', fail)
+    cache.close()
+
+
+def test_concurrent_misses_share_fetch():
+    cache = StaleWhileRevalidateCache(soft_ttl=5, hard_ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(True)
+        started.set()
+        release.wait()
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('a', fetch)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [('value', False)] * 8
+
+
+def test_maxsize():
+    cache = StaleWhileRevalidateCache(soft_ttl=5, hard_ttl=60, maxsize=2)
+    cache.get('a', lambda: 1)
+    cache.get('b', lambda: 2)
+    cache.get('c', lambda: 3)
+    assert cache.get('a', lambda: 4) == (4, False)
+    assert cache.get('c', lambda: 5) == (3, True)
+
+
+def test_client_cache():
+    clock = Clock()
+    server = FakeYOURLS(links=10)
+    yourls = server.client(transport=server.transport())
+    cache = yourls.enable_cache(soft_ttl=5, hard_ttl=60, clock=clock)
+    assert yourls.enable_cache() is cache
+    metrics = yourls.enable_metrics()
+
+    assert yourls.db_stats() == DBStats(total_links=10, total_clicks=55)
+    yourls.shorten('http://google.com')
+    assert yourls.db_stats() == DBStats(total_links=10, total_clicks=55)
+
+    clock.now = 5
+    assert yourls.db_stats() == DBStats(total_links=10, total_clicks=55)
+    cache.wait()
+    assert yourls.db_stats() == DBStats(total_links=11, total_clicks=55)
+
+    assert yourls.url_stats(server.keyword(1)).clicks == 9
+    assert yourls.url_stats(server.keyword(1)).clicks == 9
+    with pytest.raises(YOURLSHTTPError):
+        yourls.url_stats('missing')
+
+    snapshot = metrics.snapshot()
+    assert snapshot['db-stats']['requests'] == 2
+    assert snapshot['db-stats']['cache_hits'] == 3
+    assert snapshot['db-stats']['cache_misses'] == 1
+    assert snapshot['url-stats']['requests'] == 2
+    assert snapshot['url-stats']['cache_hits'] == 1
+    assert snapshot['url-stats']['cache_misses'] == 2
+
+    yourls.disable_cache()
+    assert yourls.cache is None
+    assert yourls.db_stats() == DBStats(total_links=11, total_clicks=55)
+    assert metrics.snapshot()['db-stats']['requests'] == 3
+
+
+def test_refresh_timeout():
+    clock = Clock()
+    server = FakeYOURLS(links=10)
+    yourls = server.client(transport=server.transport())
+    cache = yourls.enable_cache(soft_ttl=5, hard_ttl=60, clock=clock,
+                                refresh_timeout=0.05)
+    timeouts = []
+    handle = server.handle
+
+    def spy(params, timeout=None):
+        timeouts.append(timeout)
+        return handle(params, timeout=timeout)
+
+    server.handle = spy
+
+    # Requests the caller waits for don't have a timeout.
+    assert yourls.db_stats() == DBStats(total_links=10, total_clicks=55)
+    assert timeouts == [None]
+
+    # The server stops responding, so the refresh times out and the stale
+    # value is kept.
+    server.latency = 60
+    clock.now = 5
+    start = default_timer()
+    assert yourls.db_stats() == DBStats(total_links=10, total_clicks=55)
+    cache.wait()
+    assert default_timer() - start < 5
+    assert timeouts == [None, 0.05]
+
+    server.latency = 0
+    yourls.shorten('http://google.com')
+    assert yourls.db_stats() == DBStats(total_links=10, total_clicks=55)
+    cache.wait()
+    assert yourls.db_stats() == DBStats(total_links=11, total_clicks=55)
+    yourls.disable_cache()
+
+
+def test_disable_cache_doesnt_wait():
+    clock = Clock()
+    server = FakeYOURLS(links=10)
+    yourls = server.client(transport=server.transport())
+    cache = yourls.enable_cache(soft_ttl=5, hard_ttl=60, clock=clock)
+    yourls.db_stats()
+
+    server.latency = 0.5
+    clock.now = 5
+    yourls.db_stats()
+
+    start = default_timer()
+    yourls.disable_cache()
+    assert default_timer() - start < 0.25
+    cache.wait()
@@ -2,16 +2,20 @@
 from __future__ import absolute_import, division, print_function
 
 import datetime
+import json
 import sys
+import time
 
 import pytest
 from yourls import DBStats, ShortenedURL, YOURLSAPIError, YOURLSURLExistsError
-from yourls.__main__ import cli, format_dbstats, format_shorturl, main
+from yourls.__main__ import (
+    RecordWriter, cached_query, cli, format_dbstats, format_shorturl, main)
+from yourls.fake import FakeYOURLS
 
 try:
-    from unittest.mock import patch
+    from unittest.mock import ANY, patch
 except ImportError:
-    from mock import patch
+    from mock import ANY, patch
 
 
 @pytest.fixture(scope='module')
@@ -327,3 +331,492 @@ def test_db_stats(set_defaults, capsys):
         expected = format_dbstats(db_stats) + '\n'
         assert expected == out
         assert mock_db_stats.call_count == 1
+
+
+def test_export(set_defaults, capsys):
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'export',
+            'links.jsonl', '--format', 'jsonl', '--resume']
+
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_export = patch('yourls.export.export_links', return_value=12)
+
+    with patch_argv, patch_export as mock_export:
+        with pytest.raises(SystemExit):
+            main()
+        _, err = capsys.readouterr()
+        assert err == 'Exported 12 links to links.jsonl\n'
+        assert mock_export.call_args[0][1] == 'links.jsonl'
+        assert mock_export.call_args[1] == {
+            'format': 'jsonl', 'filter': 'last', 'page_size': 1000,
+            'resume': True}
+
+
+def test_shorten_batch(set_defaults, capsys, tmpdir):
+    input_path = tmpdir.join('urls.txt')
+    input_path.write('http://google.com\n\nhttp://bbc.co.uk\tbbc\tBBC\n'
+                     'http://example.com/abcde\n')
+
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'shorten-batch',
+            str(input_path), '--workers', '2']
+
+    def shorten(self, url, keyword=None, title=None):
+        if url == 'http://google.com':
+            raise YOURLSURLExistsError('exists', url=ShortenedURL(
+                shorturl='http://example.com/abcde',
+                url=url,
+                title='Google',
+                date=datetime.datetime(2015, 10, 31, 14, 31, 4),
+                ip='203.0.113.0',
+                clicks=0))
+        elif keyword is None:
+            raise YOURLSAPIError('URL is a short URL')
+        return ShortenedURL(
+            shorturl='http://example.com/' + keyword,
+            url=url,
+            title=title,
+            date=datetime.datetime(2015, 10, 31, 14, 31, 4),
+            ip='203.0.113.0',
+            clicks=0,
+            keyword=keyword)
+
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_shorten = patch('yourls.core.YOURLSAPIMixin.shorten', autospec=True,
+                          side_effect=shorten)
+
+    with patch_argv, patch_shorten as mock_shorten:
+        with pytest.raises(SystemExit):
+            main()
+        out, _ = capsys.readouterr()
+        assert out == (
+            'exists\thttp://google.com\thttp://example.com/abcde\t\n'
+            'new\thttp://bbc.co.uk\thttp://example.com/bbc\t\n'
+            'error\thttp://example.com/abcde\t\tURL is a short URL\n')
+        assert mock_shorten.call_count == 3
+
+    journal = str(tmpdir.join('journal'))
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'shorten-batch',
+            '--format', 'jsonl', '--journal', journal, str(input_path)]
+    patch_argv = patch.object(sys, 'argv', argv)
+
+    with patch_argv, patch_shorten as mock_shorten:
+        for _ in range(2):
+            with pytest.raises(SystemExit):
+                main()
+        out, _ = capsys.readouterr()
+        lines = [json.loads(line) for line in out.splitlines()]
+        assert len(lines) == 6
+        assert lines[:3] == lines[3:]
+        assert lines[1] == {
+            'status': 'new', 'url': 'http://bbc.co.uk', 'keyword': 'bbc',
+            'title': 'BBC', 'shorturl': 'http://example.com/bbc',
+            'message': None}
+        assert mock_shorten.call_count == 3
+
+    argv.insert(-1, '--retry-errors')
+    with patch.object(sys, 'argv', argv), patch_shorten as mock_shorten:
+        with pytest.raises(SystemExit):
+            main()
+        out, _ = capsys.readouterr()
+        assert json.loads(out.splitlines()[2])['status'] == 'error'
+        mock_shorten.assert_called_once_with(
+            ANY, 'http://example.com/abcde', keyword=None, title=None)
+
+
+def test_expand_batch(set_defaults, capsys, tmpdir):
+    input_path = tmpdir.join('short.txt')
+    input_path.write('abc\nhttp://example.com/def\n\nabc\n  missing  \n')
+
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'expand-batch',
+            str(input_path)]
+
+    def expand(self, short):
+        if short == 'missing':
+            raise YOURLSAPIError('Error: short URL not found')
+        return 'http://google.com/' + short.rsplit('/', 1)[-1]
+
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_expand = patch('yourls.core.YOURLSAPIMixin.expand', autospec=True,
+                         side_effect=expand)
+
+    with patch_argv, patch_expand as mock_expand:
+        with pytest.raises(SystemExit):
+            main()
+        out, _ = capsys.readouterr()
+        assert out == (
+            'abc\thttp://google.com/abc\t\n'
+            'http://example.com/def\thttp://google.com/def\t\n'
+            'abc\thttp://google.com/abc\t\n'
+            'missing\t\tError: short URL not found\n')
+        assert mock_expand.call_count == 3
+
+    argv.insert(-1, '--format=jsonl')
+    with patch.object(sys, 'argv', argv), patch_expand:
+        with pytest.raises(SystemExit):
+            main()
+        out, _ = capsys.readouterr()
+        assert json.loads(out.splitlines()[0]) == {
+            'short': 'abc', 'longurl': 'http://google.com/abc', 'message': None}
+
+
+def test_cached_query():
+    calls = []
+
+    def query(item):
+        calls.append(item)
+        return item.upper()
+
+    cached = cached_query(query, maxsize=2)
+    assert [cached(item) for item in 'abab'] == ['A', 'B', 'A', 'B']
+    assert calls == ['a', 'b']
+
+    # 'a' is the least recently used, so it's forgotten first.
+    assert [cached(item) for item in 'cba'] == ['C', 'B', 'A']
+    assert calls == ['a', 'b', 'c', 'a']
+
+
+def test_cached_query_concurrent():
+    from yourls.batch import imap_ordered
+
+    calls = []
+
+    def query(item):
+        calls.append(item)
+        time.sleep(0.01)
+        return item.upper()
+
+    results = list(imap_ordered(cached_query(query), 'abcabc', workers=4))
+    assert results == list('ABCABC')
+    assert sorted(calls) == ['a', 'b', 'c']
+
+
+def test_url_stats_batch(set_defaults, capsys, tmpdir):
+    input_path = tmpdir.join('short.txt')
+    input_path.write('abcde\nvwxyz\nabcde\n')
+
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php',
+            'url-stats-batch', str(input_path)]
+
+    shorturl = ShortenedURL(
+        shorturl='http://example.com/abcde',
+        url='http://google.com',
+        title='Google',
+        date=datetime.datetime(2015, 10, 31, 14, 31, 4),
+        ip='203.0.113.0',
+        clicks=3,
+        keyword='abcde')
+
+    def url_stats(self, short):
+        if short == 'vwxyz':
+            raise YOURLSAPIError('Error: short URL not found')
+        return shorturl
+
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_url_stats = patch('yourls.core.YOURLSAPIMixin.url_stats', autospec=True,
+                            side_effect=url_stats)
+
+    with patch_argv, patch_url_stats as mock_url_stats:
+        with pytest.raises(SystemExit):
+            main()
+        out, _ = capsys.readouterr()
+        assert out == (
+            'abcde\thttp://example.com/abcde\thttp://google.com\tGoogle\t'
+            '2015-10-31 14:31:04\t203.0.113.0\t3\tabcde\t\n'
+            'vwxyz\t\t\t\t\t\t\t\tError: short URL not found\n'
+            'abcde\thttp://example.com/abcde\thttp://google.com\tGoogle\t'
+            '2015-10-31 14:31:04\t203.0.113.0\t3\tabcde\t\n')
+        assert mock_url_stats.call_count == 2
+
+    argv.insert(-1, '--format=jsonl')
+    with patch.object(sys, 'argv', argv), patch_url_stats:
+        with pytest.raises(SystemExit):
+            main()
+        out, _ = capsys.readouterr()
+        lines = [json.loads(line) for line in out.splitlines()]
+        assert lines[0]['link']['clicks'] == 3
+        assert lines[1] == {'short': 'vwxyz', 'link': None,
+                            'message': 'Error: short URL not found'}
+
+
+def test_stats_formats(set_defaults, capsys):
+    links = [
+        ShortenedURL(
+            shorturl='http://example.com/abcde',
+            url='http://google.com',
+            title='Google\tSearch',
+            date=datetime.datetime(2014, 9, 8, 20, 30, 17),
+            ip='203.0.113.0',
+            clicks=789,
+            keyword=None),
+        ShortenedURL(
+            shorturl='http://example.com/abc45',
+            url='https://www.bbc.co.uk/news',
+            title='BBC News',
+            date=datetime.datetime(2014, 12, 19, 16, 26, 39),
+            ip='203.0.113.0',
+            clicks=1364,
+            keyword='abc45'),
+    ]
+    stats = DBStats(total_links=200, total_clicks=5000)
+
+    patch_stats = patch(
+        'yourls.core.YOURLSAPIMixin.stats', autospec=True,
+        return_value=(links, stats))
+    patch_terminal = patch('yourls.__main__.terminal_columns', return_value=80)
+
+    def run(*args):
+        argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'stats',
+                'top', '2'] + list(args)
+        with patch.object(sys, 'argv', argv), patch_stats, patch_terminal as term:
+            with pytest.raises(SystemExit):
+                main()
+            out, _ = capsys.readouterr()
+            return out, term.call_count
+
+    out, terminal_lookups = run('--format', 'json')
+    assert json.loads(out) == {
+        'stats': {'total_clicks': 5000, 'total_links': 200},
+        'links': [
+            {'shorturl': 'http://example.com/abcde', 'url': 'http://google.com',
+             'title': 'Google\tSearch', 'date': '2014-09-08 20:30:17',
+             'ip': '203.0.113.0', 'clicks': 789},
+            {'shorturl': 'http://example.com/abc45',
+             'url': 'https://www.bbc.co.uk/news', 'title': 'BBC News',
+             'date': '2014-12-19 16:26:39', 'ip': '203.0.113.0', 'clicks': 1364,
+             'keyword': 'abc45'},
+        ]}
+    assert terminal_lookups == 0
+
+    out, _ = run('--format', 'jsonl')
+    assert [json.loads(line)['clicks'] for line in out.splitlines()] == [789, 1364]
+
+    out, terminal_lookups = run('-f', 'tsv')
+    assert out == (
+        'http://example.com/abcde\thttp://google.com\tGoogle Search\t'
+        '2014-09-08 20:30:17\t203.0.113.0\t789\t\n'
+        'http://example.com/abc45\thttps://www.bbc.co.uk/news\tBBC News\t'
+        '2014-12-19 16:26:39\t203.0.113.0\t1364\tabc45\n')
+    assert terminal_lookups == 0
+
+    out, terminal_lookups = run()
+    assert out.startswith(format_dbstats(stats) + '\n')
+    assert terminal_lookups == 1
+
+
+def test_single_record_formats(set_defaults, capsys):
+    shorturl = ShortenedURL(
+        shorturl='http://example.com/abcde',
+        url='http://google.com',
+        title='Google',
+        date=datetime.datetime(2015, 10, 31, 14, 31, 4),
+        ip='203.0.113.0',
+        clicks=0,
+        keyword='abcde')
+
+    def run(*args):
+        argv = ['', '--apiurl', 'http://example.com/yourls-api.php'] + list(args)
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit):
+                main()
+            out, _ = capsys.readouterr()
+            return out
+
+    with patch('yourls.core.YOURLSAPIMixin.shorten', autospec=True,
+               return_value=shorturl):
+        out = run('shorten', 'http://google.com', '--format', 'json')
+        assert json.loads(out) == {
+            'status': 'new',
+            'link': {'shorturl': 'http://example.com/abcde',
+                     'url': 'http://google.com', 'title': 'Google',
+                     'date': '2015-10-31 14:31:04', 'ip': '203.0.113.0',
+                     'clicks': 0, 'keyword': 'abcde'}}
+
+        out = run('shorten', 'http://google.com', '--format', 'tsv')
+        assert out == ('new\thttp://example.com/abcde\thttp://google.com\t'
+                       'Google\t2015-10-31 14:31:04\t203.0.113.0\t0\tabcde\n')
+
+    with patch('yourls.core.YOURLSAPIMixin.url_stats', autospec=True,
+               return_value=shorturl):
+        out = run('url-stats', 'abcde', '--format', 'jsonl')
+        assert json.loads(out)['keyword'] == 'abcde'
+
+    with patch('yourls.core.YOURLSAPIMixin.db_stats', autospec=True,
+               return_value=DBStats(total_links=200, total_clicks=5000)):
+        assert run('db-stats', '-f', 'tsv') == '5000\t200\n'
+        assert json.loads(run('db-stats', '-f', 'json')) == {
+            'total_clicks': 5000, 'total_links': 200}
+
+
+def test_record_writer_json_array(capsys):
+    with RecordWriter('json', buffer_size=10) as writer:
+        for i in range(3):
+            writer.write(i, to_json=lambda i: {'i': i}, to_fields=None)
+    out, _ = capsys.readouterr()
+    assert json.loads(out) == [{'i': 0}, {'i': 1}, {'i': 2}]
+
+    with RecordWriter('json'):
+        pass
+    out, _ = capsys.readouterr()
+    assert json.loads(out) == []
+
+
+def test_shell(set_defaults, capsys, tmpdir):
+    input_path = tmpdir.join('commands.txt')
+    input_path.write(
+        'expand abcde\n'
+        '\n'
+        '# comment\n'
+        'expand "http://example.com/vwxyz"\n'
+        'db-stats --format tsv\n'
+        'delete abcde\n'
+        'stats top\n'
+        'exit\n'
+        'expand never\n')
+
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'shell',
+            str(input_path)]
+
+    clients = []
+
+    def expand(self, short):
+        clients.append(self)
+        if short == 'http://example.com/vwxyz':
+            raise YOURLSAPIError('Error: short URL not found')
+        return 'http://google.com'
+
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_expand = patch('yourls.core.YOURLSAPIMixin.expand', autospec=True,
+                         side_effect=expand)
+    patch_db_stats = patch('yourls.core.YOURLSAPIMixin.db_stats', autospec=True,
+                           return_value=DBStats(total_links=200, total_clicks=5000))
+
+    with patch_argv, patch_expand as mock_expand, patch_db_stats:
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 1
+        out, err = capsys.readouterr()
+
+    assert out == 'http://google.com\n5000\t200\n'
+    err_lines = err.splitlines()
+    assert err_lines[0] == 'Error: short URL not found'
+    assert err_lines[1].startswith('Error: Unknown command "delete"')
+    assert "Missing argument 'LIMIT'" in err
+    assert mock_expand.call_count == 2
+    assert clients[0] is clients[1]
+
+
+def test_profile(set_defaults, capsys):
+    with FakeYOURLS(links=10) as server:
+        argv = ['', '--apiurl', server.apiurl, '--profile', 'url-stats',
+                server.keyword(1)]
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+    assert exc_info.value.code == 0
+    out, err = capsys.readouterr()
+    assert 'http://example.com/1' in out
+    assert 'API call profile' in err
+
+    header, _, row = err.strip().splitlines()[-3:]
+    assert header.split() == ['action', 'calls', 'wait', 'download', 'decode',
+                              'validate', 'construct', 'total']
+    assert row.split()[:2] == ['url-stats', '1']
+
+
+def test_offline_snapshot(set_defaults, capsys, tmpdir):
+    path = str(tmpdir.join('links.snapshot'))
+
+    with FakeYOURLS(links=10) as server:
+        argv = ['', '--apiurl', server.apiurl, 'snapshot', path]
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 0
+        assert 'Saved 10 links' in capsys.readouterr()[1]
+
+        server.error_rate = 1
+        server.failure_mode = 'disconnect'
+        argv = ['', '--apiurl', server.apiurl, '--offline-snapshot', path,
+                'expand', server.keyword(1)]
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+    assert exc_info.value.code == 0
+    out, err = capsys.readouterr()
+    assert out == 'http://example.com/1\n'
+    assert 'offline snapshot' in err
+
+
+def test_index_and_resolve(set_defaults, capsys, tmpdir):
+    path = str(tmpdir.join('links.index'))
+    input_path = tmpdir.join('input.txt')
+
+    with FakeYOURLS(links=10) as server:
+        argv = ['', '--apiurl', server.apiurl, 'index', path]
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 0
+        assert 'Indexed 10 links' in capsys.readouterr()[1]
+
+        shorturl = server.site + '/' + server.keyword(3)
+        input_path.write('\n'.join([server.keyword(3), 'missing', shorturl, '']))
+
+    # The API isn't used.
+    argv = ['', 'resolve', path, str(input_path)]
+    with patch.object(sys, 'argv', argv):
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+    assert exc_info.value.code == 0
+    out, _ = capsys.readouterr()
+    assert out.splitlines() == [
+        server.keyword(3) + '\thttp://example.com/3',
+        'missing\t',
+        shorturl + '\thttp://example.com/3',
+    ]
+
+
+def test_reverse_index_and_find_url(set_defaults, capsys, tmpdir):
+    path = str(tmpdir.join('links.db'))
+
+    with FakeYOURLS(links=10) as server:
+        argv = ['', '--apiurl', server.apiurl, 'reverse-index', path]
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 0
+        assert 'Indexed 10 links' in capsys.readouterr()[1]
+
+        argv = ['', '--apiurl', server.apiurl, '--reverse-index', path,
+                'shorten', 'http://google.com']
+        with patch.object(sys, 'argv', argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 0
+        capsys.readouterr()
+
+    # The API isn't used.
+    argv = ['', 'find-url', '--format', 'tsv', path, 'HTTP://example.com:80/3']
+    with patch.object(sys, 'argv', argv):
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+    assert exc_info.value.code == 0
+    out, _ = capsys.readouterr()
+    assert out.split('\t')[:2] == [server.site + '/' + server.keyword(3),
+                                   'http://example.com/3']
+
+    argv = ['', 'find-url', path, 'http://google.com']
+    with patch.object(sys, 'argv', argv):
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+    assert exc_info.value.code == 0
+    assert 'http://google.com' in capsys.readouterr()[0]
+
+    argv = ['', 'find-url', path, 'http://example.com/missing']
+    with patch.object(sys, 'argv', argv):
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+    assert exc_info.value.code == 1
+    assert 'not found' in capsys.readouterr()[1]
@@ -0,0 +1,135 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import csv
+import datetime
+import io
+import json
+import sqlite3
+
+import pytest
+from yourls import ShortenedURL, export
+from yourls.export import export_links, iter_links
+
+
+class FakeClient(object):
+    def __init__(self, links):
+        self.links = links
+        self.calls = []
+
+    def iter_stats(self, filter, limit, start=None):
+        self.calls.append((filter, limit, start))
+        start = start or 0
+        return iter(self.links[start:start + limit])
+
+
+def make_links(n):
+    return [
+        ShortenedURL(
+            shorturl='http://example.com/{}'.format(i),
+            url=u'http://example.com/long/{}/é'.format(i),
+            title=u'Title, "{}"\nline two'.format(i),
+            date=datetime.datetime(2015, 10, 31, 14, 31, i),
+            ip='203.0.113.0',
+            clicks=i,
+            keyword=str(i))
+        for i in range(n)]
+
+
+def test_iter_links():
+    links = make_links(7)
+    yourls = FakeClient(links)
+
+    assert list(iter_links(yourls, page_size=3)) == links
+    assert yourls.calls == [('last', 3, 0), ('last', 3, 3), ('last', 3, 6)]
+
+    yourls = FakeClient(links[:6])
+    assert list(iter_links(yourls, filter='top', page_size=3, start=2)) == links[2:6]
+    assert yourls.calls == [('top', 3, 2), ('top', 3, 5)]
+
+
+def test_export_csv(tmpdir):
+    path = str(tmpdir.join('links.csv'))
+    links = make_links(5)
+
+    assert export_links(FakeClient(links), path, format='csv', page_size=2) == 5
+
+    with io.open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+
+    assert rows[0] == ['keyword', 'shorturl', 'url', 'title', 'date', 'ip',
+                       'clicks']
+    assert len(rows) == 6
+    assert rows[1][3] == u'Title, "0"\nline two'
+    assert rows[5][2] == u'http://example.com/long/4/é'
+
+
+def test_export_csv_resume(tmpdir, monkeypatch):
+    monkeypatch.setattr(export, '_CHUNK_SIZE', 16)
+    path = str(tmpdir.join('links.csv'))
+    links = make_links(5)
+
+    assert export_links(FakeClient(links[:3]), path, format='csv') == 3
+
+    # Simulate an export that died inside a quoted title containing a newline.
+    with io.open(path, 'ab') as f:
+        f.write(b'3,http://example.com/3,http://example.com/long/3,"Title, ""3""\n')
+
+    yourls = FakeClient(links)
+    total = export_links(yourls, path, format='csv', page_size=10, resume=True)
+    assert total == 5
+    assert yourls.calls == [('last', 10, 3)]
+
+    with io.open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert [row[0] for row in rows[1:]] == ['0', '1', '2', '3', '4']
+    assert rows[4][3] == u'Title, "3"\nline two'
+
+
+def test_export_jsonl_resume(tmpdir, monkeypatch):
+    monkeypatch.setattr(export, '_CHUNK_SIZE', 16)
+    path = str(tmpdir.join('links.jsonl'))
+    links = make_links(5)
+
+    assert export_links(FakeClient(links[:3]), path, format='jsonl') == 3
+
+    # Simulate an export that died halfway through writing a line.
+    with io.open(path, 'ab') as f:
+        f.write(b'{"keyword": "3", "sho')
+
+    yourls = FakeClient(links)
+    total = export_links(yourls, path, format='jsonl', page_size=10, resume=True)
+    assert total == 5
+    assert yourls.calls == [('last', 10, 3)]
+
+    with io.open(path, encoding='utf-8') as f:
+        keywords = [json.loads(line)['keyword'] for line in f]
+    assert keywords == ['0', '1', '2', '3', '4']
+
+    # Without resume, the file is overwritten.
+    assert export_links(FakeClient(links[:1]), path, format='jsonl') == 1
+
+
+def test_export_sqlite_resume(tmpdir):
+    path = str(tmpdir.join('links.sqlite'))
+    links = make_links(4)
+
+    assert export_links(FakeClient(links[:2]), path, format='sqlite') == 2
+    assert export_links(FakeClient(links), path, format='sqlite', resume=True) == 4
+
+    connection = sqlite3.connect(path)
+    rows = connection.execute(
+        'SELECT keyword, clicks, date FROM links ORDER BY clicks').fetchall()
+    connection.close()
+
+    assert rows == [
+        ('0', 0, '2015-10-31 14:31:00'),
+        ('1', 1, '2015-10-31 14:31:01'),
+        ('2', 2, '2015-10-31 14:31:02'),
+        ('3', 3, '2015-10-31 14:31:03'),
+    ]
+
+
+def test_export_invalid_format(tmpdir):
+    with pytest.raises(ValueError):
+        export_links(FakeClient([]), str(tmpdir.join('links')), format='xml')
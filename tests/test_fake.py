@@ -0,0 +1,133 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import pytest
+import requests
+from yourls import (
+    DBStats, YOURLSHTTPError, YOURLSKeywordExistsError, YOURLSNoLoopError,
+    YOURLSNoURLError, YOURLSURLExistsError)
+from yourls.fake import FakeYOURLS
+
+
+@pytest.yield_fixture
+def server():
+    with FakeYOURLS(links=1000, signature='6f344c2a8p') as server:
+        yield server
+
+
+def test_shorten(server):
+    yourls = server.client()
+
+    link = yourls.shorten('http://google.com', keyword='google', title='Google')
+    assert link.shorturl == server.site + '/google'
+    assert link.title == 'Google'
+    assert yourls.expand('google') == 'http://google.com'
+    assert yourls.expand(link.shorturl) == 'http://google.com'
+
+    # Automatic keywords don't collide with existing links.
+    link = yourls.shorten('http://python.org')
+    assert link.keyword == server.keyword(1000)
+
+    with pytest.raises(YOURLSURLExistsError) as exc_info:
+        yourls.shorten('http://example.com/5')
+    assert exc_info.value.url.keyword == server.keyword(5)
+
+    with pytest.raises(YOURLSKeywordExistsError):
+        yourls.shorten('http://example.org', keyword=server.keyword(5))
+
+    with pytest.raises(YOURLSNoLoopError):
+        yourls.shorten(link.shorturl)
+
+    with pytest.raises(YOURLSNoURLError):
+        yourls.shorten('')
+
+    assert yourls.db_stats() == DBStats(total_links=1002, total_clicks=500500)
+
+
+def test_post(server):
+    yourls = server.client(post_actions=['shorturl', 'expand'])
+    url = 'http://example.com/?utm_source=' + 'x' * 100000
+
+    link = yourls.shorten(url, title='Long')
+    assert link.url == url
+    assert yourls.expand(link.keyword) == url
+
+
+def test_stats(server):
+    yourls = server.client()
+    yourls.shorten('http://google.com', keyword='google')
+
+    link = yourls.url_stats(server.keyword(10))
+    assert link.url == 'http://example.com/10'
+    assert link.clicks == 990
+
+    links, stats = yourls.stats('top', limit=2, start=999)
+    assert [link.url for link in links] == ['http://example.com/999',
+                                            'http://google.com']
+    assert stats == DBStats(total_links=1001, total_clicks=500500)
+
+    links, _ = yourls.stats('last', limit=2)
+    assert [link.url for link in links] == ['http://google.com',
+                                            'http://example.com/999']
+
+    links = list(yourls.iter_stats('bottom', limit=3, start=1000))
+    assert [link.url for link in links] == ['http://example.com/0']
+
+    links, _ = yourls.stats('rand', limit=5)
+    assert len(set(link.url for link in links)) == 5
+
+    with pytest.raises(YOURLSHTTPError) as exc_info:
+        yourls.expand('google2')
+    assert exc_info.value.response.status_code == 404
+
+
+def test_authentication(server):
+    yourls = server.client(signature='wrong')
+    with pytest.raises(YOURLSHTTPError) as exc_info:
+        yourls.db_stats()
+    assert exc_info.value.response.status_code == 403
+
+
+def test_signature_token(server):
+    yourls = server.client(signature_lifetime=60)
+    assert yourls.expand(server.keyword(5)) == 'http://example.com/5'
+
+    # Token has expired on the server.
+    server.nonce_life = 0
+    with pytest.raises(YOURLSHTTPError):
+        yourls.expand(server.keyword(5))
+
+
+def test_failures(server):
+    yourls = server.client()
+
+    server.error_rate = 1
+    server.error_actions = ('expand',)
+    with pytest.raises(YOURLSHTTPError) as exc_info:
+        yourls.expand(server.keyword(1))
+    assert exc_info.value.response.status_code == 500
+
+    # Other actions aren't affected.
+    yourls.url_stats(server.keyword(1))
+
+    server.failure_mode = 'disconnect'
+    with pytest.raises(requests.ConnectionError):
+        yourls.expand(server.keyword(1))
+
+    server.error_rate = 0
+    assert yourls.expand(server.keyword(1)) == 'http://example.com/1'
+
+    calls = []
+    server.latency = lambda action: calls.append(action)
+    yourls.db_stats()
+    assert calls == ['db-stats']
+
+
+def test_millions_of_links():
+    server = FakeYOURLS(links=10 ** 7)
+    status, body = server.handle(dict(action='stats', filter='last', limit=1))
+    assert body['links']['link_1']['url'] == 'http://example.com/9999999'
+
+    status, body = server.handle(dict(action='expand', shorturl=server.keyword(12345)))
+    assert body['longurl'] == 'http://example.com/12345'
+    server.stop()
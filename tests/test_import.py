@@ -0,0 +1,57 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+HEAVY_MODULES = ('requests', 'logbook', 'represent', 'sqlite3')
+
+
+def imported_modules(code):
+    """Run `code` in a fresh interpreter and return the modules it imported."""
+    code = textwrap.dedent(code) + textwrap.dedent("""
+    import sys
+    print('\\n'.join(sys.modules))
+    """)
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return set(output.decode('utf-8').splitlines())
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='Lazy imports require module __getattr__')
+def test_lazy_imports():
+    modules = imported_modules('import yourls')
+    assert not modules & set(HEAVY_MODULES + ('click',))
+
+    modules = imported_modules('import yourls.__main__')
+    assert not modules & set(HEAVY_MODULES)
+
+    # The logger is only created if the user accesses it.
+    modules = imported_modules("""
+    from yourls import YOURLSClient
+    YOURLSClient('http://example.com/yourls-api.php')
+    """)
+    assert 'requests' in modules
+    assert 'logbook' not in modules
+
+    modules = imported_modules('from yourls import logger')
+    assert 'logbook' in modules
+
+
+def test_submodule_attributes():
+    code = """
+    import yourls
+    assert issubclass(yourls.exceptions.YOURLSHTTPError,
+                      yourls.exceptions.YOURLSAPIError)
+    assert yourls.core.YOURLSClient is yourls.YOURLSClient
+    assert yourls.data.ShortenedURL is yourls.ShortenedURL
+    assert yourls.log.logger is yourls.logger
+    """
+    subprocess.check_call([sys.executable, '-c', textwrap.dedent(code)])
+
+    import yourls
+    with pytest.raises(AttributeError):
+        yourls.missing
@@ -0,0 +1,108 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import io
+
+import pytest
+import requests
+from yourls import (
+    ShortenedURL, YOURLSHTTPError, YOURLSKeywordExistsError, YOURLSURLExistsError)
+from yourls.fake import FakeYOURLS
+from yourls.journal import JournalEntry, ShortenJournal
+
+
+def make_link(url, keyword):
+    return ShortenedURL(
+        shorturl='http://example.com/' + keyword,
+        url=url,
+        title='Title',
+        date=datetime.datetime(2015, 10, 31, 14, 31, 4),
+        ip='203.0.113.0',
+        clicks=0,
+        keyword=keyword)
+
+
+class FakeClient(object):
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def shorten(self, url, keyword=None, title=None):
+        self.calls.append(url)
+        if url == self.fail_on:
+            raise requests.ConnectionError('Connection refused')
+        if url.endswith('exists'):
+            raise YOURLSURLExistsError('already exists',
+                                       url=make_link(url, 'old'))
+        if keyword == 'taken':
+            raise YOURLSKeywordExistsError('keyword taken', keyword=keyword)
+        return make_link(url, keyword or 'new')
+
+
+def test_shorten_all_restart(tmpdir):
+    path = str(tmpdir.join('journal'))
+    items = [
+        'http://a.com',
+        ('http://b.com/exists', '', ''),
+        ('http://c.com', 'taken', 'C'),
+        'http://d.com',
+        'http://e.com',
+    ]
+
+    yourls = FakeClient(fail_on='http://d.com')
+    with ShortenJournal(path) as journal:
+        entries = []
+        with pytest.raises(requests.ConnectionError):
+            for entry in journal.shorten_all(yourls, items):
+                entries.append(entry)
+
+    assert [e.status for e in entries] == ['new', 'exists', 'error']
+    assert entries[1].link == make_link('http://b.com/exists', 'old')
+    assert entries[2] == JournalEntry('http://c.com', 'taken', 'C', 'error',
+                                      message='keyword taken')
+
+    # Simulate crash while writing an entry.
+    with io.open(path, 'ab') as f:
+        f.write(b'{"url": "http://d.c')
+
+    yourls = FakeClient()
+    with ShortenJournal(path) as journal:
+        assert len(journal) == 3
+        restarted = list(journal.shorten_all(yourls, items))
+
+    assert yourls.calls == ['http://d.com', 'http://e.com']
+    assert restarted[:3] == entries
+    assert restarted[3] == JournalEntry(
+        'http://d.com', None, None, 'new', link=make_link('http://d.com', 'new'))
+
+    yourls = FakeClient()
+    with ShortenJournal(path) as journal:
+        assert len(journal) == 5
+        list(journal.shorten_all(yourls, items, retry_errors=True))
+        assert journal.get('http://a.com').status == 'new'
+
+    assert yourls.calls == ['http://c.com']
+
+
+@pytest.mark.parametrize('status', [500, 503, 401, 403, 408, 429])
+def test_retryable_errors_not_recorded(tmpdir, status):
+    path = str(tmpdir.join('journal'))
+    server = FakeYOURLS(error_rate=1, error_status=status)
+    yourls = server.client(transport=server.transport())
+
+    with ShortenJournal(path) as journal:
+        with pytest.raises(YOURLSHTTPError):
+            list(journal.shorten_all(yourls, ['http://a.com']))
+        assert len(journal) == 0
+
+    server.error_rate = 0
+    with ShortenJournal(path) as journal:
+        [entry] = journal.shorten_all(yourls, ['http://a.com'])
+        assert entry.status == 'new'
+
+    # 4xx responses are recorded.
+    with ShortenJournal(path) as journal:
+        [entry] = journal.shorten_all(yourls, [server.site + '/abc'])
+        assert entry.status == 'error'
+        assert journal.get(server.site + '/abc') == entry
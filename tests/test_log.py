@@ -0,0 +1,68 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import logbook
+import pytest
+import responses
+from responses import GET
+from yourls import YOURLSClient, log
+
+from .test_yourls import make_url
+
+
+@pytest.yield_fixture
+def handler():
+    logger = log.logger
+    logger.disabled = False
+    with logbook.TestHandler() as handler:
+        yield handler
+    logger.disabled = True
+    logger.level = logbook.NOTSET
+    log.set_debug_rate_limit(None)
+
+
+@responses.activate
+def test_structured_fields(handler):
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                          signature='6f344c2a8p')
+
+    params = dict(action='expand', shorturl='abcde')
+    json_response = {'longurl': 'http://google.com'}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=200, match_querystring=True)
+
+    yourls.expand('abcde')
+
+    record, = handler.records
+    assert record.message == 'Received 200 response to expand'
+    assert record.extra['action'] == 'expand'
+    assert record.extra['json'] == json_response
+    # Location of the call in yourls.data, not yourls.log.
+    assert record.module == 'yourls.data'
+
+
+def test_level_check(handler):
+    assert log.debug_enabled()
+
+    log.logger.level = logbook.INFO
+    assert not log.debug_enabled()
+    log.debug('Not logged {value}', value=1)
+    assert not handler.records
+
+    log.logger.level = logbook.NOTSET
+    log.logger.disabled = True
+    assert not log.debug_enabled()
+
+
+def test_rate_limit(handler):
+    log.set_debug_rate_limit(3)
+    for i in range(10):
+        log.debug('Message {i}', i=i)
+
+    assert [r.message for r in handler.records] == [
+        'Message 0', 'Message 1', 'Message 2']
+
+    # Start the next window.
+    log._debug_limiter._window_start -= 1
+    log.debug('Message {i}', i=10)
+    assert handler.records[-1].extra['dropped'] == 7
@@ -0,0 +1,123 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import pytest
+import responses
+from requests.adapters import HTTPAdapter
+from responses import GET
+from urllib3.util.retry import Retry
+from yourls import YOURLSClient, YOURLSHTTPError
+from yourls.fake import FakeYOURLS
+from yourls.metrics import MetricsCollector
+
+from .test_yourls import make_url
+
+
+def test_record_request():
+    metrics = MetricsCollector(buckets=(0.1, 1))
+    metrics.record_request('expand', 0.05, nbytes=10)
+    metrics.record_request('expand', 0.1, nbytes=20)
+    metrics.record_request('expand', 0.5, error=True)
+    metrics.record_request('expand', 3)
+    metrics.record_cache('expand', hit=True)
+    metrics.record_cache('expand', hit=True)
+    metrics.record_cache('expand', hit=False)
+    metrics.record_retry('expand')
+
+    snapshot = metrics.snapshot()
+    assert list(snapshot) == ['expand']
+
+    expand = snapshot['expand']
+    assert expand['requests'] == 4
+    assert expand['errors'] == 1
+    assert expand['bytes'] == 30
+    assert expand['latency'] == dict(
+        buckets=[(0.1, 2), (1, 3), (float('inf'), 4)], sum=3.65, count=4)
+    assert expand['cache_hits'] == 2
+    assert expand['cache_misses'] == 1
+    assert expand['cache_hit_rate'] == pytest.approx(2 / 3)
+    assert expand['retries'] == 1
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_prometheus():
+    metrics = MetricsCollector(buckets=(0.1, 1))
+    metrics.record_request('stats', 0.5, nbytes=100)
+    metrics.record_request('expand', 0.05, nbytes=10)
+
+    text = metrics.prometheus()
+    assert text.endswith('\n')
+
+    lines = text.splitlines()
+    assert '# TYPE yourls_requests_total counter' in lines
+    assert 'yourls_requests_total{action="expand"} 1' in lines
+    assert 'yourls_response_bytes_total{action="stats"} 100' in lines
+    assert '# TYPE yourls_request_duration_seconds histogram' in lines
+
+    start = lines.index('yourls_request_duration_seconds_bucket'
+                        '{action="expand",le="0.1"} 1')
+    assert lines[start:start + 5] == [
+        'yourls_request_duration_seconds_bucket{action="expand",le="0.1"} 1',
+        'yourls_request_duration_seconds_bucket{action="expand",le="1.0"} 1',
+        'yourls_request_duration_seconds_bucket{action="expand",le="+Inf"} 1',
+        'yourls_request_duration_seconds_sum{action="expand"} 0.05',
+        'yourls_request_duration_seconds_count{action="expand"} 1',
+    ]
+
+
+@responses.activate
+def test_enable_metrics():
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                          signature='6f344c2a8p')
+    assert yourls.metrics is None
+
+    metrics = yourls.enable_metrics()
+    assert yourls.metrics is metrics
+    assert yourls.enable_metrics() is metrics
+
+    params = dict(action='expand', shorturl='abcde')
+    responses.add(GET, make_url(yourls, params=params),
+                  json={'longurl': 'http://google.com'}, status=200,
+                  match_querystring=True)
+
+    params = dict(action='expand', shorturl='vwxyz')
+    json_response = {'message': 'Error: short URL not found', 'errorCode': 404}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=404, match_querystring=True)
+
+    yourls.expand('abcde')
+    with pytest.raises(YOURLSHTTPError):
+        yourls.expand('vwxyz')
+
+    expand = metrics.snapshot()['expand']
+    assert expand['requests'] == 2
+    assert expand['errors'] == 1
+    assert expand['latency']['count'] == 2
+
+    yourls.disable_metrics()
+    assert yourls.metrics is None
+    assert all(not hooks for hooks in yourls.hooks.values())
+
+
+def test_retries():
+    attempts = []
+
+    def latency(action):
+        attempts.append(action)
+        return 0
+
+    with FakeYOURLS(links=5, latency=latency, error_rate=0.5, error_status=503,
+                    seed=1) as server:
+        yourls = server.client()
+        retry = Retry(total=10, status_forcelist=[503], backoff_factor=0)
+        yourls.transport.session.mount('http://', HTTPAdapter(max_retries=retry))
+        metrics = yourls.enable_metrics()
+
+        for _ in range(10):
+            yourls.db_stats()
+
+    db_stats = metrics.snapshot()['db-stats']
+    assert db_stats['requests'] == 10
+    assert db_stats['retries'] == len(attempts) - 10 > 0
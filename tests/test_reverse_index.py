@@ -0,0 +1,194 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import sqlite3
+from datetime import datetime
+
+import logbook
+import pytest
+from yourls import ShortenedURL, YOURLSURLExistsError, log
+from yourls.fake import FakeYOURLS
+from yourls.reverse_index import (
+    ReverseIndex, _flush_at_exit, build_reverse_index, normalise_url)
+
+
+def make_link(keyword, url, date=datetime(2015, 10, 31, 14, 31, 4)):
+    return ShortenedURL(
+        shorturl='http://example.com/' + keyword, url=url, title=u'Tïtle',
+        date=date, ip='203.0.113.0', clicks=3)
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://Example.COM', 'http://example.com/'),
+    ('http://example.com:80/a', 'http://example.com/a'),
+    ('https://example.com:443/a', 'https://example.com/a'),
+    ('https://example.com:8443/a', 'https://example.com:8443/a'),
+    ('http://user@Example.com/%7e?q=%7e#%7e', 'http://user@example.com/%7E?q=%7E#%7E'),
+    ('http://example.com/A?B=C', 'http://example.com/A?B=C'),
+    ('http://[::1]:80/', 'http://[::1]/'),
+    ('  http://example.com/ ', 'http://example.com/'),
+    ('http://example.com:bad/', 'http://example.com:bad/'),
+])
+def test_normalise_url(url, expected):
+    assert normalise_url(url) == expected
+
+
+def test_reverse_index(tmpdir):
+    path = str(tmpdir.join('links.db'))
+    with ReverseIndex(path) as index:
+        assert index.add([
+            make_link('b', 'http://example.com/1', date=datetime(2016, 1, 1)),
+            make_link('a', 'HTTP://EXAMPLE.COM:80/1'),
+            make_link('c', 'http://example.com/2'),
+        ]) == 3
+        assert len(index) == 3
+
+        links = index.find('http://example.com/1')
+        assert [link.keyword for link in links] == ['a', 'b']
+        assert links[0] == ShortenedURL(
+            shorturl='http://example.com/a', url='HTTP://EXAMPLE.COM:80/1',
+            title=u'Tïtle', date=datetime(2015, 10, 31, 14, 31, 4),
+            ip='203.0.113.0', clicks=3, keyword='a')
+
+        assert 'http://example.com/2' in index
+        assert 'http://example.com/3' not in index
+        assert index.find('http://example.com/3') == []
+
+        # Links are replaced by keyword.
+        index.add([make_link('c', 'http://example.com/3')])
+        assert len(index) == 3
+        assert 'http://example.com/2' not in index
+
+    # Index persists.
+    with ReverseIndex(path) as index:
+        assert len(index) == 3
+
+
+def test_build_reverse_index(tmpdir):
+    path = str(tmpdir.join('links.db'))
+    server = FakeYOURLS(links=25)
+    yourls = server.client(transport=server.transport())
+    assert build_reverse_index(yourls, path, page_size=10) == 25
+
+    with ReverseIndex(path) as index:
+        [link] = index.find('http://example.com/7')
+        assert link.keyword == server.keyword(7)
+
+
+def test_client_reverse_index(tmpdir):
+    path = str(tmpdir.join('links.db'))
+    server = FakeYOURLS(links=5)
+    yourls = server.client(transport=server.transport())
+    index = yourls.enable_reverse_index(path)
+    assert yourls.reverse_index is index
+
+    link = yourls.shorten('http://google.com', keyword='g')
+    assert index.find('http://GOOGLE.com/') == [link]
+
+    # Existing links are added from the error.
+    with pytest.raises(YOURLSURLExistsError):
+        yourls.shorten('http://example.com/2')
+    [link] = index.find('http://example.com/2')
+    assert link.keyword == server.keyword(2)
+
+    yourls.disable_reverse_index()
+    assert yourls.reverse_index is None
+    yourls.shorten('http://bing.com')
+
+    # The index was opened from a path, so disabling it closed it.
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(index)
+    with ReverseIndex(path) as index:
+        assert 'http://google.com' in index
+        assert 'http://bing.com' not in index
+
+
+def stored(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_client_reverse_index_written(tmpdir):
+    # Links are written without disabling or closing the index.
+    path = str(tmpdir.join('links.db'))
+    server = FakeYOURLS()
+    yourls = server.client(transport=server.transport())
+    yourls.enable_reverse_index(path)
+
+    for i in range(5):
+        yourls.shorten('http://example.com/{}'.format(i))
+
+    assert stored(path) == 5
+    with ReverseIndex(path) as index:
+        assert 'http://example.com/4' in index
+
+    # A client-owned index is closed when it's replaced.
+    index = yourls.reverse_index
+    yourls.enable_reverse_index(path)
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(index)
+    yourls.disable_reverse_index()
+
+
+def test_queue_batches(tmpdir):
+    path = str(tmpdir.join('links.db'))
+
+    server = FakeYOURLS()
+    yourls = server.client(transport=server.transport())
+    index = yourls.enable_reverse_index(ReverseIndex(path, batch_size=3))
+
+    yourls.shorten('http://a.com')
+    yourls.shorten('http://b.com')
+    assert stored(path) == 0
+    yourls.shorten('http://c.com')
+    assert stored(path) == 3
+
+    yourls.shorten('http://d.com')
+    assert 'http://d.com' in index
+    assert stored(path) == 4
+
+    yourls.shorten('http://e.com')
+    yourls.disable_reverse_index()
+    assert stored(path) == 5
+
+    # Queued links are written at exit.
+    index.queue([make_link('f', 'http://f.com')])
+    assert stored(path) == 5
+    _flush_at_exit()
+    assert stored(path) == 6
+    index.close()
+
+
+def test_index_errors_logged(tmpdir):
+    class BrokenIndex(ReverseIndex):
+        def add(self, links):
+            raise sqlite3.OperationalError('database is locked')
+
+    server = FakeYOURLS(links=1)
+    yourls = server.client(transport=server.transport())
+    index = yourls.enable_reverse_index(
+        BrokenIndex(str(tmpdir.join('links.db')), batch_size=1))
+
+    log.logger.disabled = False
+    log.logger.level = logbook.WARNING
+    try:
+        with logbook.TestHandler() as handler:
+            link = yourls.shorten('http://google.com')
+            with pytest.raises(YOURLSURLExistsError):
+                yourls.shorten('http://example.com/0')
+    finally:
+        log.logger.disabled = True
+        log.logger.level = logbook.NOTSET
+
+    assert link.url == 'http://google.com'
+    assert [record.message for record in handler.records] == [
+        'Adding {} to reverse index failed: database is locked'.format(
+            link.shorturl),
+        'Adding {}/{} to reverse index failed: database is locked'.format(
+            server.site, server.keyword(0)),
+    ]
+    assert all(record.level_name == 'WARNING' for record in handler.records)
+    index._connection.close()
@@ -0,0 +1,198 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import errno
+import os
+import socket
+import sys
+import threading
+
+import pytest
+from yourls import YOURLSAPIError
+from yourls.config import get_config, get_value
+from yourls.server import _split_args, forward, make_server
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'),
+                                reason='Unix sockets required')
+
+
+@pytest.yield_fixture
+def server(tmpdir):
+    path = str(tmpdir.join('yourls.sock'))
+    server = make_server(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_split_args():
+    assert _split_args(['expand', 'abc']) == ({}, 'expand', ['abc'])
+    assert _split_args(['--apiurl', 'http://x', '--signature=s', 'stats', 'top',
+                        '3']) == ({'apiurl': 'http://x', 'signature': 's'},
+                                  'stats', ['top', '3'])
+    assert _split_args(['--help']) is None
+    assert _split_args(['--apiurl']) is None
+    assert _split_args([]) is None
+
+
+def test_forward(server, capsys):
+    args = ['--apiurl', 'http://example.com/yourls-api.php', 'expand', 'abcde']
+
+    clients = []
+
+    def expand(self, short):
+        clients.append(self)
+        if short == 'vwxyz':
+            raise YOURLSAPIError('Error: short URL not found')
+        return 'http://google.com'
+
+    with patch('yourls.core.YOURLSAPIMixin.expand', autospec=True,
+               side_effect=expand):
+        assert forward(args, path=server) == 0
+        out, err = capsys.readouterr()
+        assert out == 'http://google.com\n'
+        assert err == ''
+
+        args[-1] = 'vwxyz'
+        assert forward(args, path=server) == 1
+        out, err = capsys.readouterr()
+        assert out == ''
+        assert err == 'Error: short URL not found\n'
+
+    # Client is reused between commands.
+    assert len(clients) == 2
+    assert clients[0] is clients[1]
+
+
+def test_forward_not_supported(server, tmpdir, capsys):
+    # Missing socket
+    missing = str(tmpdir.join('missing.sock'))
+    assert forward(['expand', 'abc'], path=missing) is None
+
+    # Commands that read input aren't forwarded
+    assert forward(['expand-batch'], path=server) is None
+
+    # Usage errors are reported by the server.
+    with patch('yourls.config.get_value', return_value=None):
+        assert forward(['expand', 'abc'], path=server) == 2
+    _, err = capsys.readouterr()
+    assert 'apiurl missing' in err
+
+
+def test_main_forwards(server, capsys):
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'expand', 'abc']
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_env = patch.dict(os.environ, {'YOURLS_SOCKET': server})
+    patch_expand = patch('yourls.core.YOURLSAPIMixin.expand', autospec=True,
+                         return_value='http://google.com')
+
+    results = []
+
+    def spy(*args, **kwargs):
+        results.append(forward(*args, **kwargs))
+        return results[-1]
+
+    patch_forward = patch('yourls.server.forward', side_effect=spy)
+
+    from yourls.__main__ import main
+
+    with patch_argv, patch_env, patch_forward, patch_expand:
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 0
+        assert results == [0]
+        out, _ = capsys.readouterr()
+        assert out == 'http://google.com\n'
+
+
+def test_main_without_server(tmpdir, capsys):
+    argv = ['', '--apiurl', 'http://example.com/yourls-api.php', 'expand', 'abc']
+    patch_argv = patch.object(sys, 'argv', argv)
+    patch_env = patch.dict(os.environ,
+                           {'YOURLS_SOCKET': str(tmpdir.join('missing.sock'))})
+    patch_expand = patch('yourls.core.YOURLSAPIMixin.expand', autospec=True,
+                         return_value='http://google.com')
+
+    from yourls.server import main
+
+    with patch_argv, patch_env, patch_expand as mock_expand:
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 0
+        out, _ = capsys.readouterr()
+        assert out == 'http://google.com\n'
+        assert mock_expand.call_count == 1
+
+
+def test_make_server_already_running(server, capsys):
+    with pytest.raises(socket.error) as exc_info:
+        make_server(server)
+    assert exc_info.value.errno == errno.EADDRINUSE
+
+    from click.testing import CliRunner
+    from yourls.__main__ import cli
+
+    result = CliRunner().invoke(cli, ['serve', '--socket', server])
+    assert result.exit_code == 1
+    assert 'yourls server already running' in result.output
+
+    # The running server's socket wasn't replaced.
+    with patch('yourls.core.YOURLSAPIMixin.expand', autospec=True,
+               return_value='http://google.com'):
+        assert forward(['--apiurl', 'http://x', 'expand', 'abc'], path=server) == 0
+    out, _ = capsys.readouterr()
+    assert out == 'http://google.com\n'
+
+
+def test_make_server_stale_socket(tmpdir):
+    path = str(tmpdir.join('yourls.sock'))
+
+    # Server which exited without removing its socket file.
+    make_server(path).server_close()
+    assert os.path.exists(path)
+
+    server = make_server(path)
+    server.server_close()
+
+
+def test_forward_paths(server, tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    forwarded = []
+
+    def run_command(args):
+        # Config files read by the server, e.g. from its working directory.
+        forwarded.append((args, get_value('reverse_index')))
+        return dict(exit_code=0, stdout='', stderr='')
+
+    def client_config(name):
+        return 'links.db' if name == 'reverse_index' else None
+
+    server_config = get_config()
+    if not server_config.has_section('yourls'):
+        server_config.add_section('yourls')
+    server_config.set('yourls', 'reverse_index', 'server.db')
+
+    args = ['--apiurl', 'http://x', '--offline-snapshot', 'links.snapshot',
+            'expand', 'abc']
+    patch_client = patch('yourls.server.config.get_value', side_effect=client_config)
+    patch_run = patch('yourls.server.run_command', side_effect=run_command)
+    try:
+        with patch_client, patch_run:
+            assert forward(args, path=server) == 0
+    finally:
+        server_config.remove_option('yourls', 'reverse_index')
+
+    assert forwarded == [
+        (['--apiurl', 'http://x',
+          '--offline-snapshot', str(tmpdir.join('links.snapshot')),
+          '--reverse-index', str(tmpdir.join('links.db')),
+          'expand', 'abc'], None),
+    ]
@@ -0,0 +1,156 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+from datetime import datetime
+
+import pytest
+import requests
+from yourls import LongURL, ShortenedURL, StaleURL, YOURLSHTTPError
+from yourls.fake import FakeYOURLS
+from yourls.snapshot import (
+    KeywordIndex, Snapshot, _sorted_records, build_index, build_snapshot,
+    write_index, write_snapshot)
+
+
+def make_link(keyword, url):
+    return ShortenedURL(
+        shorturl='http://example.com/' + keyword, url=url, title=u'Tïtle',
+        date=datetime(2015, 10, 31, 14, 31, 4), ip='203.0.113.0', clicks=3)
+
+
+def test_write_snapshot(tmpdir):
+    path = str(tmpdir.join('links.snapshot'))
+    links = [make_link(keyword, 'http://example.com/{}/{}'.format(keyword, i))
+             for i, keyword in enumerate(['b', 'a', u'ü', 'ab', 'a'])]
+    assert write_snapshot(path, links) == 4
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 4
+        assert snapshot.get('a').url == 'http://example.com/a/4'
+        assert snapshot.get('http://example.com/ab').url == 'http://example.com/ab/3'
+        assert snapshot.get(u'ü').keyword == u'ü'
+        assert snapshot.get('c') is None
+        assert 'b' in snapshot
+        assert 'aa' not in snapshot
+
+        link = snapshot.get('b')
+        assert link == ShortenedURL(
+            shorturl='http://example.com/b', url='http://example.com/b/0',
+            title=u'Tïtle', date=datetime(2015, 10, 31, 14, 31, 4),
+            ip='203.0.113.0', clicks=3, keyword='b')
+        assert link.stale
+
+        assert [link.keyword for link in snapshot] == ['a', 'ab', 'b', u'ü']
+
+
+def test_empty_and_invalid(tmpdir):
+    path = str(tmpdir.join('links.snapshot'))
+    write_snapshot(path, [])
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 0
+        assert snapshot.get('a') is None
+
+    for content in [b'', b'not a snapshot file at all, but long enough']:
+        tmpdir.join('invalid').write(content, mode='wb')
+        with pytest.raises(ValueError):
+            Snapshot(str(tmpdir.join('invalid')))
+
+
+def test_offline(tmpdir):
+    path = str(tmpdir.join('links.snapshot'))
+    server = FakeYOURLS(links=100)
+    yourls = server.client(transport=server.transport())
+    assert build_snapshot(yourls, path, page_size=30) == 100
+
+    snapshot = yourls.enable_offline(path)
+    assert yourls.snapshot is snapshot
+
+    # Results come from the server while it's available.
+    fresh_url = yourls.expand(server.keyword(5))
+    assert fresh_url == 'http://example.com/5'
+    assert isinstance(fresh_url, LongURL)
+    assert not isinstance(fresh_url, StaleURL)
+    assert fresh_url.stale is False
+    assert yourls.url_stats(server.keyword(5)).stale is False
+
+    server.error_rate = 1
+    for failure_mode, error_status in [('disconnect', 500), ('http', 503)]:
+        server.failure_mode = failure_mode
+        server.error_status = error_status
+
+        url = yourls.expand(server.keyword(5))
+        assert url == 'http://example.com/5'
+        assert url.stale is True
+        # Equality ignores staleness.
+        assert url == fresh_url
+
+        link = yourls.url_stats(server.site + '/' + server.keyword(5))
+        assert link.url == 'http://example.com/5'
+        assert link.clicks == 95
+        assert link.stale is True
+
+    # Links that aren't in the snapshot raise the original exception.
+    with pytest.raises(requests.HTTPError):
+        yourls.expand('missing')
+
+    # Client errors aren't outages.
+    server.error_status = 404
+    with pytest.raises(YOURLSHTTPError):
+        yourls.expand(server.keyword(5))
+
+    yourls.disable_offline()
+    server.error_status = 503
+    with pytest.raises(YOURLSHTTPError):
+        yourls.expand(server.keyword(5))
+    snapshot.close()
+
+
+def test_sorted_records(tmpdir):
+    records = [(b'c', b'1'), (b'a', b'2'), (b'b', b'3'), (b'a', b'4'),
+               (b'd', b'5'), (b'c', b'6'), (b'a', b'7')]
+    expected = [(b'a', b'7'), (b'b', b'3'), (b'c', b'6'), (b'd', b'5')]
+
+    for run_size in (1, 2, 3, 100):
+        sorted_records = _sorted_records(iter(records), run_size, str(tmpdir))
+        assert list(sorted_records) == expected
+    assert tmpdir.listdir() == []
+
+
+def test_keyword_index(tmpdir):
+    path = str(tmpdir.join('links.index'))
+    links = [('b', 'http://example.com/b'), (u'ü', u'http://example.com/ü'),
+             make_link('a', 'http://example.com/a')]
+    assert write_index(path, links) == 3
+
+    with KeywordIndex(path) as index:
+        assert len(index) == 3
+        assert index.get('a') == 'http://example.com/a'
+        assert index.get('http://example.com/b') == 'http://example.com/b'
+        assert index.get(u'ü') == u'http://example.com/ü'
+        assert index.get('c') is None
+        assert index.get('c', '') == ''
+        assert 'a' in index
+
+        view = index.get_bytes('b')
+        assert bytes(view) == b'http://example.com/b'
+        if hasattr(view, 'release'):
+            view.release()
+        assert index.get_bytes('c') is None
+
+        assert list(index) == [('a', 'http://example.com/a'),
+                               ('b', 'http://example.com/b'),
+                               (u'ü', u'http://example.com/ü')]
+
+    with pytest.raises(ValueError):
+        Snapshot(path)
+
+
+def test_build_index(tmpdir):
+    path = str(tmpdir.join('links.index'))
+    server = FakeYOURLS(links=250)
+    yourls = server.client(transport=server.transport())
+    assert build_index(yourls, path, page_size=100) == 250
+
+    with KeywordIndex(path) as index:
+        for i in range(250):
+            assert index.get(server.keyword(i)) == 'http://example.com/{}'.format(i)
@@ -0,0 +1,244 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import gc
+import threading
+
+import pytest
+import requests
+import responses
+from yourls import (
+    DBStats, YOURLSClient, YOURLSHTTPError, YOURLSNoLoopError, YOURLSURLExistsError)
+from yourls.batch import imap_ordered
+from yourls.fake import FakeYOURLS
+from yourls.transport import RequestsTransport, Transport, TransportResponse
+
+
+@pytest.yield_fixture
+def server():
+    server = FakeYOURLS(links=100, signature='6f344c2a8p')
+    yield server
+    server.stop()
+
+
+def test_transport_response():
+    closed = []
+    response = TransportResponse(
+        200, {'content-type': 'application/json'}, chunks=[b'{"a": ', b'1}'],
+        close=lambda: closed.append(True))
+    assert response.ok
+    assert response.headers['Content-Type'] == 'application/json'
+    assert list(response.iter_content(chunk_size=1024)) == [b'{"a": ', b'1}']
+
+    response = TransportResponse(200, {}, chunks=[b'{"a": ', b'1}'],
+                                 close=lambda: closed.append(True))
+    assert response.json() == {'a': 1}
+    assert closed == [True]
+    assert list(response.iter_content(chunk_size=4)) == [b'{"a"', b': 1}']
+
+    response = TransportResponse(503, {}, b'', url='http://example.com',
+                                 reason='Service Unavailable')
+    assert not response.ok
+    with pytest.raises(requests.HTTPError) as exc_info:
+        response.raise_for_status()
+    assert exc_info.value.response is response
+    assert str(exc_info.value) == (
+        '503 Server Error: Service Unavailable for url: http://example.com')
+
+
+def test_session_or_transport():
+    session = requests.Session()
+    yourls = YOURLSClient('http://example.com/yourls-api.php', session=session)
+    assert isinstance(yourls.transport, RequestsTransport)
+    assert yourls.session is session
+
+    yourls = YOURLSClient('http://example.com/yourls-api.php', transport=Transport())
+    assert yourls.session is None
+
+    with pytest.raises(TypeError):
+        YOURLSClient('http://example.com/yourls-api.php', session=session,
+                     transport=Transport())
+
+
+def test_fake_transport(server):
+    yourls = server.client(transport=server.transport())
+
+    link = yourls.shorten('http://google.com', keyword='google', title='Google')
+    assert link.shorturl == server.site + '/google'
+    assert yourls.expand('google') == 'http://google.com'
+    assert yourls.url_stats('google').url == 'http://google.com'
+
+    with pytest.raises(YOURLSURLExistsError):
+        yourls.shorten('http://google.com')
+
+    with pytest.raises(YOURLSNoLoopError):
+        yourls.shorten(link.shorturl)
+
+    with pytest.raises(YOURLSHTTPError) as exc_info:
+        yourls.expand('missing')
+    assert exc_info.value.response.status_code == 404
+
+    links, stats = yourls.stats('last', limit=2)
+    assert [link.url for link in links] == ['http://google.com',
+                                            'http://example.com/99']
+    assert stats == DBStats(total_links=101, total_clicks=5050)
+
+    links = list(yourls.iter_stats('top', limit=3))
+    assert [link.url for link in links] == ['http://example.com/0',
+                                            'http://example.com/1',
+                                            'http://example.com/2']
+
+    server.error_rate = 1
+    server.failure_mode = 'disconnect'
+    with pytest.raises(requests.ConnectionError):
+        yourls.db_stats()
+
+
+def test_httpx_transport(server):
+    pytest.importorskip('httpx')
+    from yourls.transport import HTTPXTransport
+
+    transport = HTTPXTransport()
+    yourls = server.client(transport=transport)
+
+    with server:
+        assert yourls.expand(server.keyword(5)) == 'http://example.com/5'
+
+        links = list(yourls.iter_stats('top', limit=50))
+        assert len(links) == 50
+        assert links[-1].url == 'http://example.com/49'
+
+        with pytest.raises(YOURLSHTTPError) as exc_info:
+            yourls.expand('missing')
+        assert exc_info.value.response.status_code == 404
+
+    with pytest.raises(requests.ConnectionError):
+        yourls.expand(server.keyword(5))
+
+    transport.close()
+
+
+def test_requests_transport_pool():
+    transport = RequestsTransport(pool_size=64)
+    adapter = transport.session.get_adapter('https://example.com')
+    assert adapter._pool_maxsize == 64
+
+    with pytest.raises(TypeError):
+        RequestsTransport(requests.Session(), per_thread=True)
+
+
+@responses.activate
+def test_send_query():
+    responses.add(responses.GET, 'http://example.com/yourls-api.php', json={})
+    transport = RequestsTransport()
+    session = transport.session
+    session.headers['X-Test'] = '1'
+
+    def send(query):
+        transport.send_query('http://example.com/yourls-api.php?lang=en', query)
+        return responses.calls[-1].request
+
+    request = send('a=1&b=%C3%A4')
+    assert request.url == 'http://example.com/yourls-api.php?lang=en&a=1&b=%C3%A4'
+    assert request.headers['X-Test'] == '1'
+
+    # The prepared request is reused until the templates are cleared.
+    session.headers['X-Test'] = '2'
+    assert send('a=2').headers['X-Test'] == '1'
+    transport.clear_templates()
+    assert send('a=3').headers['X-Test'] == '2'
+
+    # Sessions with cookies prepare every request.
+    session.cookies.set('name', 'value')
+    session.headers['X-Test'] = '3'
+    request = send('a=4')
+    assert request.url.endswith('?lang=en&a=4')
+    assert request.headers['X-Test'] == '3'
+    assert request.headers['Cookie'] == 'name=value'
+
+
+def test_send_query_timeout(server):
+    server.latency = lambda action: 1 if action == 'db-stats' else 0
+    transport = RequestsTransport()
+    query = 'action=db-stats&format=json&signature=6f344c2a8p'
+
+    with server:
+        with pytest.raises(requests.Timeout):
+            transport.send_query(server.apiurl, query, timeout=0.05)
+
+        # Sessions with cookies take the default path.
+        transport.session.cookies.set('name', 'value')
+        with pytest.raises(requests.Timeout):
+            transport.send_query(server.apiurl, query, timeout=0.05)
+
+    with pytest.raises(requests.Timeout):
+        server.transport().send_query(server.apiurl, query, timeout=0.05)
+    transport.close()
+
+
+def test_per_thread_sessions():
+    transport = RequestsTransport(per_thread=True)
+    sessions = []
+
+    def get_session():
+        sessions.append(transport.session)
+        assert transport.session is sessions[-1]
+
+    threads = [threading.Thread(target=get_session) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    get_session()
+
+    assert len(set(map(id, sessions))) == 5
+    transport.close()
+
+
+def test_per_thread_sessions_closed():
+    transport = RequestsTransport(per_thread=True)
+    closed = []
+
+    def get_session():
+        session = transport.session
+        session.close = lambda: closed.append(True)
+
+    for _ in range(3):
+        thread = threading.Thread(target=get_session)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    # Sessions of threads that have exited are closed and discarded.
+    assert closed == [True] * 3
+    assert len(transport._sessions) == 0
+
+    session = transport.session
+    assert list(transport._sessions) == [session]
+    transport.close()
+
+
+@pytest.mark.parametrize('options', [dict(pool_size=64), dict(per_thread=True)])
+def test_concurrent_requests(server, options):
+    transport = RequestsTransport(**options)
+    yourls = server.client(transport=transport)
+    metrics = yourls.enable_metrics()
+    calls = []
+
+    def expand(i):
+        # Registering hooks doesn't disturb requests in other threads.
+        hook = lambda **kwargs: calls.append(i)  # noqa: E731
+        yourls.register_hook('after_response', hook)
+        url = yourls.expand(server.keyword(i % 100))
+        assert yourls.deregister_hook('after_response', hook)
+        return url
+
+    with server:
+        urls = list(imap_ordered(expand, range(640), workers=64))
+
+    assert urls == ['http://example.com/{}'.format(i % 100) for i in range(640)]
+    assert metrics.snapshot()['expand']['requests'] == 640
+    assert 0 < len(calls) <= 640 * 64
+    assert yourls.hooks['after_response'] == [metrics._after_response]
+    assert server.connections <= 64
+    transport.close()
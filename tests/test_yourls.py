@@ -2,15 +2,22 @@
 from __future__ import absolute_import, division, print_function
 
 import datetime
+import gc
+import hashlib
+import json
+import time
 
 import pytest
 import requests
 import responses
-from responses import GET
+from responses import GET, POST
 from yourls import (
     DBStats, ShortenedURL, YOURLSAPIError, YOURLSClient, YOURLSHTTPError,
     YOURLSKeywordExistsError, YOURLSNoLoopError, YOURLSNoURLError,
     YOURLSURLExistsError)
+from six.moves.urllib.parse import parse_qsl
+from yourls.data import _iter_json_links
+from yourls.transport import Transport, TransportResponse
 
 
 @pytest.yield_fixture(scope='module')
@@ -525,3 +532,342 @@ def test_unknown_errors(yourls):
 
     with pytest.raises(requests.HTTPError):
         yourls.shorten('http://google.com')
+
+
+@responses.activate
+def test_iter_stats(yourls):
+    params = dict(action='stats', filter='last', limit=2, start=10)
+
+    json_response = {
+        'message': 'success',
+        'links': {
+            'link_1': {
+                'shorturl': 'http://example.com/abcde',
+                'title': 'Google',
+                'url': 'http://google.com',
+                'timestamp': '2014-09-08 20:30:17',
+                'ip': '203.0.113.0',
+                'clicks': '789'
+            },
+            'link_2': {
+                'shorturl': 'http://example.com/abc45',
+                'title': 'BBC News: "link_3": {}',
+                'url': 'https://www.bbc.co.uk/news',
+                'timestamp': '2014-12-19 16:26:39',
+                'ip': '203.0.113.0',
+                'clicks': '1364'
+            }
+        },
+        'stats': {
+            'total_links': '200',
+            'total_clicks': '5000'
+        },
+        'statusCode': 200
+    }
+
+    query_url = make_url(yourls, params=params)
+    responses.add(GET, query_url, json=json_response, status=200,
+                  match_querystring=True)
+
+    links = list(yourls.iter_stats(filter='last', limit=2, start=10))
+
+    assert links == [
+        ShortenedURL(
+            shorturl='http://example.com/abcde',
+            url='http://google.com',
+            title='Google',
+            date=datetime.datetime(2014, 9, 8, 20, 30, 17),
+            ip='203.0.113.0',
+            clicks=789,
+            keyword=None),
+        ShortenedURL(
+            shorturl='http://example.com/abc45',
+            url='https://www.bbc.co.uk/news',
+            title='BBC News: "link_3": {}',
+            date=datetime.datetime(2014, 12, 19, 16, 26, 39),
+            ip='203.0.113.0',
+            clicks=1364,
+            keyword=None),
+    ]
+
+
+def test_iter_json_links_small_chunks():
+    document = json.dumps({
+        'links': {
+            'link_1': {'url': u'http://example.com/é', 'clicks': '1'},
+            'link_2': {'url': 'http://example.com/b', 'clicks': '2'},
+        },
+        'stats': {'total_links': '2', 'total_clicks': '3'},
+    }, sort_keys=True)
+
+    links = list(_iter_json_links(iter(document)))
+
+    assert links == [
+        {'url': u'http://example.com/é', 'clicks': '1'},
+        {'url': 'http://example.com/b', 'clicks': '2'},
+    ]
+
+
+@responses.activate
+def test_iter_stats_errors(yourls):
+    params = dict(action='stats', filter='top', limit=0)
+
+    json_response = {
+        'message': 'success',
+        'stats': {
+            'total_links': '200',
+            'total_clicks': '5000'
+        },
+        'links': {},
+        'statusCode': 200
+    }
+
+    query_url = make_url(yourls, params=params)
+    responses.add(GET, query_url, json=json_response, status=200,
+                  match_querystring=True)
+
+    assert list(yourls.iter_stats(filter='top', limit=0)) == []
+
+    params = dict(action='stats', filter='top', limit=5)
+
+    json_response = {
+        'message': 'Error: invalid signature',
+        'errorCode': 403
+    }
+
+    query_url = make_url(yourls, params=params)
+    responses.add(GET, query_url, json=json_response, status=403,
+                  match_querystring=True)
+
+    with pytest.raises(YOURLSHTTPError):
+        yourls.iter_stats(filter='top', limit=5)
+
+    with pytest.raises(ValueError):
+        yourls.iter_stats(filter='Midnight', limit=5)
+
+
+class StreamTransport(Transport):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = []
+
+    def send_query(self, url, query, stream=False):
+        return TransportResponse(200, {}, chunks=iter(self.chunks), url=url,
+                                 close=lambda: self.closed.append(True))
+
+
+def test_iter_stats_unconsumed():
+    transport = StreamTransport([b'{"links": {}}'])
+    yourls = YOURLSClient('http://example.com/yourls-api.php', transport=transport)
+
+    links = yourls.iter_stats(filter='top', limit=5)
+    assert transport.closed == []
+    del links
+    gc.collect()
+    assert transport.closed == [True]
+
+
+def test_iter_stats_truncated_utf8():
+    document = json.dumps({'links': {'link_1': {
+        'shorturl': 'http://example.com/abcde', 'url': u'http://example.com/é',
+        'title': 'Title', 'timestamp': '2014-09-08 20:30:17', 'ip': '203.0.113.0',
+        'clicks': '1'}}}).encode('utf-8')
+    transport = StreamTransport([document[:-2], document[-2:] + b'\xc3'])
+    yourls = YOURLSClient('http://example.com/yourls-api.php', transport=transport)
+
+    with pytest.raises(UnicodeDecodeError):
+        list(yourls.iter_stats(filter='top', limit=5))
+    assert transport.closed == [True]
+
+
+@responses.activate
+def test_hooks():
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                          signature='6f344c2a8p')
+
+    events = []
+
+    def make_hook(event):
+        def hook(**kwargs):
+            events.append((event, kwargs))
+        return hook
+
+    for event in ('before_request', 'after_response', 'on_error'):
+        yourls.register_hook(event, make_hook(event))
+
+    with pytest.raises(ValueError):
+        yourls.register_hook('after_request', make_hook('after_request'))
+
+    params = dict(action='expand', shorturl='abcde')
+    json_response = {'longurl': 'http://google.com'}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=200, match_querystring=True)
+
+    params = dict(action='expand', shorturl='vwxyz')
+    json_response = {'message': 'Error: short URL not found', 'errorCode': 404}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=404, match_querystring=True)
+
+    assert yourls.expand('abcde') == 'http://google.com'
+    with pytest.raises(YOURLSHTTPError) as exc_info:
+        yourls.expand('vwxyz')
+
+    assert [event for event, _ in events] == [
+        'before_request', 'after_response', 'before_request', 'on_error']
+
+    assert events[0][1] == {
+        'action': 'expand', 'params': {'action': 'expand', 'shorturl': 'abcde'}}
+
+    kwargs = events[1][1]
+    assert kwargs['action'] == 'expand'
+    assert kwargs['status_code'] == 200
+    assert kwargs['nbytes'] == len(b'{"longurl": "http://google.com"}')
+    assert kwargs['duration'] >= 0
+
+    kwargs = events[3][1]
+    assert kwargs['status_code'] == 404
+    assert kwargs['exception'] is exc_info.value
+
+    # Unregistered hooks are no longer called.
+    del events[:]
+    for event, hooks in yourls.hooks.items():
+        for hook in list(hooks):
+            assert yourls.deregister_hook(event, hook)
+    assert not yourls.deregister_hook('on_error', make_hook('on_error'))
+
+    yourls.expand('abcde')
+    assert events == []
+
+
+@responses.activate
+def test_profiling():
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                          signature='6f344c2a8p')
+    profiler = yourls.enable_profiling()
+    assert yourls.profiler is profiler
+
+    params = dict(action='db-stats')
+    json_response = {'db-stats': {'total_clicks': '383', 'total_links': '34'},
+                     'message': 'success', 'statusCode': 200}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=200, match_querystring=True)
+
+    params = dict(action='expand', shorturl='vwxyz')
+    json_response = {'message': 'Error: short URL not found', 'errorCode': 404}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=404, match_querystring=True)
+
+    yourls.db_stats()
+    yourls.db_stats()
+    with pytest.raises(YOURLSHTTPError):
+        yourls.expand('vwxyz')
+
+    summary = profiler.summary()
+    assert summary['db-stats']['calls'] == 2
+    assert set(summary['db-stats']['phases']) == {
+        'wait', 'download', 'decode', 'validate', 'construct'}
+    assert summary['expand']['calls'] == 1
+    assert 'construct' not in summary['expand']['phases']
+
+    assert 'db-stats' in profiler.format()
+
+    yourls.disable_profiling()
+    yourls.db_stats()
+    assert profiler.summary()['db-stats']['calls'] == 2
+
+
+@responses.activate
+def test_post_actions():
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                          signature='6f344c2a8p', post_actions=['shorturl'])
+    assert yourls.post_actions == {'shorturl'}
+
+    url = 'http://example.com/?utm_source=' + 'x' * 5000
+    json_response = {
+        'message': url + ' added to database',
+        'shorturl': 'http://example.com/abcde',
+        'url': {'keyword': 'abcde', 'url': url, 'title': 'Example',
+                'date': '2015-10-31 14:31:04', 'ip': '203.0.113.1'},
+        'status': 'success', 'statusCode': 200, 'title': 'Example'}
+    responses.add(POST, yourls.apiurl, json=json_response, status=200,
+                  match_querystring=True)
+
+    params = dict(action='expand', shorturl='abcde')
+    json_response = {'keyword': 'abcde', 'longurl': url, 'message': 'success',
+                     'shorturl': 'http://example.com/abcde', 'statusCode': 200}
+    responses.add(GET, make_url(yourls, params=params), json=json_response,
+                  status=200, match_querystring=True)
+
+    assert yourls.shorten(url).url == url
+    assert yourls.expand('abcde') == url
+
+    request = responses.calls[0].request
+    assert request.url == yourls.apiurl
+    assert dict(parse_qsl(request.body)) == dict(
+        action='shorturl', url=url, signature='6f344c2a8p', format='json')
+
+
+@responses.activate
+def test_request_template():
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php?lang=en',
+                          username='user', password='pass')
+
+    json_response = {'keyword': 'abcde', 'longurl': 'http://example.com/ä',
+                     'message': 'success', 'shorturl': 'http://example.com/abcde',
+                     'statusCode': 200}
+    responses.add(GET, 'http://example.com/yourls-api.php', json=json_response,
+                  status=200)
+    responses.add(GET, 'http://example.org/yourls-api.php', json=json_response,
+                  status=200)
+
+    yourls.expand(u'äbcde')
+    yourls.apiurl = 'http://example.org/yourls-api.php'
+    yourls.expand('abcde')
+
+    first, second = [call.request.url for call in responses.calls]
+    assert first.startswith('http://example.com/yourls-api.php?lang=en&')
+    assert dict(parse_qsl(first.split('?')[1])) == dict(
+        lang='en', action='expand', shorturl=u'äbcde', username='user',
+        password='pass', format='json')
+
+    assert second.startswith('http://example.org/yourls-api.php?')
+    assert dict(parse_qsl(second.split('?')[1])) == dict(
+        action='expand', shorturl='abcde', username='user', password='pass',
+        format='json')
+
+
+@responses.activate
+def test_signature_lifetime(monkeypatch):
+    now = [1500000000.5]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+
+    yourls = YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                          signature='6f344c2a8p', signature_lifetime=3600)
+
+    json_response = {'keyword': 'abcde', 'longurl': 'http://example.com',
+                     'message': 'success', 'shorturl': 'http://example.com/abcde',
+                     'statusCode': 200}
+    responses.add(GET, yourls.apiurl, json=json_response, status=200)
+
+    def sent_auth():
+        query = dict(parse_qsl(responses.calls[-1].request.url.split('?')[1]))
+        return query['timestamp'], query['signature']
+
+    def token(timestamp):
+        return hashlib.md5((timestamp + '6f344c2a8p').encode('utf-8')).hexdigest()
+
+    yourls.expand('abcde')
+    assert sent_auth() == ('1500000000', token('1500000000'))
+
+    # Token is reused until it expires.
+    now[0] += 3599
+    yourls.expand('abcde')
+    assert sent_auth() == ('1500000000', token('1500000000'))
+
+    now[0] += 1
+    yourls.expand('abcde')
+    assert sent_auth() == ('1500003600', token('1500003600'))
+
+    with pytest.raises(TypeError):
+        YOURLSClient(apiurl='http://example.com/yourls-api.php',
+                     username='user', password='pass', signature_lifetime=3600)
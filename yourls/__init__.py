@@ -1,12 +1,8 @@
 # coding: utf-8
 from __future__ import absolute_import, division, print_function
 
-from .core import YOURLSAPIMixin, YOURLSClient, YOURLSClientBase
-from .data import DBStats, ShortenedURL
-from .exceptions import (
-    YOURLSAPIError, YOURLSHTTPError, YOURLSKeywordExistsError,
-    YOURLSNoLoopError, YOURLSNoURLError, YOURLSURLExistsError)
-from .log import logger
+import sys
+from importlib import import_module
 
 __author__ = 'Frazer McLean <frazer@frazermclean.co.uk>'
 __version__ = '1.2.3'
@@ -16,7 +12,9 @@ __description__ = 'Python client for YOURLS.'
 __all__ = (
     'DBStats',
     'logger',
+    'LongURL',
     'ShortenedURL',
+    'StaleURL',
     'YOURLSAPIError',
     'YOURLSAPIMixin',
     'YOURLSClient',
@@ -27,3 +25,54 @@ __all__ = (
     'YOURLSNoURLError',
     'YOURLSURLExistsError',
 )
+
+# Map names in __all__ to the submodule they're defined in.
+_exported_names = {
+    'DBStats': 'data',
+    'logger': 'log',
+    'LongURL': 'data',
+    'ShortenedURL': 'data',
+    'StaleURL': 'data',
+    'YOURLSAPIError': 'exceptions',
+    'YOURLSAPIMixin': 'core',
+    'YOURLSClient': 'core',
+    'YOURLSClientBase': 'core',
+    'YOURLSHTTPError': 'exceptions',
+    'YOURLSKeywordExistsError': 'exceptions',
+    'YOURLSNoLoopError': 'exceptions',
+    'YOURLSNoURLError': 'exceptions',
+    'YOURLSURLExistsError': 'exceptions',
+}
+
+# Submodules that can be used as attributes after ``import yourls``.
+_lazy_submodules = frozenset([
+    'batch', 'cache', 'config', 'core', 'data', 'exceptions', 'export', 'fake',
+    'journal', 'log', 'metrics', 'profiling', 'reverse_index', 'server',
+    'snapshot', 'transport',
+])
+
+
+def _import_name(name):
+    module = import_module('.' + _exported_names[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info >= (3, 7):
+    # Submodules import requests, logbook, etc., which is slow. Import them
+    # when a name is first used, so that e.g. the CLI starts quickly.
+    def __getattr__(name):
+        if name in _exported_names:
+            return _import_name(name)
+        if name in _lazy_submodules:
+            # Importing the submodule also sets it as an attribute.
+            return import_module('.' + name, __name__)
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
+else:
+    for _name in __all__:
+        _import_name(_name)
@@ -1,15 +1,14 @@
 # coding: utf-8
 from __future__ import absolute_import, division, print_function
 
-import os.path
+import json
 import shutil
-import sys
 import textwrap
 from contextlib import contextmanager
 
 import click
-import requests
-from yourls import YOURLSAPIError, YOURLSClient, YOURLSURLExistsError
+import six
+from yourls.config import get_value
 
 """yourls
 
@@ -19,6 +18,12 @@ Usage:
   yourls url-stats <shorturl>
   yourls stats <filter> <limit> [--start <start>]
   yourls db-stats
+  yourls export <path> [--format <format> --filter <filter> --resume]
+  yourls shorten-batch [<input>] [--workers <n> --format <format> --journal <path>]
+  yourls expand-batch [<input>] [--workers <n> --format <format>]
+  yourls url-stats-batch [<input>] [--workers <n> --format <format>]
+  yourls shell [<input>]
+  yourls serve [--socket <path>]
 
 Options:
   -k <keyword>, --keyword <keyword>
@@ -26,47 +31,33 @@ Options:
   -s <start>, --start <start>  Filter start number
 """
 
-if sys.version_info >= (3, 2):
-    from configparser import ConfigParser, NoOptionError, NoSectionError
-else:
-    try:
-        from ConfigParser import (
-            SafeConfigParser as ConfigParser, NoOptionError, NoSectionError)
-    except ImportError:
-        from configparser import (
-            SafeConfigParser as ConfigParser, NoOptionError, NoSectionError)
-
-
-config = ConfigParser()
-config_paths = ['.yourls', os.path.expanduser('~/.yourls')]
-config.read(config_paths)
+# Importing yourls submodules (and therefore requests, logbook, etc.) is slow
+# relative to the time taken by most commands, so they are imported by the
+# commands that need them.
 
 
 def config_value(name):
     """Return callable that returns config value if it exists."""
     def get():
-        try:
-            return config.get('yourls', name)
-        except (NoOptionError, NoSectionError):
-            return None
+        return get_value(name)
     return get
 
 
 @contextmanager
 def catch_exceptions():
+    import requests
+    from yourls import YOURLSAPIError
+
     try:
         yield
     except (YOURLSAPIError, requests.RequestException) as exc:
-        error_msg = exc.args[0]
+        error_msg = six.text_type(exc.args[0])
         # Prevent duplicate "Error: ", because Click adds it too.
         error_msg = error_msg.replace('Error: ', '')
         raise click.ClickException(error_msg)
 
 
-def format_shorturl(shorturl):
-    title = shorturl.title.replace('"', r'\"')
-
-    fstring = textwrap.dedent(u"""
+SHORTURL_TEMPLATE = textwrap.dedent(u"""
     {s.shorturl}
       url:    {url}
       title:  {title}
@@ -75,20 +66,274 @@ def format_shorturl(shorturl):
       clicks: {s.clicks}
     """).strip()
 
+_textwrappers = {}
+
+
+def terminal_columns():
     try:
         terminal_size = shutil.get_terminal_size(fallback=(80, 20))
-        columns = terminal_size.columns
+        return terminal_size.columns
     except AttributeError:
-        columns = 80
+        return 80
+
 
-    indent = len('  clicks: ')  # longest row
-    width = columns - indent
-    textwrapper = textwrap.TextWrapper(
-        width=width, initial_indent='', subsequent_indent=' ' * indent)
+def get_textwrapper(columns):
+    """Return cached :class:`textwrap.TextWrapper` for terminal width."""
+    try:
+        return _textwrappers[columns]
+    except KeyError:
+        indent = len('  clicks: ')  # longest row
+        width = columns - indent
+        textwrapper = textwrap.TextWrapper(
+            width=width, initial_indent='', subsequent_indent=' ' * indent)
+        _textwrappers[columns] = textwrapper
+        return textwrapper
+
+
+def format_shorturl(shorturl, columns=None):
+    """Format :class:`~yourls.data.ShortenedURL` for humans, wrapped to the
+    terminal width. Pass `columns` to avoid looking up the terminal size when
+    formatting many links.
+    """
+    if columns is None:
+        columns = terminal_columns()
+
+    textwrapper = get_textwrapper(columns)
     url = textwrapper.fill(shorturl.url)
     title = textwrapper.fill(shorturl.title)
 
-    return fstring.format(s=shorturl, url=url, title=title)
+    return SHORTURL_TEMPLATE.format(s=shorturl, url=url, title=title)
+
+
+def shorturl_json(shorturl):
+    from yourls.data import _shortened_url_to_json
+    return _shortened_url_to_json(shorturl)
+
+
+def shorturl_fields(shorturl):
+    return (shorturl.shorturl, shorturl.url, shorturl.title, shorturl.date,
+            shorturl.ip, shorturl.clicks, shorturl.keyword)
+
+
+def dbstats_fields(dbstats):
+    return dbstats.total_clicks, dbstats.total_links
+
+
+def dbstats_json(dbstats):
+    return dict(total_clicks=dbstats.total_clicks, total_links=dbstats.total_links)
+
+
+class RecordWriter(object):
+    """Write records to stdout as TSV, JSON Lines, or a streamed JSON array.
+
+    Lines are buffered and written with one :func:`click.echo` call per
+    `buffer_size` characters, rather than one (flushed) write per record.
+    """
+    def __init__(self, format, json_header=u'[', json_footer=u']',
+                 buffer_size=65536):
+        self.format = format
+        self.json_header = json_header
+        self.json_footer = json_footer
+        self.buffer_size = buffer_size
+        self._lines = []
+        self._size = 0
+        self._pending = None
+
+        if format == 'json':
+            self.write_line(json_header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.flush()
+
+    def write(self, record, to_json, to_fields):
+        if self.format == 'tsv':
+            self.write_line(tsv_line(to_fields(record)))
+        elif self.format == 'jsonl':
+            self.write_line(json.dumps(to_json(record), sort_keys=True))
+        else:
+            # Hold back one item so we know whether it needs a comma.
+            if self._pending is not None:
+                self.write_line(self._pending + u',')
+            self._pending = json.dumps(to_json(record), sort_keys=True)
+
+    def write_line(self, line):
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            click.echo(u'\n'.join(self._lines))
+            self._lines = []
+            self._size = 0
+
+    def close(self):
+        if self.format == 'json':
+            if self._pending is not None:
+                self.write_line(self._pending)
+                self._pending = None
+            self.write_line(self.json_footer)
+        self.flush()
+
+
+def echo_record(record, format, to_json, to_fields):
+    """Write single record in a machine-readable format."""
+    if format == 'tsv':
+        click.echo(tsv_line(to_fields(record)))
+    else:
+        click.echo(json.dumps(to_json(record), sort_keys=True))
+
+
+def entry_fields(entry):
+    shorturl = entry.link.shorturl if entry.link is not None else None
+    return entry.status, entry.url, shorturl, entry.message
+
+
+def entry_json(entry):
+    shorturl = entry.link.shorturl if entry.link is not None else None
+    return dict(status=entry.status, url=entry.url, keyword=entry.keyword,
+                title=entry.title, shorturl=shorturl, message=entry.message)
+
+
+def read_batch_items(lines):
+    """Parse lines of ``url[<tab>keyword[<tab>title]]``, skipping blanks."""
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            yield tuple(line.split('\t', 2))
+
+
+def read_lines(lines):
+    """Yield stripped, non-blank lines."""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line
+
+
+# Number of distinct lines whose results are remembered by batch commands.
+QUERY_CACHE_SIZE = 10000
+
+
+def cached_query(query, maxsize=QUERY_CACHE_SIZE):
+    """Return function which calls `query` once for items repeated within the
+    last `maxsize` distinct items, and returns the same result for repeats.
+
+    Repeats that arrive while the first call is still running wait for its
+    result, so the function can be used with
+    :func:`~yourls.batch.imap_ordered`.
+    """
+    from collections import OrderedDict
+    from concurrent.futures import Future
+    from threading import Lock
+
+    results = OrderedDict()
+    lock = Lock()
+
+    def cached(item):
+        with lock:
+            future = results.pop(item, None)
+            owner = future is None
+            if owner:
+                future = Future()
+            results[item] = future
+            if len(results) > maxsize:
+                results.popitem(last=False)
+
+        if owner:
+            try:
+                future.set_result(query(item))
+            except BaseException as exc:
+                future.set_exception(exc)
+                raise
+        return future.result()
+    return cached
+
+
+def tsv_line(fields):
+    return u'\t'.join(u'' if field is None else
+                      six.text_type(field).replace('\t', ' ').replace('\n', ' ')
+                      for field in fields)
+
+
+def mount_pool(yourls, size):
+    """Allow `size` concurrent connections from the client's session."""
+    import requests.adapters
+
+    if yourls.session is None:
+        # Transport manages its own connections.
+        return
+
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=size)
+    yourls.session.mount('http://', adapter)
+    yourls.session.mount('https://', adapter)
+
+
+def batch_query(func):
+    """Return function which calls `func` and catches API errors, for use with
+    :func:`~yourls.batch.imap_ordered`.
+    """
+    from yourls import YOURLSAPIError
+
+    def query(short):
+        try:
+            return short, func(short), None
+        except YOURLSAPIError as exc:
+            return short, None, exc.args[0]
+    return query
+
+
+def batch_options(f):
+    f = click.argument('input', type=click.File('r'), default='-')(f)
+    f = click.option('--workers', '-w', type=click.IntRange(min=1), default=8,
+                     show_default=True, help='Number of concurrent requests.')(f)
+    f = click.option('--format', '-f', 'format',
+                     type=click.Choice(('tsv', 'jsonl', 'json')),
+                     default='tsv', show_default=True)(f)
+    return f
+
+
+def format_option(f):
+    return click.option(
+        '--format', '-f', 'format',
+        type=click.Choice(('human', 'json', 'jsonl', 'tsv')), default='human',
+        show_default=True,
+        help='Output format. Machine-readable formats are not wrapped.')(f)
+
+
+def warn_if_stale(result):
+    if getattr(result, 'stale', False):
+        click.echo(u'Warning: server unavailable, using offline snapshot.', err=True)
+
+
+_clients = {}
+
+# Commands that don't use a client.
+LOCAL_COMMANDS = ('serve', 'resolve', 'find-url')
+
+
+def get_client(apiurl, signature, username, password):
+    """Return :class:`~yourls.core.YOURLSClient`, reusing an existing client
+    (and its connections) for the same parameters. This matters for commands
+    run by ``yourls serve``.
+    """
+    key = (apiurl, signature, username, password)
+    try:
+        return _clients[key]
+    except KeyError:
+        from yourls import YOURLSClient
+
+        client = YOURLSClient(apiurl=apiurl, signature=signature,
+                              username=username, password=password)
+        _clients[key] = client
+        return client
 
 
 def format_dbstats(dbstats):
@@ -101,8 +346,18 @@ def format_dbstats(dbstats):
 @click.option('--signature', default=config_value('signature'))
 @click.option('--username', default=config_value('username'))
 @click.option('--password', default=config_value('password'))
+@click.option('--profile', is_flag=True,
+              help='Print time spent in each phase of API calls at exit.')
+@click.option('--offline-snapshot', type=click.Path(exists=True, dir_okay=False),
+              default=config_value('offline_snapshot'),
+              help='Snapshot used by expand and url-stats if the server is '
+                   'unavailable.')
+@click.option('--reverse-index', type=click.Path(dir_okay=False),
+              default=config_value('reverse_index'),
+              help='Reverse index to add shortened URLs to.')
 @click.pass_context
-def cli(ctx, apiurl, signature, username, password):
+def cli(ctx, apiurl, signature, username, password, profile, offline_snapshot,
+        reverse_index):
     """Command line interface for YOURLS.
 
     Configuration parameters can be passed as switches or stored in .yourls or
@@ -122,17 +377,45 @@ def cli(ctx, apiurl, signature, username, password):
     apiurl = http://example.com/yourls-api.php
     signature = abcdefghij
     """
+    if ctx.invoked_subcommand in LOCAL_COMMANDS:
+        return
+
     if apiurl is None:
         raise click.UsageError("apiurl missing. See 'yourls --help'")
 
-    auth_params = dict(signature=signature, username=username, password=password)
-
     try:
-        ctx.obj = YOURLSClient(apiurl=apiurl, **auth_params)
+        ctx.obj = get_client(apiurl, signature=signature, username=username,
+                             password=password)
     except TypeError:
         raise click.UsageError("authentication paremeters overspecified. "
                                "See 'yourls --help'")
 
+    if profile:
+        yourls = ctx.obj
+        profiler = yourls.enable_profiling()
+
+        def print_profile():
+            click.echo(u'\nAPI call profile (ms per call):', err=True)
+            click.echo(profiler.format(), err=True)
+            yourls.disable_profiling()
+
+        ctx.call_on_close(print_profile)
+
+    if offline_snapshot is not None:
+        yourls = ctx.obj
+        snapshot = yourls.enable_offline(offline_snapshot)
+
+        def close_snapshot():
+            yourls.disable_offline()
+            snapshot.close()
+
+        ctx.call_on_close(close_snapshot)
+
+    if reverse_index is not None:
+        yourls = ctx.obj
+        yourls.enable_reverse_index(reverse_index)
+        ctx.call_on_close(yourls.disable_reverse_index)
+
 
 @cli.command()
 @click.argument('url')
@@ -143,8 +426,12 @@ def cli(ctx, apiurl, signature, username, password):
                    "(Default: allow existing)")
 @click.option('--simple', '-s', is_flag=True,
               help='Print short URL instead of full ShortenedURL object')
+@format_option
 @click.pass_obj
-def shorten(yourls, url, keyword, title, only_new, simple):
+def shorten(yourls, url, keyword, title, only_new, simple, format):
+    import requests
+    from yourls import YOURLSAPIError, YOURLSURLExistsError
+
     new = True
     try:
         shorturl = yourls.shorten(url, keyword=keyword, title=title)
@@ -156,6 +443,14 @@ def shorten(yourls, url, keyword, title, only_new, simple):
     except (YOURLSAPIError, requests.RequestException) as exc:
         raise click.ClickException(exc.args[0])
 
+    if format != 'human':
+        status = u'new' if new else u'exists'
+        echo_record(
+            shorturl, format,
+            to_json=lambda s: dict(status=status, link=shorturl_json(s)),
+            to_fields=lambda s: (status,) + shorturl_fields(s))
+        return
+
     if simple:
         linkstr = shorturl.shorturl
     else:
@@ -175,49 +470,385 @@ def shorten(yourls, url, keyword, title, only_new, simple):
 def expand(yourls, shorturl):
     with catch_exceptions():
         longurl = yourls.expand(shorturl)
+    warn_if_stale(longurl)
     click.echo(longurl)
 
 
 @cli.command('url-stats')
 @click.argument('shorturl')
+@format_option
 @click.pass_obj
-def url_stats(yourls, shorturl):
+def url_stats(yourls, shorturl, format):
     with catch_exceptions():
         shorturl = yourls.url_stats(shorturl)
+    warn_if_stale(shorturl)
+
+    if format != 'human':
+        echo_record(shorturl, format, to_json=shorturl_json,
+                    to_fields=shorturl_fields)
+        return
 
     linkstr = format_shorturl(shorturl)
     click.echo(linkstr)
 
 
-@cli.command(help="Filter links by 'top', 'bottom', 'rand', or 'last'")
+@cli.command()
 @click.argument('filter', type=click.Choice(('top', 'bottom', 'rand', 'last')))
 @click.argument('limit', type=int)
 @click.option('--start', '-b', type=int)
 @click.option('--simple', '-s', is_flag=True,
               help='Print short URLs instead of full ShortenedURL objects')
+@format_option
 @click.pass_obj
-def stats(yourls, filter, limit, start, simple):
+def stats(yourls, filter, limit, start, simple, format):
+    """Filter links by 'top', 'bottom', 'rand', or 'last'.
+
+    The jsonl and tsv formats contain one link per line, without the
+    database statistics.
+    """
     with catch_exceptions():
         links, stats = yourls.stats(filter=filter, limit=limit, start=start)
-    click.echo(format_dbstats(stats))
-    for link in links:
-        if simple:
-            linkstr = link.shorturl
-        else:
-            linkstr = format_shorturl(link)
-        click.echo(linkstr)
+
+    if format != 'human':
+        json_header = u'{{"stats": {}, "links": ['.format(
+            json.dumps(dbstats_json(stats), sort_keys=True))
+        with RecordWriter(format, json_header=json_header,
+                          json_footer=u']}') as writer:
+            for link in links:
+                writer.write(link, to_json=shorturl_json,
+                             to_fields=shorturl_fields)
+        return
+
+    columns = terminal_columns()
+    with RecordWriter(format) as writer:
+        writer.write_line(format_dbstats(stats))
+        for link in links:
+            if simple:
+                linkstr = link.shorturl
+            else:
+                linkstr = format_shorturl(link, columns=columns)
+            writer.write_line(linkstr)
 
 
 @cli.command('db-stats')
+@format_option
 @click.pass_obj
-def db_stats(yourls):
+def db_stats(yourls, format):
     with catch_exceptions():
         stats = yourls.db_stats()
+
+    if format != 'human':
+        echo_record(stats, format, to_json=dbstats_json, to_fields=dbstats_fields)
+        return
+
     click.echo(format_dbstats(stats))
 
 
+@cli.command(help="Export all links to a CSV, JSON Lines, or SQLite file.")
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', '-f', 'format', type=click.Choice(('csv', 'jsonl', 'sqlite')),
+              default='csv', show_default=True)
+@click.option('--filter', type=click.Choice(('top', 'bottom', 'last')),
+              default='last', show_default=True,
+              help='Order in which links are paged through.')
+@click.option('--page-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Number of links fetched per request.')
+@click.option('--resume', is_flag=True,
+              help='Continue from the number of links already in PATH.')
+@click.pass_obj
+def export(yourls, path, format, filter, page_size, resume):
+    from yourls.export import export_links
+
+    with catch_exceptions():
+        total = export_links(yourls, path, format=format, filter=filter,
+                             page_size=page_size, resume=resume)
+    click.echo(u'Exported {} links to {}'.format(total, path), err=True)
+
+
+@cli.command(help="Save all links to a snapshot file for --offline-snapshot.")
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--page-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Number of links fetched per request.')
+@click.pass_obj
+def snapshot(yourls, path, page_size):
+    from yourls.snapshot import build_snapshot
+
+    with catch_exceptions():
+        total = build_snapshot(yourls, path, page_size=page_size)
+    click.echo(u'Saved {} links to {}'.format(total, path), err=True)
+
+
+@cli.command(help="Save keywords and long URLs to an index file for resolve.")
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--page-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Number of links fetched per request.')
+@click.pass_obj
+def index(yourls, path, page_size):
+    from yourls.snapshot import build_index
+
+    with catch_exceptions():
+        total = build_index(yourls, path, page_size=page_size)
+    click.echo(u'Indexed {} links in {}'.format(total, path), err=True)
+
+
+@cli.command()
+@click.argument('index', type=click.Path(exists=True, dir_okay=False))
+@click.argument('input', type=click.File('r'), default='-')
+@click.option('--format', '-f', 'format', type=click.Choice(('tsv', 'jsonl', 'json')),
+              default='tsv', show_default=True)
+def resolve(index, input, format):
+    """Look up short URLs or keywords read from INPUT (default: stdin) in an
+    INDEX written by the index command, without using the API.
+
+    Results are written in input order, as tab-separated short URL and long
+    URL, or as JSON. The long URL is empty if it isn't in the index.
+    """
+    from yourls.snapshot import KeywordIndex
+
+    def to_json(result):
+        short, longurl = result
+        return dict(short=short, longurl=longurl)
+
+    try:
+        index = KeywordIndex(index)
+    except ValueError as exc:
+        raise click.ClickException(exc.args[0])
+
+    with index, RecordWriter(format) as writer:
+        for line in input:
+            short = line.strip()
+            if short:
+                writer.write((short, index.get(short)), to_json=to_json,
+                             to_fields=tuple)
+
+
+@cli.command('reverse-index', help="Add all links to a reverse index for find-url.")
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--page-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Number of links fetched per request.')
+@click.pass_obj
+def reverse_index(yourls, path, page_size):
+    from yourls.reverse_index import build_reverse_index
+
+    with catch_exceptions():
+        total = build_reverse_index(yourls, path, page_size=page_size)
+    click.echo(u'Indexed {} links in {}'.format(total, path), err=True)
+
+
+@cli.command('find-url')
+@click.argument('index', type=click.Path(exists=True, dir_okay=False))
+@click.argument('url')
+@format_option
+def find_url(index, url, format):
+    """Find short URLs for a long URL in a reverse INDEX, without using the
+    API.
+
+    Exits with status 1 if URL isn't in the index.
+    """
+    from yourls.reverse_index import ReverseIndex
+
+    with ReverseIndex(index) as reverse_index:
+        links = reverse_index.find(url)
+
+    if not links:
+        raise click.ClickException(u'{} not found in {}'.format(url, index))
+
+    with RecordWriter(format) as writer:
+        if format != 'human':
+            for link in links:
+                writer.write(link, to_json=shorturl_json, to_fields=shorturl_fields)
+            return
+
+        columns = terminal_columns()
+        for link in links:
+            writer.write_line(format_shorturl(link, columns=columns))
+
+
+@cli.command('shorten-batch')
+@batch_options
+@click.option('--journal', '-j', type=click.Path(dir_okay=False),
+              help='Record outcomes in this file, and skip URLs already in it.')
+@click.option('--retry-errors', is_flag=True,
+              help='Send URLs again if the journal records an error for them.')
+@click.pass_obj
+def shorten_batch(yourls, input, workers, format, journal, retry_errors):
+    """Shorten URLs read from INPUT (default: stdin).
+
+    Each line contains a URL, optionally followed by a tab-separated keyword
+    and title. Results are written in input order, as tab-separated
+    status, URL, short URL, and error message, or as JSON.
+    """
+    from yourls.journal import ShortenJournal, shorten_all
+
+    mount_pool(yourls, workers)
+
+    items = read_batch_items(input)
+
+    with catch_exceptions():
+        if journal is not None:
+            journal = ShortenJournal(journal)
+        try:
+            with RecordWriter(format) as writer:
+                for entry in shorten_all(yourls, items, journal=journal,
+                                         retry_errors=retry_errors,
+                                         workers=workers):
+                    writer.write(entry, to_json=entry_json, to_fields=entry_fields)
+        finally:
+            if journal is not None:
+                journal.close()
+
+
+@cli.command('expand-batch')
+@batch_options
+@click.pass_obj
+def expand_batch(yourls, input, workers, format):
+    """Expand short URLs or keywords read from INPUT (default: stdin).
+
+    Repeated lines are only expanded once, and get the same result. Results are
+    written in input order, one per line, as tab-separated short URL, long URL,
+    and error message, or as JSON.
+    """
+    from yourls.batch import imap_ordered
+
+    mount_pool(yourls, workers)
+    query = cached_query(batch_query(yourls.expand))
+
+    def to_json(result):
+        short, longurl, message = result
+        return dict(short=short, longurl=longurl, message=message)
+
+    with catch_exceptions(), RecordWriter(format) as writer:
+        for result in imap_ordered(query, read_lines(input),
+                                   workers=workers):
+            writer.write(result, to_json=to_json, to_fields=tuple)
+
+
+@cli.command('url-stats-batch')
+@batch_options
+@click.pass_obj
+def url_stats_batch(yourls, input, workers, format):
+    """Get stats for short URLs or keywords read from INPUT (default: stdin).
+
+    Repeated lines are only queried once, and get the same result. Results are
+    written in input order, one per line, as tab-separated input, short URL,
+    URL, title, date, IP, clicks, keyword, and error message, or as JSON.
+    """
+    from yourls.batch import imap_ordered
+
+    mount_pool(yourls, workers)
+    query = cached_query(batch_query(yourls.url_stats))
+
+    def to_json(result):
+        short, link, message = result
+        if link is not None:
+            link = shorturl_json(link)
+        return dict(short=short, link=link, message=message)
+
+    def to_fields(result):
+        short, link, message = result
+        if link is None:
+            return (short,) + (None,) * 7 + (message,)
+        return (short,) + shorturl_fields(link) + (None,)
+
+    with catch_exceptions(), RecordWriter(format) as writer:
+        for result in imap_ordered(query, read_lines(input),
+                                   workers=workers):
+            writer.write(result, to_json=to_json, to_fields=to_fields)
+
+
+SHELL_COMMANDS = ('shorten', 'expand', 'url-stats', 'stats', 'db-stats')
+
+
+@cli.command()
+@click.argument('input', type=click.File('r'), default='-')
+@click.pass_context
+def shell(ctx, input):
+    """Run commands read line by line from INPUT (default: stdin).
+
+    Each line is a shorten, expand, url-stats, stats, or db-stats command with
+    its arguments, e.g. "expand abcde". The same client and connections are
+    used for every command. Exits with status 1 if any command failed.
+    """
+    import shlex
+
+    interactive = input.isatty()
+    failed = False
+
+    while True:
+        if interactive:
+            click.echo(u'yourls> ', nl=False, err=True)
+        line = input.readline()
+        if not line:
+            break
+
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as exc:
+            click.echo(u'Error: {}'.format(exc), err=True)
+            failed = True
+            continue
+
+        if not args:
+            continue
+        elif args[0] in ('exit', 'quit'):
+            break
+        elif args[0] not in SHELL_COMMANDS:
+            click.echo(u'Error: Unknown command "{}". Choose from {}.'.format(
+                args[0], ', '.join(SHELL_COMMANDS)), err=True)
+            failed = True
+            continue
+
+        command = cli.get_command(ctx, args[0])
+        try:
+            exit_code = command.main(args=args[1:], prog_name=args[0],
+                                     obj=ctx.obj, standalone_mode=False)
+        except click.ClickException as exc:
+            exc.show()
+            failed = True
+        except click.Abort:
+            break
+        else:
+            # Commands return None, or an exit code for e.g. --help.
+            if exit_code:
+                failed = True
+
+    if failed:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.option('--socket', 'path', type=click.Path(dir_okay=False),
+              help='Unix socket path. (Default: $YOURLS_SOCKET or ~/.yourls.sock)')
+def serve(path):
+    """Keep a client running to serve other yourls commands.
+
+    While the server is running, the shorten, expand, url-stats, stats, and
+    db-stats commands are forwarded to it, avoiding the cost of starting
+    Python, importing dependencies, and connecting to the YOURLS server.
+    """
+    import errno
+    import socket
+
+    from yourls.server import make_server, serve_forever, socket_path
+
+    if path is None:
+        path = socket_path()
+
+    try:
+        server = make_server(path)
+    except socket.error as exc:
+        if exc.errno != errno.EADDRINUSE:
+            raise
+        raise click.ClickException(exc.strerror)
+
+    click.echo(u'Listening on {}'.format(path), err=True)
+    serve_forever(server)
+
+
 def main():
-    cli(prog_name='yourls')
+    from yourls.server import main
+
+    main()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,46 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def imap_ordered(func, iterable, workers=8, window=None):
+    """Like :py:func:`map`, but call `func` concurrently in a thread pool.
+
+    Results are yielded in input order as soon as they are available. At most
+    `window` items are in flight at once, so `iterable` can be an unbounded
+    stream such as :py:data:`sys.stdin`.
+
+    Parameters:
+        func: Function to call with each item.
+        iterable: Items to process.
+        workers: Number of threads.
+        window: Maximum number of pending items. Defaults to four times
+            `workers`.
+
+    Returns:
+        Iterator of results. Exceptions raised by `func` are raised when the
+        corresponding result is reached.
+    """
+    if window is None:
+        window = workers * 4
+
+    if workers == 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in iterable:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,155 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from timeit import default_timer
+
+from . import log
+
+
+class _Entry(object):
+    __slots__ = ('value', 'fetched')
+
+    def __init__(self, value, fetched):
+        self.value = value
+        self.fetched = fetched
+
+
+class StaleWhileRevalidateCache(object):
+    """Cache that returns stored values immediately, refreshing them in the
+    background once they're older than `soft_ttl`.
+
+    Values older than `hard_ttl` aren't returned; the caller waits for a new
+    value instead. Concurrent callers waiting for the same key share one
+    fetch. If a background refresh fails, the stale value is kept until it's
+    older than `hard_ttl`, and the error is logged at ``DEBUG`` level.
+
+    Usually you will call :meth:`~yourls.core.YOURLSClientBase.enable_cache`
+    instead of creating a cache directly.
+
+    Parameters:
+        soft_ttl: Seconds after which a value is refreshed in the background.
+        hard_ttl: Seconds after which a value is no longer returned. Must not
+            be less than `soft_ttl`.
+        maxsize: Maximum number of values. When it's reached, the value that
+            was fetched longest ago is discarded.
+        clock: Function returning the current time in seconds.
+        workers: Maximum number of concurrent background refreshes.
+
+    Raises:
+        ValueError: `hard_ttl` is less than `soft_ttl`.
+    """
+    def __init__(self, soft_ttl, hard_ttl, maxsize=10000, clock=default_timer,
+                 workers=4):
+        if hard_ttl < soft_ttl:
+            raise ValueError('hard_ttl must not be less than soft_ttl.')
+
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.workers = workers
+        self._entries = OrderedDict()
+        # Futures for fetches in progress, by key.
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, key, fetch, refresh=None):
+        """Return value for `key`, calling `fetch` to get a new value if
+        needed.
+
+        Parameters:
+            key: Hashable cache key.
+            fetch: Function returning a new value.
+            refresh: Optional function used instead of `fetch` for background
+                refreshes, e.g. to send the request with a timeout.
+
+        Returns:
+            Tuple of the value and whether it was in the cache, including
+            stale values that are being refreshed.
+
+        Raises:
+            Exception: Any exception raised by `fetch` when the caller has to
+                wait for a new value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self.clock() - entry.fetched
+                if age < self.soft_ttl:
+                    return entry.value, True
+                if age < self.hard_ttl:
+                    if key not in self._pending:
+                        self._refresh_in_background(key, refresh or fetch)
+                    return entry.value, True
+
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                fetching = True
+            else:
+                fetching = False
+
+        if fetching:
+            return self._fetch(key, fetch, future), False
+        return future.result(), False
+
+    def _refresh_in_background(self, key, fetch):
+        # Must be called with lock held.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        future = self._pending[key] = Future()
+        self._executor.submit(self._background_fetch, key, fetch, future)
+
+    def _background_fetch(self, key, fetch, future):
+        try:
+            self._fetch(key, fetch, future)
+        except Exception as exc:
+            if log.debug_enabled():
+                log.debug('Background refresh of {key} failed', key=key,
+                          exception=exc)
+
+    def _fetch(self, key, fetch, future):
+        fetched = self.clock()
+        try:
+            value = fetch()
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = _Entry(value, fetched)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            del self._pending[key]
+        future.set_result(value)
+        return value
+
+    def wait(self):
+        """Wait for fetches in progress, including background refreshes, to
+        finish.
+        """
+        with self._lock:
+            futures = list(self._pending.values())
+        wait_futures(futures)
+
+    def clear(self):
+        """Discard all values."""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        """Stop the background refresh threads once refreshes in progress have
+        finished, without waiting for them.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
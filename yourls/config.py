@@ -0,0 +1,57 @@
+# coding: utf-8
+"""Configuration file handling for the command line interface.
+
+This module only uses the standard library, so that it can be imported without
+slowing down CLI startup.
+"""
+from __future__ import absolute_import, division, print_function
+
+import os.path
+import sys
+from contextlib import contextmanager
+
+if sys.version_info >= (3, 2):
+    from configparser import ConfigParser, NoOptionError, NoSectionError
+else:
+    try:
+        from ConfigParser import (
+            SafeConfigParser as ConfigParser, NoOptionError, NoSectionError)
+    except ImportError:
+        from configparser import (
+            SafeConfigParser as ConfigParser, NoOptionError, NoSectionError)
+
+config_paths = ['.yourls', '~/.yourls']
+_config = None
+_ignore_files = False
+
+
+def get_config():
+    """Return :class:`ConfigParser`, reading the config files on first use."""
+    global _config
+    if _config is None:
+        _config = ConfigParser()
+        _config.read([os.path.expanduser(path) for path in config_paths])
+    return _config
+
+
+def get_value(name):
+    """Return config value if it exists, otherwise :py:data:`None`."""
+    if _ignore_files:
+        return None
+    try:
+        return get_config().get('yourls', name)
+    except (NoOptionError, NoSectionError):
+        return None
+
+
+@contextmanager
+def ignore_files():
+    """Make :func:`get_value` return :py:data:`None` inside the ``with`` block,
+    e.g. while running a command forwarded with its own configuration.
+    """
+    global _ignore_files
+    _ignore_files = True
+    try:
+        yield
+    finally:
+        _ignore_files = False
@@ -1,16 +1,141 @@
 # coding: utf-8
 from __future__ import absolute_import, division, print_function
 
-import requests
-
+import hashlib
+import sys
+import threading
+import time
+from timeit import default_timer
+
+import requests.exceptions
+import six
+from six.moves.urllib.parse import urlencode
+
+from . import log
+from .cache import StaleWhileRevalidateCache
 from .data import (
-    DBStats, _json_to_shortened_url, _validate_yourls_response)
+    DBStats, LongURL, StaleURL, _iter_stats_links, _json_to_shortened_url,
+    _validate_yourls_response)
+from .exceptions import YOURLSURLExistsError
+from .metrics import DEFAULT_BUCKETS, MetricsCollector
+from .profiling import _NULL_PHASE, Profiler
+from .transport import RequestsTransport
+
+
+HOOKS = ('before_request', 'after_response', 'on_error')
+
+# Exceptions that may mean the server is unavailable.
+_OFFLINE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.HTTPError,
+                   requests.exceptions.Timeout)
+
+
+def _urlencode(params):
+    """Encode `params` like :py:mod:`requests`, omitting :py:data:`None`
+    values.
+    """
+    if six.PY2:
+        return urlencode([
+            (k, v.encode('utf-8') if isinstance(v, six.text_type) else v)
+            for k, v in params.items() if v is not None])
+    return urlencode([(k, v) for k, v in params.items() if v is not None])
 
 
 class YOURLSClientBase(object):
-    """Base class for YOURLS client that provides initialiser and api request method."""
-    def __init__(self, apiurl, username=None, password=None, signature=None):
+    """Base class for YOURLS client that provides initialiser and api request method.
+
+    Clients are thread-safe, so one client can be shared by many threads. The
+    client doesn't hold a lock while sending requests, and hooks can be
+    registered while other threads are sending requests. See
+    :class:`~yourls.transport.RequestsTransport` for connection pool options.
+
+    Parameters:
+        apiurl: URL of ``yourls-api.php``.
+        username: Username, if the server requires password authentication.
+        password: Password, if the server requires password authentication.
+        signature: Signature token, if the server requires token authentication.
+        signature_lifetime: Optional number of seconds. If given, `signature`
+            isn't sent. Instead, each request has a ``timestamp`` and a
+            time-limited token, which is the MD5 hash of the timestamp and
+            `signature`. A new token is generated every `signature_lifetime`
+            seconds, so this must be less than the server's
+            ``YOURLS_NONCE_LIFE`` setting (12 hours by default).
+        session: Optional :class:`requests.Session`, used for connection pooling.
+            A new session is created by default.
+        transport: Optional :class:`~yourls.transport.Transport` used to send
+            requests, instead of a :class:`~yourls.transport.RequestsTransport`
+            with `session`.
+        post_actions: Optional iterable of actions, e.g. ``['shorturl']``, to
+            send as POST requests with the parameters in a form body. Other
+            actions are sent as GET requests. The YOURLS API accepts both, and
+            POST avoids very long request lines, e.g. when shortening long
+            URLs.
+
+    .. attribute:: transport
+
+       :class:`~yourls.transport.Transport` used to send requests.
+
+    .. attribute:: hooks
+
+       Dictionary mapping each event in ``HOOKS`` to a list of callables. See
+       :meth:`register_hook`.
+
+    .. attribute:: post_actions
+
+       Set of actions sent as POST requests.
+
+    .. attribute:: metrics
+
+       :class:`~yourls.metrics.MetricsCollector`, or :py:data:`None` if
+       metrics haven't been enabled. See :meth:`enable_metrics`.
+
+    .. attribute:: cache
+
+       :class:`~yourls.cache.StaleWhileRevalidateCache` for
+       :meth:`~YOURLSAPIMixin.url_stats` and :meth:`~YOURLSAPIMixin.db_stats`,
+       or :py:data:`None` if caching hasn't been enabled. See
+       :meth:`enable_cache`.
+
+    .. attribute:: snapshot
+
+       :class:`~yourls.snapshot.Snapshot` used when the server is unavailable,
+       or :py:data:`None` if offline mode hasn't been enabled. See
+       :meth:`enable_offline`.
+
+    .. attribute:: reverse_index
+
+       :class:`~yourls.reverse_index.ReverseIndex` updated with the results
+       of :meth:`~YOURLSAPIMixin.shorten`, or :py:data:`None`. See
+       :meth:`enable_reverse_index`.
+
+    .. attribute:: profiler
+
+       :class:`~yourls.profiling.Profiler`, or :py:data:`None` if profiling
+       hasn't been enabled. See :meth:`enable_profiling`.
+    """
+    def __init__(self, apiurl, username=None, password=None, signature=None,
+                 session=None, transport=None, post_actions=(),
+                 signature_lifetime=None):
+        if session is not None and transport is not None:
+            raise TypeError('Pass either session or transport, not both.')
+
+        if transport is None:
+            transport = RequestsTransport(session)
+
         self.apiurl = apiurl
+        self.transport = transport
+        self.hooks = dict((event, []) for event in HOOKS)
+        self._hooks_lock = threading.Lock()
+        self.post_actions = set(post_actions)
+        self.metrics = None
+        self.cache = None
+        self._refresh_timeout = None
+        # Per-thread request options, e.g. the timeout for background refreshes.
+        self._local = threading.local()
+        self.snapshot = None
+        self.reverse_index = None
+        self._owns_reverse_index = False
+        self.profiler = None
+
         if username and password and signature is None:
             self._data = dict(username=username, password=password)
         elif username is None and password is None and signature:
@@ -23,14 +148,453 @@ class YOURLSClientBase(object):
                 'password or signature. Otherwise, leave set to default (None)')
 
         self._data['format'] = 'json'
+        # Encoded once, so that only the action parameters are encoded per call.
+        self._static_query = _urlencode(self._data)
+
+        self._signature = signature
+        self._signature_lifetime = signature_lifetime
+        self._token_expires = None
+        if signature_lifetime is not None:
+            if not signature:
+                raise TypeError('signature_lifetime requires signature.')
+            self._refresh_signature_token()
+
+    def _refresh_signature_token(self):
+        """Generate a new time-limited signature token if the current one is
+        older than the signature lifetime.
+        """
+        now = time.time()
+        if self._token_expires is not None and now < self._token_expires:
+            return
+
+        timestamp = int(now)
+        token = hashlib.md5(
+            (str(timestamp) + self._signature).encode('utf-8')).hexdigest()
+        self._data = dict(self._data, timestamp=timestamp, signature=token)
+        self._static_query = _urlencode(self._data)
+        self._token_expires = timestamp + self._signature_lifetime
+
+    @property
+    def session(self):
+        """:class:`requests.Session` used by the transport, or :py:data:`None`
+        if the transport doesn't use one.
+        """
+        return getattr(self.transport, 'session', None)
+
+    def register_hook(self, event, hook):
+        """Call `hook` for every API request.
+
+        Hooks are called with keyword arguments, so should accept ``**kwargs``
+        to allow more arguments to be added in future:
+
+        ``before_request``
+            ``action``, ``params``
+
+        ``after_response``
+            ``action``, ``params``, ``duration`` (seconds), ``status_code``,
+            ``nbytes``, ``retries``
+
+        ``on_error``
+            ``action``, ``params``, ``duration``, ``status_code``, ``nbytes``,
+            ``retries``, ``exception``
+
+        Each request calls either ``after_response`` or ``on_error``.
+        ``status_code`` and ``nbytes`` are :py:data:`None` if they aren't
+        known, e.g. if no response was received. ``retries`` is the number of
+        times :py:mod:`urllib3` retried the request, if a
+        :class:`urllib3.util.Retry` is mounted on the
+        :class:`~yourls.transport.RequestsTransport` session. It's ``0`` for
+        other transports, and if no response was received. `params` doesn't include
+        authentication parameters. For :meth:`~YOURLSAPIMixin.iter_stats`,
+        ``after_response`` is called when the headers have been received, and
+        ``nbytes`` is taken from the ``Content-Length`` header.
+
+        Example:
+
+            .. code-block:: python
+
+                def log_duration(action, duration, **kwargs):
+                    print(action, duration)
+
+                yourls.register_hook('after_response', log_duration)
+
+        Raises:
+            ValueError: Unknown event.
+        """
+        if event not in self.hooks:
+            raise ValueError('event must be one of {}'.format(', '.join(HOOKS)))
+        # Replace rather than mutate the list, so that requests in other
+        # threads can iterate over it without a lock.
+        with self._hooks_lock:
+            self.hooks[event] = self.hooks[event] + [hook]
+
+    def deregister_hook(self, event, hook):
+        """Remove hook previously added with :meth:`register_hook`.
+
+        Returns:
+            :py:data:`True` if the hook existed, otherwise :py:data:`False`.
+        """
+        with self._hooks_lock:
+            try:
+                hooks = list(self.hooks[event])
+                hooks.remove(hook)
+            except (KeyError, ValueError):
+                return False
+            self.hooks[event] = hooks
+            return True
+
+    def enable_metrics(self, buckets=DEFAULT_BUCKETS):
+        """Start collecting per-action request counts and latency histograms.
+
+        Parameters:
+            buckets: Upper bounds of latency histogram buckets, in seconds.
+
+        Returns:
+            :class:`~yourls.metrics.MetricsCollector`, also available as
+            :attr:`metrics`. If metrics are already enabled, the existing
+            collector is returned.
+        """
+        if self.metrics is None:
+            self.metrics = MetricsCollector(buckets)
+            self.metrics.install(self)
+        return self.metrics
+
+    def disable_metrics(self):
+        """Stop collecting metrics, discarding any that were collected."""
+        if self.metrics is not None:
+            self.metrics.uninstall(self)
+            self.metrics = None
+
+    def enable_cache(self, soft_ttl=5, hard_ttl=60, maxsize=10000,
+                     clock=default_timer, refresh_timeout=10):
+        """Cache results of :meth:`~YOURLSAPIMixin.url_stats` and
+        :meth:`~YOURLSAPIMixin.db_stats` in stale-while-revalidate mode.
+
+        Cached results are returned immediately. Once they're older than
+        `soft_ttl`, they're refreshed in a background thread, but still
+        returned until they're older than `hard_ttl`. After that, callers wait
+        for a new result. If metrics are enabled, cache hits and misses are
+        recorded.
+
+        Background refreshes time out after `refresh_timeout` seconds, so that
+        an unresponsive server doesn't keep refresh threads (and interpreter
+        exit) waiting indefinitely.
+
+        Parameters:
+            soft_ttl: Seconds after which a result is refreshed.
+            hard_ttl: Seconds after which a result is no longer returned.
+            maxsize: Maximum number of cached results.
+            clock: Function returning the current time in seconds.
+            refresh_timeout: Seconds to wait for the server during background
+                refreshes, or :py:data:`None` to use the transport's default.
+
+        Returns:
+            :class:`~yourls.cache.StaleWhileRevalidateCache`, also available as
+            :attr:`cache`. If caching is already enabled, the existing cache is
+            returned.
+        """
+        if self.cache is None:
+            self._refresh_timeout = refresh_timeout
+            self.cache = StaleWhileRevalidateCache(
+                soft_ttl, hard_ttl, maxsize=maxsize, clock=clock)
+        return self.cache
+
+    def disable_cache(self):
+        """Stop caching results, discarding any that were cached. Background
+        refreshes in progress aren't waited for.
+        """
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def _cached(self, action, key, fetch):
+        """Return result of `fetch`, using the cache if it's enabled."""
+        cache = self.cache
+        if cache is None:
+            return fetch()
+
+        def refresh():
+            return self._with_timeout(self._refresh_timeout, fetch)
+
+        # Requests that fail are cache misses.
+        hit = False
+        try:
+            value, hit = cache.get(key, fetch, refresh)
+        finally:
+            metrics = self.metrics
+            if metrics is not None:
+                metrics.record_cache(action, hit)
+        return value
+
+    def _with_timeout(self, timeout, func):
+        """Call `func`, sending requests from this thread with `timeout`."""
+        old_timeout = getattr(self._local, 'timeout', None)
+        self._local.timeout = timeout
+        try:
+            return func()
+        finally:
+            self._local.timeout = old_timeout
+
+    def enable_offline(self, snapshot):
+        """Serve :meth:`~YOURLSAPIMixin.expand` and
+        :meth:`~YOURLSAPIMixin.url_stats` from a local snapshot when the
+        server is unavailable.
+
+        If a request fails with a connection error, a timeout, or a server
+        error (HTTP 5xx), the link is looked up in `snapshot` instead. Links
+        that are found are returned as :class:`~yourls.data.StaleURL` or
+        :class:`~yourls.data.ShortenedURL` with
+        :attr:`~yourls.data.ShortenedURL.stale` set. Otherwise, the original
+        exception is raised.
+
+        Parameters:
+            snapshot: :class:`~yourls.snapshot.Snapshot`, or the path of a
+                snapshot file written by :func:`~yourls.snapshot.write_snapshot`.
+
+        Returns:
+            :class:`~yourls.snapshot.Snapshot`, also available as
+            :attr:`snapshot`.
+        """
+        from .snapshot import Snapshot
+
+        if not isinstance(snapshot, Snapshot):
+            snapshot = Snapshot(snapshot)
+        self.snapshot = snapshot
+        return snapshot
+
+    def disable_offline(self):
+        """Stop using the offline snapshot."""
+        self.snapshot = None
+
+    def _offline_link(self, short):
+        """Return stale link for `short` from the offline snapshot if the
+        exception being handled means the server is unavailable. Otherwise,
+        re-raise it.
+        """
+        exc_info = sys.exc_info()
+        snapshot = self.snapshot
+        if snapshot is not None and _server_unavailable(exc_info[1]):
+            link = snapshot.get(short)
+            if link is not None:
+                if log.debug_enabled():
+                    log.debug('Using offline snapshot for {short}', short=short,
+                              exception=exc_info[1])
+                return link
+        six.reraise(*exc_info)
+
+    def enable_reverse_index(self, index, batch_size=None):
+        """Add links returned by :meth:`~YOURLSAPIMixin.shorten`, including
+        existing links from :class:`~yourls.exceptions.YOURLSURLExistsError`,
+        to a reverse index.
+
+        Links are added with :meth:`~yourls.reverse_index.ReverseIndex.queue`,
+        so they're written immediately unless the index has a batch size. If
+        the index can't be written, a warning is logged, and
+        :meth:`~YOURLSAPIMixin.shorten` still returns the link.
+
+        Parameters:
+            index: :class:`~yourls.reverse_index.ReverseIndex`, or the path of
+                its database. An index opened from a path is closed by
+                :meth:`disable_reverse_index`.
+            batch_size: Batch size for an index opened from a path. See
+                :class:`~yourls.reverse_index.ReverseIndex`.
+
+        Returns:
+            :class:`~yourls.reverse_index.ReverseIndex`, also available as
+            :attr:`reverse_index`.
+        """
+        from .reverse_index import ReverseIndex
+
+        owned = not isinstance(index, ReverseIndex)
+        if owned:
+            index = ReverseIndex(index, batch_size=batch_size)
+        self.disable_reverse_index()
+        self.reverse_index = index
+        self._owns_reverse_index = owned
+        return index
+
+    def disable_reverse_index(self):
+        """Write queued links and stop updating the reverse index. If it was
+        opened by :meth:`enable_reverse_index`, it's closed.
+        """
+        index, self.reverse_index = self.reverse_index, None
+        if index is None:
+            return
+        if self._owns_reverse_index:
+            index.close()
+        else:
+            index.flush()
+
+    def _index_link(self, link):
+        """Add `link` to the reverse index, if enabled. The server has
+        already created the link, so errors are logged instead of raised.
+        """
+        index = self.reverse_index
+        if index is None:
+            return
+        try:
+            index.queue([link])
+        except Exception as exc:
+            log.warning('Adding {shorturl} to reverse index failed: {exception}',
+                        shorturl=link.shorturl, exception=exc)
+
+    def enable_profiling(self):
+        """Start recording the time spent in each phase of API calls.
+
+        Returns:
+            :class:`~yourls.profiling.Profiler`, also available as
+            :attr:`profiler`. If profiling is already enabled, the existing
+            profiler is returned.
+        """
+        if self.profiler is None:
+            self.profiler = Profiler()
+        return self.profiler
+
+    def disable_profiling(self):
+        """Stop profiling, discarding any recorded times."""
+        self.profiler = None
+
+    def _profile(self, action, phase):
+        """Return context manager that records time spent in `phase` if
+        profiling is enabled.
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return _NULL_PHASE
+        return profiler.phase(action, phase)
+
+    def _dispatch_hook(self, event, **kwargs):
+        for hook in self.hooks[event]:
+            hook(**kwargs)
 
     def _api_request(self, params):
-        params = params.copy()
-        params.update(self._data)
+        jsondata, _ = self._send(params)
+        return jsondata
+
+    def _api_stream(self, params):
+        """Like :meth:`_api_request`, but return the undecoded streaming
+        response. HTTP errors are raised before the body is read.
+        """
+        return self._send_stream(params)
+
+    def _send(self, params):
+        """Send request. Return JSON data and response."""
+        return self._observe(params, self._send_request, stream=False)
+
+    def _send_stream(self, params):
+        """Send request without reading the body. Return the response."""
+        return self._observe(params, self._send_stream_request, stream=True)
+
+    def _observe(self, params, send, stream):
+        """Call ``send(params)``, dispatching hooks if any are registered.
+        `stream` is true if `send` returns an unread response, rather than
+        JSON data and the response.
+        """
+        hooks = self.hooks
+        observed = hooks['before_request'] or hooks['after_response'] or hooks['on_error']
+
+        # Fast path without timing when nobody is listening.
+        if not observed:
+            return send(params)
+
+        action = params.get('action')
+        self._dispatch_hook('before_request', action=action, params=params)
+
+        start = default_timer()
+        try:
+            result = send(params)
+        except Exception as exc:
+            exc_info = sys.exc_info()
+            response = getattr(exc, 'response', None)
+            if response is not None:
+                status_code = response.status_code
+                nbytes = len(response.content)
+            else:
+                status_code = nbytes = None
+            self._dispatch_hook(
+                'on_error', action=action, params=params,
+                duration=default_timer() - start, status_code=status_code,
+                nbytes=nbytes, retries=_retry_count(response), exception=exc)
+            six.reraise(*exc_info)
+
+        duration = default_timer() - start
+        if stream:
+            response = result
+            nbytes = response.headers.get('Content-Length')
+            if nbytes is not None:
+                nbytes = int(nbytes)
+        else:
+            _, response = result
+            nbytes = len(response.content)
 
-        response = requests.get(self.apiurl, params=params)
+        self._dispatch_hook(
+            'after_response', action=action, params=params, duration=duration,
+            status_code=response.status_code, nbytes=nbytes,
+            retries=_retry_count(response))
+
+        return result
+
+    def _send_request(self, params):
+        """Send request. Return JSON data and response."""
+        if self.profiler is not None:
+            return self._send_profiled_request(params)
+
+        response = self._send_http(params)
         jsondata = _validate_yourls_response(response, params)
-        return jsondata
+        return jsondata, response
+
+    def _send_stream_request(self, params):
+        """Send request and return the response once the headers have been
+        received. The body is only read if the response is an error.
+        """
+        with self._profile(params.get('action'), 'wait'):
+            response = self._send_http(params, stream=True)
+
+        if not response.ok:
+            _validate_yourls_response(response, params)
+        return response
+
+    def _send_http(self, params, stream=False):
+        """Send `params` and the authentication parameters using the method
+        configured for the action.
+        """
+        if self._signature_lifetime is not None:
+            self._refresh_signature_token()
+
+        # Only passed when set, for transports written before it existed.
+        timeout = getattr(self._local, 'timeout', None)
+        kwargs = {} if timeout is None else dict(timeout=timeout)
+
+        if params.get('action') in self.post_actions:
+            data = params.copy()
+            data.update(self._data)
+            return self.transport.send('POST', self.apiurl, data=data, stream=stream,
+                                       **kwargs)
+
+        query = _urlencode(params) + '&' + self._static_query
+        return self.transport.send_query(self.apiurl, query, stream=stream, **kwargs)
+
+    def _send_profiled_request(self, params):
+        """Like :meth:`_send_request`, but record each phase separately."""
+        action = params.get('action')
+
+        with self._profile(action, 'wait'):
+            response = self._send_http(params, stream=True)
+
+        with self._profile(action, 'download'):
+            response.content
+
+        with self._profile(action, 'decode'):
+            try:
+                jsondata = response.json()
+            except ValueError:
+                # Let validation raise the appropriate exception.
+                jsondata = None
+
+        with self._profile(action, 'validate'):
+            jsondata = _validate_yourls_response(response, params, jsondata)
+
+        return jsondata, response
 
 
 class YOURLSAPIMixin(object):
@@ -74,10 +638,16 @@ class YOURLSAPIMixin(object):
             requests.exceptions.HTTPError: Generic HTTP error.
         """
         data = dict(action='shorturl', url=url, keyword=keyword, title=title)
-        jsondata = self._api_request(params=data)
+        try:
+            jsondata = self._api_request(params=data)
+        except YOURLSURLExistsError as exc:
+            self._index_link(exc.url)
+            raise
 
-        url = _json_to_shortened_url(jsondata['url'], jsondata['shorturl'])
+        with self._profile('shorturl', 'construct'):
+            url = _json_to_shortened_url(jsondata['url'], jsondata['shorturl'])
 
+        self._index_link(url)
         return url
 
     def expand(self, short):
@@ -87,7 +657,10 @@ class YOURLSAPIMixin(object):
             short: Short URL (``http://example.com/abc``) or keyword (abc).
 
         :return: Expanded/long URL, e.g.
-                 ``https://www.youtube.com/watch?v=dQw4w9WgXcQ``
+                 ``https://www.youtube.com/watch?v=dQw4w9WgXcQ``, as
+                 :class:`~yourls.data.LongURL`, or
+                 :class:`~yourls.data.StaleURL` if it was read from an offline
+                 snapshot.
 
         Raises:
             ~yourls.exceptions.YOURLSHTTPError: HTTP error with response from
@@ -95,13 +668,19 @@ class YOURLSAPIMixin(object):
             requests.exceptions.HTTPError: Generic HTTP error.
         """
         data = dict(action='expand', shorturl=short)
-        jsondata = self._api_request(params=data)
+        try:
+            jsondata = self._api_request(params=data)
+        except _OFFLINE_ERRORS:
+            return StaleURL(self._offline_link(short).url)
 
-        return jsondata['longurl']
+        return LongURL(jsondata['longurl'])
 
     def url_stats(self, short):
         """Get stats for short URL or keyword.
 
+        If caching has been enabled with
+        :meth:`~YOURLSClientBase.enable_cache`, the result may be stale.
+
         Parameters:
             short: Short URL (http://example.com/abc) or keyword (abc).
 
@@ -113,10 +692,18 @@ class YOURLSAPIMixin(object):
                 YOURLS API.
             requests.exceptions.HTTPError: Generic HTTP error.
         """
+        try:
+            return self._cached('url-stats', ('url-stats', short),
+                                lambda: self._url_stats(short))
+        except _OFFLINE_ERRORS:
+            return self._offline_link(short)
+
+    def _url_stats(self, short):
         data = dict(action='url-stats', shorturl=short)
         jsondata = self._api_request(params=data)
 
-        return _json_to_shortened_url(jsondata['link'])
+        with self._profile('url-stats', 'construct'):
+            return _json_to_shortened_url(jsondata['link'])
 
     def stats(self, filter, limit, start=None):
         """Get stats about links.
@@ -139,47 +726,114 @@ class YOURLSAPIMixin(object):
             ValueError: Incorrect value for filter parameter.
             requests.exceptions.HTTPError: Generic HTTP Error
         """
-        # Normalise random to rand, even though it's accepted by API.
-        if filter == 'random':
-            filter = 'rand'
-
-        valid_filters = ('top', 'bottom', 'rand', 'last')
-        if filter not in valid_filters:
-            msg = 'filter must be one of {}'.format(', '.join(valid_filters))
-            raise ValueError(msg)
+        filter = _normalise_stats_filter(filter)
 
         data = dict(action='stats', filter=filter, limit=limit, start=start)
         jsondata = self._api_request(params=data)
 
-        stats = DBStats(total_clicks=int(jsondata['stats']['total_clicks']),
-                        total_links=int(jsondata['stats']['total_links']))
+        with self._profile('stats', 'construct'):
+            stats = DBStats(total_clicks=int(jsondata['stats']['total_clicks']),
+                            total_links=int(jsondata['stats']['total_links']))
 
-        links = []
+            links = []
 
-        if 'links' in jsondata:
-            for i in range(1, limit + 1):
-                key = 'link_{}'.format(i)
-                links.append(_json_to_shortened_url(jsondata['links'][key]))
+            if 'links' in jsondata:
+                for i in range(1, limit + 1):
+                    key = 'link_{}'.format(i)
+                    links.append(_json_to_shortened_url(jsondata['links'][key]))
 
         return links, stats
 
+    def iter_stats(self, filter, limit, start=None):
+        """Get links like :meth:`stats`, but parse the response incrementally.
+
+        Each link is yielded as soon as it has been read from the connection,
+        so only one link is held in memory at a time, regardless of `limit`.
+        The database statistics are not returned; use :meth:`db_stats`.
+
+        Parameters:
+            filter: 'top', 'bottom', 'rand', or 'last'.
+            limit: Number of links to return from filter.
+            start: Optional start number.
+
+        Returns:
+            Iterator of ShortenedURLs.
+
+        Example:
+
+            .. code-block:: python
+
+                for link in yourls.iter_stats(filter='last', limit=100000):
+                    print(link.shorturl)
+
+        Raises:
+            ValueError: Incorrect value for filter parameter.
+            requests.exceptions.HTTPError: Generic HTTP Error
+        """
+        filter = _normalise_stats_filter(filter)
+
+        data = dict(action='stats', filter=filter, limit=limit, start=start)
+        response = self._api_stream(params=data)
+
+        try:
+            links = _iter_stats_links(response, data)
+            # Enter the generator, so that the response is closed when it's
+            # closed or garbage collected, even if it's never iterated.
+            next(links)
+        except BaseException:
+            response.close()
+            raise
+        return links
+
     def db_stats(self):
         """Get database statistics.
 
+        If caching has been enabled with
+        :meth:`~YOURLSClientBase.enable_cache`, the result may be stale.
+
         Returns:
             DBStats: Total clicks and links statistics.
 
         Raises:
             requests.exceptions.HTTPError: Generic HTTP Error
         """
+        return self._cached('db-stats', ('db-stats',), self._db_stats)
+
+    def _db_stats(self):
         data = dict(action='db-stats')
         jsondata = self._api_request(params=data)
 
-        stats = DBStats(total_clicks=int(jsondata['db-stats']['total_clicks']),
-                        total_links=int(jsondata['db-stats']['total_links']))
+        with self._profile('db-stats', 'construct'):
+            stats = DBStats(total_clicks=int(jsondata['db-stats']['total_clicks']),
+                            total_links=int(jsondata['db-stats']['total_links']))
 
         return stats
 
 
+def _server_unavailable(exc):
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is None or exc.response.status_code >= 500
+    return True
+
+
+def _retry_count(response):
+    """Return number of times urllib3 retried the request for `response`."""
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return len(getattr(retries, 'history', ()))
+
+
+def _normalise_stats_filter(filter):
+    # Normalise random to rand, even though it's accepted by API.
+    if filter == 'random':
+        filter = 'rand'
+
+    valid_filters = ('top', 'bottom', 'rand', 'last')
+    if filter not in valid_filters:
+        msg = 'filter must be one of {}'.format(', '.join(valid_filters))
+        raise ValueError(msg)
+
+    return filter
+
+
 class YOURLSClient(YOURLSAPIMixin, YOURLSClientBase):
     """YOURLS client."""
@@ -1,7 +1,11 @@
 # coding: utf-8
 from __future__ import absolute_import, division, print_function
 
+import codecs
+import json
+import re
 import sys
+from contextlib import closing
 from datetime import datetime
 
 import six
@@ -11,7 +15,7 @@ from requests import HTTPError
 from .exceptions import (
     YOURLSAPIError, YOURLSHTTPError, YOURLSKeywordExistsError,
     YOURLSNoLoopError, YOURLSNoURLError, YOURLSURLExistsError)
-from .log import logger
+from . import log
 
 
 class ShortenedURL(ReprHelperMixin, object):
@@ -41,10 +45,19 @@ class ShortenedURL(ReprHelperMixin, object):
 
        Number of clicks the shortened URL has received.
 
+    .. attribute:: stale
+
+       :py:data:`True` if the data was read from an offline snapshot instead
+       of the server. See :meth:`~yourls.core.YOURLSClientBase.enable_offline`.
+       Equality ignores this attribute, so a stale link is equal to the same
+       link returned by the server.
+
     """
-    __slots__ = ('shorturl', 'url', 'title', 'date', 'ip', 'clicks', 'keyword')
+    __slots__ = ('shorturl', 'url', 'title', 'date', 'ip', 'clicks', 'keyword',
+                 'stale')
 
-    def __init__(self, shorturl, url, title, date, ip, clicks, keyword=None):
+    def __init__(self, shorturl, url, title, date, ip, clicks, keyword=None,
+                 stale=False):
         self.shorturl = shorturl
         self.url = url
         self.title = title
@@ -52,6 +65,7 @@ class ShortenedURL(ReprHelperMixin, object):
         self.ip = ip
         self.clicks = clicks
         self.keyword = keyword
+        self.stale = stale
 
     def _repr_helper_(self, r):
         r.keyword_from_attr('shorturl')
@@ -62,6 +76,8 @@ class ShortenedURL(ReprHelperMixin, object):
         r.keyword_from_attr('clicks')
         if self.keyword is not None:
             r.keyword_from_attr('keyword')
+        if self.stale:
+            r.keyword_from_attr('stale')
 
     def __eq__(self, other):
         if isinstance(other, ShortenedURL):
@@ -71,6 +87,36 @@ class ShortenedURL(ReprHelperMixin, object):
             return NotImplemented
 
 
+class LongURL(six.text_type):
+    """Long URL returned by :meth:`~yourls.core.YOURLSAPIMixin.expand`. It's a
+    string subclass, so it can be used like any other string.
+
+    Like :class:`str`, equality only compares the URL, so a :class:`StaleURL`
+    is equal to the :class:`LongURL` for the same URL.
+
+    .. attribute:: stale
+
+       :py:data:`False` if the URL came from the server. See
+       :class:`StaleURL`.
+    """
+    __slots__ = ()
+
+    stale = False
+
+
+class StaleURL(LongURL):
+    """:class:`LongURL` read from an offline snapshot instead of the server.
+    See :meth:`~yourls.core.YOURLSClientBase.enable_offline`.
+
+    .. attribute:: stale
+
+       Always :py:data:`True`.
+    """
+    __slots__ = ()
+
+    stale = True
+
+
 class DBStats(ReprHelperMixin, object):
     """Represent database statistics as returned by the YOURLS API.
 
@@ -123,8 +169,10 @@ def _handle_api_error_with_json(http_exc, jsondata, response):
     raise YOURLSHTTPError(http_error_message, response=response)
 
 
-def _validate_yourls_response(response, data):
-    """Validate response from YOURLS server."""
+def _validate_yourls_response(response, data, jsondata=None):
+    """Validate response from YOURLS server. `jsondata` may be passed if the
+    response has already been decoded.
+    """
     try:
         response.raise_for_status()
     except HTTPError as http_exc:
@@ -136,12 +184,15 @@ def _validate_yourls_response(response, data):
         reraise = False
 
         try:
-            jsondata = response.json()
+            if jsondata is None:
+                jsondata = response.json()
         except ValueError:
             reraise = True
         else:
-            logger.debug('Received error {response} with JSON {json}',
-                         response=response, json=jsondata)
+            if log.debug_enabled():
+                log.debug('Received error {status_code} response to {action}',
+                          action=data.get('action'),
+                          status_code=response.status_code, json=jsondata)
             _handle_api_error_with_json(http_exc, jsondata, response)
 
         if reraise:
@@ -149,29 +200,119 @@ def _validate_yourls_response(response, data):
     else:
         # We have a valid HTTP response, but we need to check what the API says
         # about the request.
-        jsondata = response.json()
-
-        logger.debug('Received {response} with JSON {json}', response=response,
-                     json=jsondata)
-
-        if {'status', 'code', 'message'} <= set(jsondata.keys()):
-            status = jsondata['status']
-            code = jsondata['code']
-            message = jsondata['message']
-
-            if status == 'fail':
-                if code == 'error:keyword':
-                    raise YOURLSKeywordExistsError(message, keyword=data['keyword'])
-                elif code == 'error:url':
-                    url = _json_to_shortened_url(jsondata['url'], jsondata['shorturl'])
-                    raise YOURLSURLExistsError(message, url=url)
-                else:
-                    raise YOURLSAPIError(message)
+        if jsondata is None:
+            jsondata = response.json()
+
+        if log.debug_enabled():
+            log.debug('Received {status_code} response to {action}',
+                      action=data.get('action'), status_code=response.status_code,
+                      json=jsondata)
+
+        return _validate_yourls_json(jsondata, data)
+
+
+def _validate_yourls_json(jsondata, data):
+    """Check the API status of a successful HTTP response."""
+    if {'status', 'code', 'message'} <= set(jsondata.keys()):
+        status = jsondata['status']
+        code = jsondata['code']
+        message = jsondata['message']
+
+        if status == 'fail':
+            if code == 'error:keyword':
+                raise YOURLSKeywordExistsError(message, keyword=data['keyword'])
+            elif code == 'error:url':
+                url = _json_to_shortened_url(jsondata['url'], jsondata['shorturl'])
+                raise YOURLSURLExistsError(message, url=url)
             else:
-                return jsondata
+                raise YOURLSAPIError(message)
         else:
-            # Without status, nothing special needs to be handled.
             return jsondata
+    else:
+        # Without status, nothing special needs to be handled.
+        return jsondata
+
+
+class _NoLinks(Exception):
+    def __init__(self, document):
+        super(_NoLinks, self).__init__()
+        self.document = document
+
+
+_LINK_KEY_RE = re.compile(r'"link_\d+"\s*:\s*')
+
+
+def _iter_json_links(chunks):
+    """Incrementally decode ``link_N`` objects from chunks of JSON text.
+
+    The buffer is trimmed after each link is decoded, so memory use is bounded
+    by the size of a single link rather than the whole response. If no links
+    are found, :class:`_NoLinks` is raised with the complete document, so that
+    the caller can check it for API errors.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    found = False
+
+    for chunk in chunks:
+        buf += chunk
+        pos = 0
+        while True:
+            match = _LINK_KEY_RE.search(buf, pos)
+            if match is None:
+                break
+            try:
+                urldata, end = decoder.raw_decode(buf, match.end())
+            except ValueError:
+                # Incomplete object, wait for the next chunk.
+                pos = match.start()
+                break
+            found = True
+            yield urldata
+            pos = end
+
+        if found:
+            buf = buf[pos:]
+
+    if found:
+        if _LINK_KEY_RE.search(buf):
+            raise YOURLSAPIError('Incomplete link in stats response.')
+    elif buf:
+        raise _NoLinks(buf)
+
+
+def _decode_chunks(chunks):
+    """Decode UTF-8 `chunks`, which may split multibyte sequences.
+
+    Raises:
+        UnicodeDecodeError: The last chunk ends with an incomplete sequence.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def _iter_stats_links(response, data, chunk_size=8192):
+    """Yield :class:`ShortenedURL` objects from a streamed stats response.
+
+    :py:data:`None` is yielded first, before anything is read. Once it has
+    been consumed, closing the generator closes `response`.
+    """
+    chunks = _decode_chunks(response.iter_content(chunk_size=chunk_size))
+
+    with closing(response):
+        yield None
+        try:
+            for urldata in _iter_json_links(chunks):
+                yield _json_to_shortened_url(urldata)
+        except _NoLinks as exc:
+            jsondata = json.loads(exc.document)
+            if log.debug_enabled():
+                log.debug('Received {status_code} response to {action}',
+                          action=data.get('action'),
+                          status_code=response.status_code, json=jsondata)
+            _validate_yourls_json(jsondata, data)
 
 
 def _json_to_shortened_url(urldata, shorturl=None):
@@ -199,3 +340,19 @@ def _json_to_shortened_url(urldata, shorturl=None):
         keyword=keyword)
 
     return url
+
+
+def _shortened_url_to_json(url):
+    """Inverse of :func:`_json_to_shortened_url`."""
+    urldata = dict(
+        shorturl=url.shorturl,
+        url=url.url,
+        title=url.title,
+        date=url.date.strftime('%Y-%m-%d %H:%M:%S'),
+        ip=url.ip,
+        clicks=url.clicks)
+
+    if url.keyword is not None:
+        urldata['keyword'] = url.keyword
+
+    return urldata
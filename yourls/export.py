@@ -0,0 +1,244 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+
+import six
+
+from .data import _shortened_url_to_json
+
+FORMATS = ('csv', 'jsonl', 'sqlite')
+
+_FIELDS = ('keyword', 'shorturl', 'url', 'title', 'date', 'ip', 'clicks')
+
+_CHUNK_SIZE = 65536
+_CSV_SPECIAL = re.compile(b'["\\n]')
+
+
+def iter_links(yourls, filter='last', page_size=1000, start=0):
+    """Iterate over every link in the database using paginated stats requests.
+
+    Each page is streamed with :meth:`~yourls.core.YOURLSAPIMixin.iter_stats`,
+    so at most one link is held in memory at a time.
+
+    Parameters:
+        yourls: :class:`~yourls.core.YOURLSClient` instance.
+        filter: Sort order, passed to the ``stats`` API. Links created while
+            iterating may shift pages when using 'last', so prefer a quiet
+            database for complete exports.
+        page_size: Number of links requested per ``stats`` call.
+        start: Offset of the first link.
+
+    Returns:
+        Iterator of ShortenedURLs.
+    """
+    while True:
+        count = 0
+        for link in yourls.iter_stats(filter=filter, limit=page_size, start=start):
+            count += 1
+            yield link
+
+        start += count
+        if count < page_size:
+            return
+
+
+def export_links(yourls, path, format='csv', filter='last', page_size=1000,
+                 resume=False):
+    """Export links to a file without holding them all in memory.
+
+    Links are written in batches of `page_size` as each page is received.
+
+    Parameters:
+        yourls: :class:`~yourls.core.YOURLSClient` instance.
+        path: Output file path.
+        format: 'csv', 'jsonl', or 'sqlite'.
+        filter: Sort order passed to :func:`iter_links`.
+        page_size: Number of links requested and written at a time.
+        resume: Continue an interrupted export. The number of links already in
+            `path` is used as the start offset. Otherwise, `path` is
+            overwritten.
+
+    Returns:
+        Total number of links in `path`.
+
+    Raises:
+        ValueError: Incorrect value for format parameter.
+    """
+    if format not in FORMATS:
+        raise ValueError('format must be one of {}'.format(', '.join(FORMATS)))
+
+    if not resume and os.path.exists(path):
+        os.remove(path)
+
+    writer = _WRITERS[format](path)
+    try:
+        total = writer.count()
+        batch = []
+        links = iter_links(yourls, filter=filter, page_size=page_size, start=total)
+        for link in links:
+            batch.append(_shortened_url_to_json(link))
+            if len(batch) >= page_size:
+                writer.write(batch)
+                total += len(batch)
+                batch = []
+
+        if batch:
+            writer.write(batch)
+            total += len(batch)
+    finally:
+        writer.close()
+
+    return total
+
+
+def _line_end(f):
+    """Return offset after the last newline in binary file `f`, reading
+    backwards from the end in chunks.
+    """
+    end = f.seek(0, io.SEEK_END) or f.tell()
+    while end:
+        start = max(end - _CHUNK_SIZE, 0)
+        f.seek(start)
+        index = f.read(end - start).rfind(b'\n')
+        if index != -1:
+            return start + index + 1
+        end = start
+    return 0
+
+
+def _csv_record_end(f):
+    """Return offset after the last complete record in binary CSV file `f`.
+
+    Quoted fields can contain newlines, so the file is read from the start in
+    chunks, and only newlines after an even number of quote characters are
+    record boundaries. Escaped quotes are doubled, so they don't change this.
+    """
+    f.seek(0)
+    quoted = False
+    end = offset = 0
+    for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+        for match in _CSV_SPECIAL.finditer(chunk):
+            if match.group() == b'"':
+                quoted = not quoted
+            elif not quoted:
+                end = offset + match.end()
+        offset += len(chunk)
+    return end
+
+
+def _truncate_partial_record(path, record_end):
+    """Remove a trailing record left incomplete by an interrupted export.
+
+    Parameters:
+        path: File path.
+        record_end: Function returning the offset after the last complete
+            record in a binary file.
+    """
+    with io.open(path, 'rb+') as f:
+        size = f.seek(0, io.SEEK_END) or f.tell()
+        end = record_end(f)
+        if end != size:
+            f.truncate(end)
+
+
+def _truncate_partial_line(path):
+    """Remove a trailing line left incomplete by an interrupted write."""
+    _truncate_partial_record(path, _line_end)
+
+
+class _CSVWriter(object):
+    def __init__(self, path):
+        exists = os.path.exists(path)
+        if exists:
+            _truncate_partial_record(path, _csv_record_end)
+
+        if six.PY2:
+            self._file = io.open(path, 'ab', buffering=65536)
+        else:
+            self._file = io.open(path, 'a', encoding='utf-8', newline='',
+                                 buffering=65536)
+        self._writer = csv.writer(self._file)
+        self._path = path
+
+        if not exists or not os.path.getsize(path):
+            self._writerow(_FIELDS)
+
+    def _writerow(self, row):
+        if six.PY2:
+            row = [six.text_type(value).encode('utf-8') for value in row]
+        self._writer.writerow(row)
+
+    def count(self):
+        self._file.flush()
+        if six.PY2:
+            f = io.open(self._path, 'rb')
+        else:
+            f = io.open(self._path, 'r', encoding='utf-8', newline='')
+        with f:
+            # Subtract header row.
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+    def write(self, batch):
+        for urldata in batch:
+            self._writerow([urldata.get(field, '') for field in _FIELDS])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _JSONLinesWriter(object):
+    def __init__(self, path):
+        if os.path.exists(path):
+            _truncate_partial_line(path)
+        self._file = io.open(path, 'a', encoding='utf-8', buffering=65536)
+        self._path = path
+
+    def count(self):
+        self._file.flush()
+        with io.open(self._path, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def write(self, batch):
+        self._file.write(u''.join(
+            six.text_type(json.dumps(urldata, sort_keys=True)) + u'\n'
+            for urldata in batch))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _SQLiteWriter(object):
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS links ('
+            'keyword TEXT, shorturl TEXT PRIMARY KEY, url TEXT, title TEXT, '
+            'date TEXT, ip TEXT, clicks INTEGER)')
+
+    def count(self):
+        return self._connection.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+
+    def write(self, batch):
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [tuple(urldata.get(field) for field in _FIELDS)
+                 for urldata in batch])
+
+    def close(self):
+        self._connection.close()
+
+
+_WRITERS = {
+    'csv': _CSVWriter,
+    'jsonl': _JSONLinesWriter,
+    'sqlite': _SQLiteWriter,
+}
@@ -0,0 +1,507 @@
+# coding: utf-8
+"""In-memory stand-in for a YOURLS server, for integration and load tests.
+
+Example:
+
+    .. code-block:: python
+
+        from yourls.fake import FakeYOURLS
+
+        with FakeYOURLS(links=1000000, latency=0.01) as server:
+            yourls = server.client()
+            yourls.expand(server.keyword(123))
+
+To skip HTTP entirely, use :meth:`FakeYOURLS.transport`:
+
+    .. code-block:: python
+
+        server = FakeYOURLS(links=1000)
+        yourls = server.client(transport=server.transport())
+"""
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+import six
+from six.moves import range
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import parse_qs, parse_qsl, urlsplit
+
+from .transport import Transport, TransportResponse
+
+FAILURE_MODES = ('http', 'disconnect')
+
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Pre-existing links are generated on demand from their index.
+_GENERATED_URL = 'http://example.com/{}'
+_GENERATED_URL_RE = re.compile(r'^http://example\.com/(\d+)$')
+_GENERATED_DATE = datetime(2015, 1, 1)
+_GENERATED_KEYWORD_RE = re.compile(r'^[0-9a-z]{1,13}$')
+
+
+def _base36(n):
+    digits = []
+    while True:
+        n, d = divmod(n, 36)
+        digits.append(_DIGITS[d])
+        if not n:
+            return ''.join(reversed(digits))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Disconnect(Exception):
+    """Close the connection without sending a response."""
+
+
+class _Timeout(Exception):
+    """Latency exceeded the client's timeout."""
+
+
+class FakeYOURLS(object):
+    """YOURLS API server with in-memory storage, listening on localhost.
+
+    Implements the ``shorturl``, ``expand``, ``url-stats``, ``stats``, and
+    ``db-stats`` actions, including the ``error:url``, ``error:keyword``,
+    ``error:noloop``, and ``error:nourl`` failures.
+
+    The `links` pre-existing links aren't stored, so the database can contain
+    millions of links. Link ``i`` has keyword :meth:`keyword(i) <keyword>`,
+    URL ``http://example.com/i``, and ``links - i`` clicks. Links created with
+    ``shorturl`` are stored, and have no clicks.
+
+    Parameters:
+        links: Number of pre-existing links.
+        signature: Signature token required by the server, if any. Time-limited
+            tokens generated from it are also accepted.
+        nonce_life: Seconds that time-limited signature tokens are valid for.
+        username: Username required by the server, if any.
+        password: Password required by the server, if any.
+        latency: Seconds to wait before each response, or a callable that
+            takes the action name and returns the number of seconds.
+        error_rate: Fraction of requests that fail.
+        error_actions: Actions that `error_rate` applies to. Defaults to all.
+        failure_mode: ``'http'`` to respond with `error_status`, or
+            ``'disconnect'`` to close the connection without a response.
+        error_status: HTTP status code for ``'http'`` failures.
+        seed: Random seed for failures and the ``rand`` stats filter.
+        host: Interface to listen on.
+        port: Port to listen on. By default, a free port is chosen.
+
+    Attributes and parameters other than `links` and credentials may be
+    changed while the server is running.
+    """
+    def __init__(self, links=0, signature=None, username=None, password=None,
+                 latency=0, error_rate=0, error_actions=None, failure_mode='http',
+                 error_status=500, seed=0, host='127.0.0.1', port=0, nonce_life=43200):
+        if failure_mode not in FAILURE_MODES:
+            raise ValueError(
+                'failure_mode must be one of {}'.format(', '.join(FAILURE_MODES)))
+
+        self.generated_links = links
+        self.signature = signature
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_actions = error_actions
+        self.failure_mode = failure_mode
+        self.error_status = error_status
+        self.nonce_life = nonce_life
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Created links are stored as (keyword, url, title, date) tuples.
+        self._created = []
+        self._keywords = {}
+        self._urls = {}
+        self._next_id = links
+
+        #: Number of HTTP connections accepted.
+        self.connections = 0
+        self._sockets = set()
+
+        self._server = _ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def site(self):
+        """Base URL of short URLs, e.g. ``http://127.0.0.1:8000``."""
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def apiurl(self):
+        """URL of ``yourls-api.php``."""
+        return self.site + '/yourls-api.php'
+
+    def keyword(self, index):
+        """Return keyword of pre-existing link `index`."""
+        return _base36(index)
+
+    def client(self, **kwargs):
+        """Return :class:`~yourls.core.YOURLSClient` for this server, using
+        the server's credentials. Keyword arguments are passed to the client.
+        """
+        from .core import YOURLSClient
+
+        kwargs.setdefault('signature', self.signature)
+        kwargs.setdefault('username', self.username)
+        kwargs.setdefault('password', self.password)
+        return YOURLSClient(self.apiurl, **kwargs)
+
+    def transport(self):
+        """Return :class:`FakeTransport` that sends requests to this server
+        without HTTP. The server doesn't need to be started.
+        """
+        return FakeTransport(self)
+
+    def start(self):
+        """Handle requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop handling requests and close all connections."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive, like a real server.
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                with fake._lock:
+                    fake.connections += 1
+                    fake._sockets.add(self.connection)
+
+            def finish(self):
+                with fake._lock:
+                    fake._sockets.discard(self.connection)
+                BaseHTTPRequestHandler.finish(self)
+
+            def do_GET(self):
+                query = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+                self._respond(dict((k, v[0]) for k, v in query.items()))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8')
+                query = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+                query.update(parse_qs(body, keep_blank_values=True))
+                self._respond(dict((k, v[0]) for k, v in query.items()))
+
+            def _respond(self, params):
+                try:
+                    status, body = fake.handle(params)
+                except _Disconnect:
+                    self.close_connection = True
+                    return
+
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, params, timeout=None):
+        """Handle API request without HTTP.
+
+        Parameters:
+            params: Dictionary of query parameters.
+            timeout: Seconds the client waits for a response. If the latency
+                is longer, the request fails after `timeout` seconds.
+
+        Returns:
+            Tuple of HTTP status code and JSON response data.
+
+        Raises:
+            Exception: If `failure_mode` is ``'disconnect'``, for failures, or
+                if the request times out.
+        """
+        action = params.get('action')
+
+        latency = self.latency
+        if callable(latency):
+            latency = latency(action)
+        if latency:
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise _Timeout
+            time.sleep(latency)
+
+        actions = self.error_actions
+        if self.error_rate and (actions is None or action in actions):
+            with self._lock:
+                fail = self._random.random() < self.error_rate
+            if fail:
+                if self.failure_mode == 'disconnect':
+                    raise _Disconnect
+                return self.error_status, dict(
+                    errorCode=self.error_status, message='Error: simulated failure')
+
+        if not self._authenticated(params):
+            return 403, dict(errorCode=403, message='Please log in')
+
+        method = getattr(self, '_action_' + (action or '').replace('-', '_'), None)
+        if method is None:
+            message = 'Unknown or missing "action" parameter'
+            return 400, dict(errorCode=400, message=message)
+
+        with self._lock:
+            return method(params)
+
+    def _authenticated(self, params):
+        if self.signature is not None and 'timestamp' in params:
+            timestamp = params['timestamp']
+            token = hashlib.md5((timestamp + self.signature).encode('utf-8'))
+            try:
+                age = abs(time.time() - int(timestamp))
+            except ValueError:
+                return False
+            return params.get('signature') == token.hexdigest() and age < self.nonce_life
+        if self.signature is not None and params.get('signature') == self.signature:
+            return True
+        if self.username is not None:
+            credentials = params.get('username'), params.get('password')
+            return credentials == (self.username, self.password)
+        return self.signature is None
+
+    def _shorturl(self, keyword):
+        return '{}/{}'.format(self.site, keyword)
+
+    def _generated(self, index):
+        clicks = self.generated_links - index
+        date = _GENERATED_DATE + timedelta(seconds=index)
+        url = _GENERATED_URL.format(index)
+        return _base36(index), url, 'Example {}'.format(index), date, clicks
+
+    def _created_link(self, position):
+        keyword, url, title, date = self._created[position]
+        return keyword, url, title, date, 0
+
+    def _find_keyword(self, keyword):
+        # Must be called with lock held.
+        position = self._keywords.get(keyword)
+        if position is not None:
+            return self._created_link(position)
+
+        if _GENERATED_KEYWORD_RE.match(keyword):
+            index = int(keyword, 36)
+            if index < self.generated_links and _base36(index) == keyword:
+                return self._generated(index)
+
+        return None
+
+    def _find_url(self, url):
+        # Must be called with lock held.
+        position = self._urls.get(url)
+        if position is not None:
+            return self._created_link(position)
+
+        match = _GENERATED_URL_RE.match(url)
+        if match:
+            index = int(match.group(1))
+            if index < self.generated_links and str(index) == match.group(1):
+                return self._generated(index)
+
+        return None
+
+    def _find_short(self, short):
+        keyword = short
+        if short.startswith(self.site + '/'):
+            keyword = short[len(self.site) + 1:]
+        return self._find_keyword(keyword)
+
+    def _url_json(self, link):
+        keyword, url, title, date, _ = link
+        return dict(keyword=keyword, url=url, title=title,
+                    date=date.strftime(_DATE_FORMAT), ip='127.0.0.1')
+
+    def _link_json(self, link):
+        keyword, url, title, date, clicks = link
+        return dict(shorturl=self._shorturl(keyword), url=url, title=title,
+                    timestamp=date.strftime(_DATE_FORMAT), ip='127.0.0.1',
+                    clicks=str(clicks))
+
+    def _action_shorturl(self, params):
+        url = params.get('url', '').strip()
+        keyword = params.get('keyword') or None
+        title = params.get('title') or None
+
+        if not urlsplit(url).scheme:
+            return 400, dict(status='fail', code='error:nourl',
+                             message='Missing or malformed URL', errorCode='400')
+
+        if url.startswith(self.site + '/'):
+            return 400, dict(status='fail', code='error:noloop',
+                             message='URL is a short URL', errorCode='400')
+
+        link = self._find_url(url)
+        if link is not None:
+            return 200, dict(
+                status='fail', code='error:url',
+                message='{} already exists in database'.format(url),
+                title=link[2], shorturl=self._shorturl(link[0]),
+                url=self._url_json(link), statusCode=200)
+
+        if keyword is not None and self._find_keyword(keyword) is not None:
+            return 200, dict(
+                status='fail', code='error:keyword',
+                message='Short URL {} already exists in database or is '
+                        'reserved'.format(keyword),
+                statusCode=200)
+
+        if keyword is None:
+            keyword = _base36(self._next_id)
+            while self._find_keyword(keyword) is not None:
+                self._next_id += 1
+                keyword = _base36(self._next_id)
+            self._next_id += 1
+
+        date = datetime.now().replace(microsecond=0)
+        self._keywords[keyword] = self._urls[url] = len(self._created)
+        self._created.append((keyword, url, title or url, date))
+
+        link = keyword, url, title or url, date, 0
+        return 200, dict(
+            status='success', message='{} added to database'.format(url),
+            title=title or url, shorturl=self._shorturl(keyword),
+            url=self._url_json(link), statusCode=200)
+
+    def _action_expand(self, params):
+        link = self._find_short(params.get('shorturl', ''))
+        if link is None:
+            return 404, dict(errorCode=404, message='Error: short URL not found')
+        return 200, dict(keyword=link[0], shorturl=self._shorturl(link[0]),
+                         longurl=link[1], message='success', statusCode=200)
+
+    def _action_url_stats(self, params):
+        link = self._find_short(params.get('shorturl', ''))
+        if link is None:
+            return 404, dict(errorCode=404, message='Error: short URL not found')
+        return 200, dict(link=self._link_json(link), message='success',
+                         statusCode=200)
+
+    def _db_stats_json(self):
+        n = self.generated_links
+        total_links = n + len(self._created)
+        total_clicks = n * (n + 1) // 2
+        return dict(total_links=str(total_links), total_clicks=str(total_clicks))
+
+    def _ordered_link(self, filter, position):
+        """Return link at `position` when sorted by `filter`."""
+        n = self.generated_links
+        created = len(self._created)
+
+        if filter == 'top':
+            if position < n:
+                return self._generated(position)
+            return self._created_link(position - n)
+
+        if position < created:
+            if filter == 'last':
+                return self._created_link(created - 1 - position)
+            return self._created_link(position)
+        return self._generated(n - 1 - (position - created))
+
+    def _action_stats(self, params):
+        filter = params.get('filter', 'top')
+        limit = int(params.get('limit') or 10)
+        start = int(params.get('start') or 0)
+        total = self.generated_links + len(self._created)
+
+        if filter == 'rand':
+            positions = self._random.sample(range(total), min(limit, total))
+            links = [self._ordered_link('top', p) for p in positions]
+        else:
+            if filter not in ('top', 'bottom', 'last'):
+                filter = 'top'
+            positions = range(start, min(start + limit, total))
+            links = [self._ordered_link(filter, p) for p in positions]
+
+        body = dict(stats=self._db_stats_json(), message='success', statusCode=200)
+        if links:
+            body['links'] = dict(('link_{}'.format(i), self._link_json(link))
+                                 for i, link in enumerate(links, start=1))
+        return 200, body
+
+    def _action_db_stats(self, params):
+        return 200, {'db-stats': self._db_stats_json(), 'message': 'success',
+                     'statusCode': 200}
+
+
+class FakeTransport(Transport):
+    """Send requests to a :class:`FakeYOURLS` server in-process.
+
+    Latency and failures are simulated as for HTTP requests. ``'disconnect'``
+    failures raise :class:`requests.ConnectionError`, and latency longer than
+    the request's timeout raises :class:`requests.Timeout`.
+    """
+    def __init__(self, server):
+        self.server = server
+
+    def send(self, method, url, params=None, data=None, stream=False, timeout=None):
+        query = dict(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+        for extra in (params, data):
+            if extra:
+                query.update((key, six.text_type(value))
+                             for key, value in extra.items() if value is not None)
+
+        try:
+            status, body = self.server.handle(query, timeout=timeout)
+        except _Disconnect:
+            raise requests.ConnectionError('Connection aborted.')
+        except _Timeout:
+            raise requests.Timeout('Read timed out.')
+
+        content = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json',
+                   'Content-Length': str(len(content))}
+        return TransportResponse(status, headers, content, url=url)
@@ -0,0 +1,229 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+import os
+
+import six
+from represent import ReprHelperMixin
+
+from .batch import imap_ordered
+from .data import _json_to_shortened_url, _shortened_url_to_json
+from .exceptions import YOURLSAPIError, YOURLSHTTPError, YOURLSURLExistsError
+from .export import _truncate_partial_line
+
+# HTTP statuses for requests that would be rejected again if retried. Other
+# statuses, e.g. 401, 403, 408, 429 and 5xx, aren't recorded.
+_REJECTED_STATUSES = frozenset([400, 404, 405, 410, 413, 414, 422])
+
+
+class JournalEntry(ReprHelperMixin, object):
+    """Outcome of shortening a single URL.
+
+    .. attribute:: url
+
+       Long URL that was shortened.
+
+    .. attribute:: keyword
+
+       Requested keyword, or :py:data:`None`.
+
+    .. attribute:: title
+
+       Requested title, or :py:data:`None`.
+
+    .. attribute:: status
+
+       ``'new'``, ``'exists'``, or ``'error'``.
+
+    .. attribute:: link
+
+       :py:class:`~yourls.data.ShortenedURL`, or :py:data:`None` if shortening
+       failed.
+
+    .. attribute:: message
+
+       Error message if shortening failed, otherwise :py:data:`None`.
+    """
+    __slots__ = ('url', 'keyword', 'title', 'status', 'link', 'message')
+
+    def __init__(self, url, keyword, title, status, link=None, message=None):
+        self.url = url
+        self.keyword = keyword
+        self.title = title
+        self.status = status
+        self.link = link
+        self.message = message
+
+    def _repr_helper_(self, r):
+        r.keyword_from_attr('url')
+        r.keyword_from_attr('keyword')
+        r.keyword_from_attr('title')
+        r.keyword_from_attr('status')
+        r.keyword_from_attr('link')
+        r.keyword_from_attr('message')
+
+    def __eq__(self, other):
+        if isinstance(other, JournalEntry):
+            return all(getattr(self, p) == getattr(other, p) for p in self.__slots__)
+        else:
+            return NotImplemented
+
+    def _to_json(self):
+        link = self.link
+        if link is not None:
+            link = _shortened_url_to_json(link)
+        return dict(url=self.url, keyword=self.keyword, title=self.title,
+                    status=self.status, link=link, message=self.message)
+
+    @classmethod
+    def _from_json(cls, data):
+        link = data['link']
+        if link is not None:
+            link = _json_to_shortened_url(link)
+        return cls(url=data['url'], keyword=data['keyword'], title=data['title'],
+                   status=data['status'], link=link, message=data['message'])
+
+
+class ShortenJournal(object):
+    """Append-only on-disk record of bulk shorten outcomes.
+
+    Each outcome is written as a line of JSON as soon as it is known, so an
+    interrupted job can be restarted with the same journal and only the
+    remaining URLs are sent to the server.
+
+    Parameters:
+        path: Journal file, created if it doesn't exist.
+        fsync: Call :py:func:`os.fsync` after each entry, so that entries
+            survive a system crash as well as a process crash.
+
+    Example:
+
+        .. code-block:: python
+
+            with ShortenJournal('shorten.journal') as journal:
+                for entry in journal.shorten_all(yourls, urls):
+                    print(entry.status, entry.url)
+    """
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._entries = {}
+
+        if os.path.exists(path):
+            # An interrupted write leaves a partial line that can't be parsed.
+            _truncate_partial_line(path)
+            with io.open(path, encoding='utf-8') as f:
+                for line in f:
+                    entry = JournalEntry._from_json(json.loads(line))
+                    self._entries[entry.url, entry.keyword] = entry
+
+        self._file = io.open(path, 'a', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url, keyword=None):
+        """Return recorded :class:`JournalEntry` for `url` and `keyword`, or
+        :py:data:`None`.
+        """
+        return self._entries.get((url, keyword))
+
+    def record(self, entry):
+        """Append :class:`JournalEntry` to the journal."""
+        line = six.text_type(json.dumps(entry._to_json(), sort_keys=True))
+        self._file.write(line + u'\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._entries[entry.url, entry.keyword] = entry
+
+    def shorten_all(self, yourls, items, retry_errors=False, workers=1):
+        """Shorten URLs, skipping those already recorded in the journal.
+
+        See :func:`shorten_all`.
+        """
+        return shorten_all(yourls, items, journal=self, retry_errors=retry_errors,
+                           workers=workers)
+
+    def close(self):
+        self._file.close()
+
+
+def shorten_all(yourls, items, journal=None, retry_errors=False, workers=1):
+    """Shorten many URLs, optionally recording outcomes in a journal.
+
+    URLs that already exist on the server are returned with status
+    ``'exists'``. Requests rejected by the API, such as
+    :class:`~yourls.exceptions.YOURLSKeywordExistsError` or a 400 response,
+    are returned with status ``'error'``. Other exceptions are not recorded
+    and propagate, so the job can be restarted later. These include
+    connection errors, server errors, authentication errors (401 and 403),
+    timeouts (408), and rate limiting (429).
+
+    Parameters:
+        yourls: :class:`~yourls.core.YOURLSClient` instance.
+        items: Iterable of URLs or ``(url, keyword, title)`` tuples.
+        journal: Optional :class:`ShortenJournal`. Items already recorded are
+            not sent again, and new outcomes are appended to it.
+        retry_errors: Send URLs again if they previously failed with an
+            API error.
+        workers: Number of requests to make concurrently.
+
+    Returns:
+        Iterator of :class:`JournalEntry` for every item, in input order,
+        including those that were skipped.
+    """
+    def shorten(item):
+        url, keyword, title = _normalise_item(item)
+
+        if journal is not None:
+            entry = journal.get(url, keyword)
+            if entry is not None and (entry.status != 'error' or not retry_errors):
+                return entry, False
+
+        return _shorten_entry(yourls, url, keyword, title), True
+
+    for entry, new in imap_ordered(shorten, items, workers=workers):
+        if new and journal is not None:
+            journal.record(entry)
+        yield entry
+
+
+def _normalise_item(item):
+    if isinstance(item, six.string_types):
+        return item, None, None
+
+    item = tuple(item) + (None, None)
+    return item[0], item[1] or None, item[2] or None
+
+
+def _shorten_entry(yourls, url, keyword, title):
+    try:
+        link = yourls.shorten(url, keyword=keyword, title=title)
+    except YOURLSURLExistsError as exc:
+        return JournalEntry(url, keyword, title, 'exists', link=exc.url)
+    except YOURLSAPIError as exc:
+        if not _rejected(exc):
+            raise
+        return JournalEntry(url, keyword, title, 'error', message=exc.args[0])
+    else:
+        return JournalEntry(url, keyword, title, 'new', link=link)
+
+
+def _rejected(exc):
+    """Return whether API error `exc` rejects the request itself, as opposed to
+    an error that may not happen again, e.g. a server error, an expired
+    signature, or rate limiting.
+    """
+    if isinstance(exc, YOURLSHTTPError):
+        response = exc.response
+        return response is not None and response.status_code in _REJECTED_STATUSES
+    return True
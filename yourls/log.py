@@ -1,7 +1,128 @@
 # coding: utf-8
 from __future__ import absolute_import, division, print_function
 
-from logbook import Logger
+import sys
+import threading
+from timeit import default_timer
 
-logger = Logger('yourls')
-logger.disabled = True
+# Set when the logger is created, so that logbook isn't imported before then.
+_DEBUG = _WARNING = None
+
+
+def _create_logger():
+    global _DEBUG, _WARNING
+    from logbook import DEBUG, WARNING, Logger
+
+    _DEBUG = DEBUG
+    _WARNING = WARNING
+    logger = Logger('yourls')
+    logger.disabled = True
+    return logger
+
+
+if sys.version_info >= (3, 7):
+    # Importing logbook is relatively slow, so the logger is only created when
+    # it is first accessed. Logging can't have been enabled before that.
+    def __getattr__(name):
+        if name == 'logger':
+            global logger
+            logger = _create_logger()
+            return logger
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    logger = _create_logger()
+
+
+def _get_logger():
+    """Return logger if it has been created, otherwise :py:data:`None`."""
+    return globals().get('logger')
+
+
+class _RateLimiter(object):
+    """Allow at most `limit` events per second, counting dropped events."""
+    def __init__(self):
+        self.limit = None
+        self._lock = threading.Lock()
+        self._window_start = 0
+        self._count = 0
+        self._dropped = 0
+
+    def acquire(self):
+        """Return number of events dropped since the last allowed event, or
+        :py:data:`None` if this event should be dropped.
+        """
+        now = default_timer()
+        with self._lock:
+            if now - self._window_start >= 1:
+                self._window_start = now
+                self._count = 0
+
+            if self._count >= self.limit:
+                self._dropped += 1
+                return None
+
+            self._count += 1
+            dropped, self._dropped = self._dropped, 0
+            return dropped
+
+
+_debug_limiter = _RateLimiter()
+
+
+def set_debug_rate_limit(per_second):
+    """Log at most `per_second` debug records per second.
+
+    Under high volume, the remaining records are dropped before they are
+    created. The next record that is logged has a ``dropped`` field with the
+    number of records dropped since the previous one.
+
+    Parameters:
+        per_second: Maximum number of records, or :py:data:`None` to log every
+            record (the default).
+    """
+    _debug_limiter.limit = per_second
+
+
+def debug_enabled():
+    """Return :py:data:`True` if debug records would be logged.
+
+    Use this to avoid computing fields when logging is disabled, which is the
+    default.
+    """
+    logger = _get_logger()
+    return logger is not None and not logger.disabled and _DEBUG >= logger.level
+
+
+def debug(message, **fields):
+    """Log debug message, without creating the logger if it doesn't exist.
+
+    `fields` are available to handlers as the record's
+    :py:attr:`~logbook.LogRecord.extra` dictionary, and can be used in
+    `message`, which is only formatted if the record is handled.
+    """
+    logger = _get_logger()
+    if logger is None or logger.disabled or _DEBUG < logger.level:
+        return
+
+    if _debug_limiter.limit is not None:
+        dropped = _debug_limiter.acquire()
+        if dropped is None:
+            return
+        if dropped:
+            fields['dropped'] = dropped
+
+    # Report the caller's location rather than this function's.
+    logger.debug(message, frame_correction=1, extra=fields, **fields)
+
+
+def warning(message, **fields):
+    """Log warning message, without creating the logger if it doesn't exist.
+
+    Unlike :func:`debug`, warnings aren't rate limited.
+    """
+    logger = _get_logger()
+    if logger is None or logger.disabled or _WARNING < logger.level:
+        return
+
+    logger.warning(message, frame_correction=1, extra=fields, **fields)
@@ -0,0 +1,206 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import threading
+from bisect import bisect_left
+
+#: Default latency histogram bucket upper bounds, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ActionMetrics(object):
+    __slots__ = ('requests', 'errors', 'nbytes', 'bucket_counts', 'duration_sum',
+                 'cache_hits', 'cache_misses', 'retries')
+
+    def __init__(self, nbuckets):
+        self.requests = 0
+        self.errors = 0
+        self.nbytes = 0
+        # One extra bucket for durations above the largest bound.
+        self.bucket_counts = [0] * (nbuckets + 1)
+        self.duration_sum = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+
+
+class MetricsCollector(object):
+    """Collect per-action request counts, latency histograms, cache hit rates,
+    and retry counts.
+
+    Request metrics are collected using
+    :meth:`~yourls.core.YOURLSClientBase.register_hook`; usually you will
+    call :meth:`~yourls.core.YOURLSClientBase.enable_metrics` instead of
+    creating a collector directly. Recording a request takes a lock and a
+    bisect of the bucket bounds, so it's cheap enough to leave enabled.
+
+    Retries are counted when a :class:`urllib3.util.Retry` is mounted on the
+    :class:`~yourls.transport.RequestsTransport` session. HTTPX doesn't
+    report retries, so they aren't counted for
+    :class:`~yourls.transport.HTTPXTransport`.
+
+    Parameters:
+        buckets: Upper bounds of latency histogram buckets, in seconds.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._actions = {}
+
+    def install(self, yourls):
+        """Register hooks to collect request metrics for client `yourls`."""
+        yourls.register_hook('after_response', self._after_response)
+        yourls.register_hook('on_error', self._on_error)
+
+    def uninstall(self, yourls):
+        """Remove hooks added by :meth:`install`."""
+        yourls.deregister_hook('after_response', self._after_response)
+        yourls.deregister_hook('on_error', self._on_error)
+
+    def _after_response(self, action, duration, nbytes, retries=0, **kwargs):
+        self.record_request(action, duration, nbytes=nbytes, retries=retries)
+
+    def _on_error(self, action, duration, nbytes, retries=0, **kwargs):
+        self.record_request(action, duration, nbytes=nbytes, error=True,
+                            retries=retries)
+
+    def _get(self, action):
+        # Must be called with lock held.
+        try:
+            return self._actions[action]
+        except KeyError:
+            metrics = self._actions[action] = _ActionMetrics(len(self.buckets))
+            return metrics
+
+    def record_request(self, action, duration, nbytes=None, error=False, retries=0):
+        """Record a completed request, which was retried `retries` times."""
+        index = bisect_left(self.buckets, duration)
+        with self._lock:
+            metrics = self._get(action)
+            metrics.requests += 1
+            if error:
+                metrics.errors += 1
+            if nbytes:
+                metrics.nbytes += nbytes
+            metrics.retries += retries
+            metrics.bucket_counts[index] += 1
+            metrics.duration_sum += duration
+
+    def record_cache(self, action, hit):
+        """Record a cache hit or miss for `action`."""
+        with self._lock:
+            metrics = self._get(action)
+            if hit:
+                metrics.cache_hits += 1
+            else:
+                metrics.cache_misses += 1
+
+    def record_retry(self, action, count=1):
+        """Record `count` retries of a request for `action`, for retries that
+        happen outside the transport.
+        """
+        with self._lock:
+            self._get(action).retries += count
+
+    def reset(self):
+        """Discard all collected metrics."""
+        with self._lock:
+            self._actions = {}
+
+    def snapshot(self):
+        """Return dictionary of metrics for each action.
+
+        Example:
+
+            .. code-block:: python
+
+                {'expand': {
+                    'requests': 3,
+                    'errors': 1,
+                    'bytes': 512,
+                    'latency': {
+                        'buckets': [(0.005, 0), (0.01, 2), ..., (inf, 3)],
+                        'sum': 0.021,
+                        'count': 3,
+                    },
+                    'cache_hits': 0,
+                    'cache_misses': 0,
+                    'cache_hit_rate': None,
+                    'retries': 0,
+                }}
+
+        Bucket counts are cumulative, like Prometheus histograms.
+        """
+        with self._lock:
+            actions = [(action, _copy_metrics(metrics))
+                       for action, metrics in self._actions.items()]
+
+        snapshot = {}
+        for action, metrics in actions:
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.buckets + (float('inf'),),
+                                    metrics.bucket_counts):
+                cumulative += count
+                buckets.append((bound, cumulative))
+
+            lookups = metrics.cache_hits + metrics.cache_misses
+            hit_rate = metrics.cache_hits / lookups if lookups else None
+
+            snapshot[action] = dict(
+                requests=metrics.requests,
+                errors=metrics.errors,
+                bytes=metrics.nbytes,
+                latency=dict(buckets=buckets, sum=metrics.duration_sum,
+                             count=metrics.requests),
+                cache_hits=metrics.cache_hits,
+                cache_misses=metrics.cache_misses,
+                cache_hit_rate=hit_rate,
+                retries=metrics.retries)
+
+        return snapshot
+
+    def prometheus(self, prefix='yourls'):
+        """Return metrics in the Prometheus text exposition format."""
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def counter(name, help, key):
+            name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} counter'.format(name))
+            for action, metrics in snapshot:
+                lines.append('{}{{action="{}"}} {}'.format(name, action, metrics[key]))
+
+        counter('requests_total', 'Total API requests.', 'requests')
+        counter('request_errors_total', 'API requests that raised an exception.',
+                'errors')
+        counter('response_bytes_total', 'Total size of API responses.', 'bytes')
+        counter('cache_hits_total', 'Results served from cache.', 'cache_hits')
+        counter('cache_misses_total', 'Cache lookups that required a request.',
+                'cache_misses')
+        counter('retries_total', 'Retried API requests.', 'retries')
+
+        name = '{}_request_duration_seconds'.format(prefix)
+        lines.append('# HELP {} API request latency.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for action, metrics in snapshot:
+            latency = metrics['latency']
+            for bound, count in latency['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append('{}_bucket{{action="{}",le="{}"}} {}'.format(
+                    name, action, le, count))
+            lines.append('{}_sum{{action="{}"}} {!r}'.format(
+                name, action, float(latency['sum'])))
+            lines.append('{}_count{{action="{}"}} {}'.format(
+                name, action, latency['count']))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _copy_metrics(metrics):
+    copy = _ActionMetrics(0)
+    for attr in _ActionMetrics.__slots__:
+        value = getattr(metrics, attr)
+        setattr(copy, attr, list(value) if isinstance(value, list) else value)
+    return copy
@@ -0,0 +1,133 @@
+# coding: utf-8
+from __future__ import absolute_import, division, print_function
+
+import threading
+from timeit import default_timer
+
+#: Phases of an API call, in order.
+#:
+#: ``wait``
+#:     Connecting if needed, sending the request, and waiting for the response
+#:     headers.
+#: ``download``
+#:     Reading the response body.
+#: ``decode``
+#:     Decoding JSON.
+#: ``validate``
+#:     Checking the response for HTTP and API errors.
+#: ``construct``
+#:     Creating result objects, e.g. :class:`~yourls.data.ShortenedURL`.
+PHASES = ('wait', 'download', 'decode', 'validate', 'construct')
+
+
+class _Phase(object):
+    __slots__ = ('profiler', 'action', 'phase', 'start')
+
+    def __init__(self, profiler, action, phase):
+        self.profiler = profiler
+        self.action = action
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = default_timer()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.action, self.phase, default_timer() - self.start)
+
+
+class _NullPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class Profiler(object):
+    """Aggregate time spent in each phase of API calls, per action.
+
+    Usually you will call :meth:`~yourls.core.YOURLSClientBase.enable_profiling`
+    instead of creating a profiler directly. Responses are downloaded
+    separately from the headers while profiling, so calls are slightly slower
+    than without profiling.
+
+    Streamed responses (:meth:`~yourls.core.YOURLSAPIMixin.iter_stats`) only
+    record the ``wait`` phase, because the body is read by the caller.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._totals = {}
+
+    def phase(self, action, phase):
+        """Return context manager that records the time spent in `phase`."""
+        return _Phase(self, action, phase)
+
+    def add(self, action, phase, seconds):
+        """Add `seconds` to the total for `phase` of `action`.
+
+        The number of calls for `action` is counted using the ``wait`` phase.
+        """
+        with self._lock:
+            totals = self._totals.setdefault(action, {})
+            totals[phase] = totals.get(phase, 0) + seconds
+            if phase == 'wait':
+                self._calls[action] = self._calls.get(action, 0) + 1
+
+    def reset(self):
+        """Discard all recorded times."""
+        with self._lock:
+            self._calls = {}
+            self._totals = {}
+
+    def summary(self):
+        """Return dictionary of recorded times for each action.
+
+        Example:
+
+            .. code-block:: python
+
+                {'shorturl': {
+                    'calls': 2,
+                    'phases': {'wait': 0.051, 'download': 0.0002, ...},
+                }}
+
+        Times are totals in seconds; divide by ``calls`` for the mean per
+        call. Phases that weren't recorded are omitted.
+        """
+        with self._lock:
+            return dict(
+                (action, dict(calls=self._calls.get(action, 0), phases=dict(totals)))
+                for action, totals in self._totals.items())
+
+    def format(self):
+        """Return summary as a table with the mean time per call of each
+        phase, in milliseconds.
+        """
+        summary = sorted(self.summary().items())
+        phases = [phase for phase in PHASES
+                  if any(phase in s['phases'] for _, s in summary)]
+
+        header = ['action', 'calls'] + phases + ['total']
+        rows = []
+        for action, s in summary:
+            calls = s['calls'] or 1
+            times = [s['phases'].get(phase, 0) / calls * 1000 for phase in phases]
+            row = [str(action), str(s['calls'])]
+            row.extend('{:.3f}'.format(t) for t in times)
+            row.append('{:.3f}'.format(sum(times)))
+            rows.append(row)
+
+        widths = [max(len(row[i]) for row in [header] + rows)
+                  for i in range(len(header))]
+
+        lines = ['  '.join(cell.ljust(w) if i == 0 else cell.rjust(w)
+                           for i, (cell, w) in enumerate(zip(row, widths)))
+                 for row in [header] + rows]
+        lines.insert(1, '  '.join('-' * w for w in widths))
+        return '\n'.join(lines)
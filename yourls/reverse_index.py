@@ -0,0 +1,221 @@
+# coding: utf-8
+"""Local index of short URLs by long URL, for finding out whether a URL has
+already been shortened without calling the API.
+
+The index is stored in an SQLite database. Build it from the link database
+with :func:`build_reverse_index`, and keep it up to date by passing it to
+:meth:`~yourls.core.YOURLSClientBase.enable_reverse_index`.
+"""
+from __future__ import absolute_import, division, print_function
+
+import atexit
+import re
+import sqlite3
+import threading
+import weakref
+
+from six.moves.urllib.parse import urlsplit, urlunsplit
+
+from . import log
+from .data import _json_to_shortened_url, _shortened_url_to_json
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_PERCENT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+_FIELDS = ('keyword', 'shorturl', 'url', 'title', 'date', 'ip', 'clicks')
+
+# Indexes with a batch size, whose queued links are written at exit.
+_batching = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    for index in list(_batching):
+        try:
+            index.flush()
+        except Exception as exc:
+            log.warning('Writing queued links to {path} failed: {exception}',
+                        path=index.path, exception=exc)
+
+
+def normalise_url(url):
+    """Return normalised form of `url`, so that URLs which differ only in
+    insignificant ways are found.
+
+    The scheme and host are lowercased, default ports are removed, an empty
+    path becomes ``/``, and percent-escapes are uppercased. The query string
+    and fragment are kept as they are, because they can change the page.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if parts.hostname is not None:
+        host = parts.hostname
+        if ':' in host:
+            host = '[{}]'.format(host)
+        if port is not None and port != _DEFAULT_PORTS.get(scheme):
+            host = '{}:{}'.format(host, port)
+        userinfo = netloc.rpartition('@')[0]
+        netloc = '{}@{}'.format(userinfo, host) if userinfo else host
+
+    path = parts.path
+    if not path and netloc:
+        path = '/'
+
+    normalised = urlunsplit((scheme, netloc, path, parts.query, parts.fragment))
+    return _PERCENT_ESCAPE.sub(lambda m: m.group(0).upper(), normalised)
+
+
+class ReverseIndex(object):
+    """SQLite index of links by normalised long URL.
+
+    The index can be used by many threads. Links are stored by keyword, so
+    adding a link that is already in the index replaces it.
+
+    Parameters:
+        path: Database file path. It's created if it doesn't exist.
+        batch_size: Number of links :meth:`queue` collects before writing
+            them in one transaction. By default, :meth:`queue` writes links
+            immediately.
+    """
+    def __init__(self, path, batch_size=None):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS links ('
+                'keyword TEXT PRIMARY KEY, normalised_url TEXT NOT NULL, '
+                'shorturl TEXT, url TEXT, title TEXT, date TEXT, ip TEXT, '
+                'clicks INTEGER)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS links_normalised_url '
+                'ON links (normalised_url)')
+        if batch_size is not None:
+            _batching.add(self)
+
+    def add(self, links):
+        """Add or replace :class:`~yourls.data.ShortenedURL` `links`.
+
+        Returns:
+            Number of links added.
+        """
+        rows = []
+        for link in links:
+            urldata = _shortened_url_to_json(link)
+            if link.keyword is None:
+                urldata['keyword'] = link.shorturl.rstrip('/').rsplit('/', 1)[-1]
+            rows.append((normalise_url(link.url),) + tuple(
+                urldata[field] for field in _FIELDS))
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO links (normalised_url, keyword, shorturl, '
+                'url, title, date, ip, clicks) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows)
+        return len(rows)
+
+    def queue(self, links):
+        """Add :class:`~yourls.data.ShortenedURL` `links` in the next batch,
+        or immediately if the index has no `batch_size`.
+
+        Batches are written by the call that fills them, and by
+        :meth:`flush`, which is called before reading from the index, by
+        :meth:`close`, and at interpreter exit. This avoids a transaction for
+        every link when many threads add links. If a batch can't be written,
+        its links are discarded and the exception is raised.
+        """
+        if self.batch_size is None:
+            self.add(links)
+            return
+
+        with self._pending_lock:
+            self._pending.extend(links)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self.add(batch)
+
+    def flush(self):
+        """Write links added with :meth:`queue`."""
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self.add(batch)
+
+    def find(self, url):
+        """Return list of :class:`~yourls.data.ShortenedURL` for long URL
+        `url`, compared using :func:`normalise_url`. The list is empty if
+        `url` isn't in the index.
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT keyword, shorturl, url, title, date, ip, clicks FROM links '
+                'WHERE normalised_url = ? ORDER BY date, keyword',
+                (normalise_url(url),)).fetchall()
+
+        return [_json_to_shortened_url(dict(zip(_FIELDS, row))) for row in rows]
+
+    def __contains__(self, url):
+        self.flush()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM links WHERE normalised_url = ? LIMIT 1',
+                (normalise_url(url),)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+
+    def close(self):
+        """Write queued links and close the database."""
+        try:
+            self.flush()
+        finally:
+            _batching.discard(self)
+            with self._lock:
+                self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build_reverse_index(yourls, path, filter='last', page_size=1000):
+    """Add every link in the database to the reverse index at `path`, using
+    :func:`~yourls.export.iter_links`. Links are added in batches of
+    `page_size`.
+
+    Parameters:
+        yourls: :class:`~yourls.core.YOURLSClient` instance.
+        path: Database file path.
+        filter: Sort order passed to :func:`~yourls.export.iter_links`.
+        page_size: Number of links requested and added at a time.
+
+    Returns:
+        Number of links in the index.
+    """
+    from .export import iter_links
+
+    with ReverseIndex(path) as index:
+        batch = []
+        for link in iter_links(yourls, filter=filter, page_size=page_size):
+            batch.append(link)
+            if len(batch) >= page_size:
+                index.add(batch)
+                batch = []
+        index.add(batch)
+        return len(index)
@@ -0,0 +1,267 @@
+# coding: utf-8
+"""Run CLI commands in a long-running process to avoid startup costs.
+
+``yourls serve`` keeps a warm :class:`~yourls.core.YOURLSClient` listening on a
+Unix socket. When the socket exists, ``yourls`` forwards commands to the server
+instead of importing its dependencies and creating a new client.
+
+This module only imports the standard library at import time, so that
+forwarding a command is fast.
+"""
+from __future__ import absolute_import, division, print_function
+
+import errno
+import json
+import os
+import socket
+import sys
+from contextlib import closing
+
+from . import config
+
+# Commands that don't read from stdin or write files, so their output can be
+# sent back over the socket.
+FORWARDED_COMMANDS = frozenset(['shorten', 'expand', 'url-stats', 'stats', 'db-stats'])
+
+GLOBAL_OPTIONS = ('apiurl', 'signature', 'username', 'password', 'offline-snapshot',
+                  'reverse-index')
+
+# Options that are paths, which are made absolute before forwarding them.
+PATH_OPTIONS = ('offline-snapshot', 'reverse-index')
+
+
+def socket_path():
+    """Return socket path from ``YOURLS_SOCKET`` environment variable, or
+    ``~/.yourls.sock`` by default.
+    """
+    return os.environ.get('YOURLS_SOCKET') or os.path.expanduser('~/.yourls.sock')
+
+
+def _split_args(args):
+    """Split command line arguments into global options, command name, and
+    command arguments. Return :py:data:`None` if there is no command or there
+    are unknown global options (e.g. ``--help``).
+    """
+    options = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if not arg.startswith('-'):
+            return options, arg, args[i + 1:]
+
+        name, sep, value = arg[2:].partition('=')
+        if not arg.startswith('--') or name not in GLOBAL_OPTIONS:
+            return None
+
+        if sep:
+            i += 1
+        elif i + 1 < len(args):
+            value = args[i + 1]
+            i += 2
+        else:
+            return None
+
+        options[name] = value
+
+    return None
+
+
+def _recv_line(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b'\n'):
+            break
+    return b''.join(chunks)
+
+
+def forward(args, path=None):
+    """Run CLI command on a running server.
+
+    Parameters:
+        args: Command line arguments, excluding the program name.
+        path: Socket path. Defaults to :func:`socket_path`.
+
+    Returns:
+        Exit code, or :py:data:`None` if the command can't be forwarded because
+        no server is running or the command isn't supported by the server.
+    """
+    split = _split_args(args)
+    if split is None:
+        return None
+
+    options, command, command_args = split
+    if command not in FORWARDED_COMMANDS:
+        return None
+
+    if path is None:
+        path = socket_path()
+
+    if not os.path.exists(path):
+        return None
+
+    # The server may have been started with a different working directory, so
+    # resolve configuration here. The server ignores its own config files.
+    for name in GLOBAL_OPTIONS:
+        if name not in options:
+            value = config.get_value(name.replace('-', '_'))
+            if value is not None:
+                options[name] = value
+
+    for name in PATH_OPTIONS:
+        if name in options:
+            options[name] = os.path.abspath(options[name])
+
+    server_args = []
+    for name, value in sorted(options.items()):
+        server_args.extend(['--' + name, value])
+    server_args.append(command)
+    server_args.extend(command_args)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with closing(sock):
+        try:
+            sock.connect(path)
+        except socket.error:
+            # Stale socket file, server isn't running.
+            return None
+
+        request = json.dumps(dict(args=server_args)) + '\n'
+        sock.sendall(request.encode('utf-8'))
+        data = _recv_line(sock)
+
+    if not data:
+        sys.stderr.write('Error: yourls server closed the connection.\n')
+        return 1
+
+    response = json.loads(data.decode('utf-8'))
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['exit_code']
+
+
+def run_command(args):
+    """Run CLI command in this process and capture its output.
+
+    Returns:
+        dict with ``exit_code``, ``stdout``, and ``stderr`` keys.
+    """
+    import traceback
+
+    import six
+    from .__main__ import cli
+
+    stdout, stderr = six.StringIO(), six.StringIO()
+    old_stdout, old_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        cli.main(args=args, prog_name='yourls', standalone_mode=True)
+        exit_code = 0
+    except SystemExit as exc:
+        if exc.code is None:
+            exit_code = 0
+        elif isinstance(exc.code, int):
+            exit_code = exc.code
+        else:
+            stderr.write(u'{}\n'.format(exc.code))
+            exit_code = 1
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout, sys.stderr = old_stdout, old_stderr
+
+    return dict(exit_code=exit_code, stdout=stdout.getvalue(),
+                stderr=stderr.getvalue())
+
+
+def make_server(path=None):
+    """Create server listening on Unix socket `path`.
+
+    Requests are handled one at a time, because command output is captured by
+    replacing :py:data:`sys.stdout`.
+
+    A socket file left behind by a server that is no longer running is
+    replaced.
+
+    Raises:
+        socket.error: with :py:data:`errno.EADDRINUSE` if a server is already
+            listening on `path`.
+    """
+    from six.moves import socketserver
+
+    if path is None:
+        path = socket_path()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return
+            request = json.loads(line.decode('utf-8'))
+            with config.ignore_files():
+                response = run_command(request['args'])
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+    _remove_stale_socket(path)
+
+    # Only the current user may connect, as commands include credentials.
+    old_umask = os.umask(0o077)
+    try:
+        return socketserver.UnixStreamServer(path, Handler)
+    finally:
+        os.umask(old_umask)
+
+
+def _remove_stale_socket(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with closing(sock):
+        try:
+            sock.connect(path)
+        except socket.error as exc:
+            if exc.errno == errno.ENOENT:
+                return
+            elif exc.errno != errno.ECONNREFUSED:
+                raise
+        else:
+            raise socket.error(errno.EADDRINUSE,
+                               'yourls server already running on {}'.format(path))
+
+    # Nothing is listening, so the file was left behind by a server that
+    # didn't shut down cleanly.
+    os.remove(path)
+
+
+def serve(path=None):
+    """Handle forwarded commands until interrupted."""
+    serve_forever(make_server(path))
+
+
+def serve_forever(server):
+    """Handle forwarded commands on a server created by :func:`make_server`
+    until interrupted, then remove its socket file.
+    """
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(server.server_address):
+            os.remove(server.server_address)
+
+
+def main():
+    """Console script entry point.
+
+    Forwards the command to a running server, otherwise runs it in-process.
+    """
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    from .__main__ import cli
+    cli(prog_name='yourls')
@@ -0,0 +1,424 @@
+# coding: utf-8
+"""Memory-mapped files of the link database.
+
+:class:`Snapshot` stores all link data, and is used to serve
+:meth:`~yourls.core.YOURLSAPIMixin.expand` and
+:meth:`~yourls.core.YOURLSAPIMixin.url_stats` while the server is unavailable.
+See :meth:`~yourls.core.YOURLSClientBase.enable_offline`.
+
+:class:`KeywordIndex` only stores each keyword's long URL, for resolving large
+numbers of short URLs locally.
+
+Both files contain a header, a table of record offsets, and records sorted by
+keyword, so that a keyword is found with a binary search of the mapped file
+without reading the whole file into memory. Records are read directly from the
+page cache, so processes using the same file share its memory. Files larger
+than memory can be written, because records are sorted in runs on disk.
+"""
+from __future__ import absolute_import, division, print_function
+
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from datetime import datetime
+
+import six
+from six.moves import range
+
+from .data import _json_to_shortened_url, _shortened_url_to_json
+
+MAGIC = b'YRLSSNAP'
+INDEX_MAGIC = b'YRLSKIDX'
+VERSION = 1
+
+# Magic, version, number of records, and creation time.
+_HEADER = struct.Struct('<8sIQd')
+# Offsets are relative to the first record, which follows the offset table.
+_OFFSET = struct.Struct('<Q')
+_KEY_LENGTH = struct.Struct('<H')
+_VALUE_LENGTH = struct.Struct('<I')
+# Input position of records in temporary sorted runs.
+_SEQ = struct.Struct('<Q')
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def _keyword(short):
+    """Return keyword of short URL or keyword `short`."""
+    if '/' in short:
+        return short.rstrip('/').rsplit('/', 1)[-1]
+    return short
+
+
+def _write_run(f, run):
+    for key, seq, value in run:
+        f.write(_KEY_LENGTH.pack(len(key)))
+        f.write(key)
+        f.write(_SEQ.pack(seq))
+        f.write(_VALUE_LENGTH.pack(len(value)))
+        f.write(value)
+
+
+def _read_run(f):
+    f.seek(0)
+    while True:
+        data = f.read(_KEY_LENGTH.size)
+        if not data:
+            return
+        key = f.read(_KEY_LENGTH.unpack(data)[0])
+        seq, = _SEQ.unpack(f.read(_SEQ.size))
+        value = f.read(_VALUE_LENGTH.unpack(f.read(_VALUE_LENGTH.size))[0])
+        yield key, seq, value
+
+
+def _sorted_records(records, run_size, directory):
+    """Sort ``(key, value)`` records, keeping the last value for each key.
+
+    At most `run_size` records are held in memory. Larger inputs are sorted
+    in runs, which are written to temporary files in `directory` and merged.
+    """
+    runs = []
+    try:
+        run = []
+        for seq, (key, value) in enumerate(records):
+            run.append((key, seq, value))
+            if len(run) >= run_size:
+                run.sort()
+                f = tempfile.TemporaryFile(dir=directory)
+                runs.append(f)
+                _write_run(f, run)
+                run = []
+        run.sort()
+
+        merged = heapq.merge(run, *[_read_run(f) for f in runs])
+        previous = None
+        for key, _, value in merged:
+            if previous is not None and previous[0] != key:
+                yield previous
+            previous = key, value
+        if previous is not None:
+            yield previous
+    finally:
+        for f in runs:
+            f.close()
+
+
+def _write_table(path, records, magic, run_size=1000000):
+    """Write sorted table of ``(key, value)`` byte strings to `path`,
+    replacing it atomically. Later records replace earlier records with the
+    same key.
+
+    Returns:
+        Number of records written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    count = 0
+    offset = 0
+    with tempfile.TemporaryFile(dir=directory) as offsets, \
+            tempfile.TemporaryFile(dir=directory) as data:
+        for key, value in _sorted_records(records, run_size, directory):
+            offsets.write(_OFFSET.pack(offset))
+            data.write(_KEY_LENGTH.pack(len(key)))
+            data.write(key)
+            data.write(_VALUE_LENGTH.pack(len(value)))
+            data.write(value)
+            offset += _KEY_LENGTH.size + len(key) + _VALUE_LENGTH.size + len(value)
+            count += 1
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(magic, VERSION, count, time.time()))
+            for section in (offsets, data):
+                section.seek(0)
+                shutil.copyfileobj(section, f)
+
+    _replace(tmp_path, path)
+    return count
+
+
+class _Table(object):
+    """Read table written by :func:`_write_table` using :py:mod:`mmap`.
+    Subclasses set the expected `_magic` and a `_kind` for error messages.
+    """
+    _magic = None
+    _kind = None
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file.
+                self._mmap = None
+
+        header = None
+        if self._mmap is not None and len(self._mmap) >= _HEADER.size:
+            header = _HEADER.unpack_from(self._mmap)
+
+        if header is None or header[:2] != (self._magic, VERSION):
+            self.close()
+            raise ValueError('{} is not a {} file.'.format(path, self._kind))
+
+        _, _, self._count, created = header
+        self._records_start = _HEADER.size + _OFFSET.size * self._count
+        self.created = datetime.fromtimestamp(created)
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, index):
+        """Return key of record `index` and the offset of its value."""
+        mm = self._mmap
+        offset, = _OFFSET.unpack_from(mm, _HEADER.size + _OFFSET.size * index)
+        offset += self._records_start
+        length, = _KEY_LENGTH.unpack_from(mm, offset)
+        start = offset + _KEY_LENGTH.size
+        return mm[start:start + length], start + length
+
+    def _value(self, offset):
+        mm = self._mmap
+        length, = _VALUE_LENGTH.unpack_from(mm, offset)
+        start = offset + _VALUE_LENGTH.size
+        return mm[start:start + length]
+
+    def _value_view(self, offset):
+        """Like :meth:`_value`, but return a view of the mapped file."""
+        length, = _VALUE_LENGTH.unpack_from(self._mmap, offset)
+        start = offset + _VALUE_LENGTH.size
+        if six.PY2:
+            return buffer(self._mmap, start, length)  # noqa: F821
+        return memoryview(self._mmap)[start:start + length]
+
+    def _find(self, key):
+        """Return offset of value for `key`, or :py:data:`None`."""
+        # This is the hot loop for lookups, so _key is inlined.
+        mm = self._mmap
+        unpack_offset = _OFFSET.unpack_from
+        unpack_length = _KEY_LENGTH.unpack_from
+        offset_size = _OFFSET.size
+        length_size = _KEY_LENGTH.size
+        table = _HEADER.size
+        records = self._records_start
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = records + unpack_offset(mm, table + offset_size * mid)[0]
+            start = offset + length_size
+            end = start + unpack_length(mm, offset)[0]
+            mid_key = mm[start:end]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return end
+        return None
+
+    def find(self, key):
+        """Return value for `key`, or :py:data:`None` if it isn't found."""
+        offset = self._find(key)
+        if offset is None:
+            return None
+        return self._value(offset)
+
+    def items(self):
+        """Iterate over ``(key, value)`` pairs in key order."""
+        for index in range(self._count):
+            key, offset = self._key(index)
+            yield key, self._value(offset)
+
+    def close(self):
+        """Unmap the file."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Snapshot(_Table):
+    """Read-only snapshot written by :func:`write_snapshot`.
+
+    Parameters:
+        path: Snapshot file path.
+
+    Raises:
+        ValueError: `path` isn't a snapshot file.
+
+    .. attribute:: created
+
+       :py:class:`~datetime.datetime` the snapshot was written.
+    """
+    _magic = MAGIC
+    _kind = 'snapshot'
+
+    def get(self, short):
+        """Return link for short URL or keyword `short`.
+
+        Returns:
+            :class:`~yourls.data.ShortenedURL` with
+            :attr:`~yourls.data.ShortenedURL.stale` set, or :py:data:`None` if
+            `short` isn't in the snapshot.
+        """
+        keyword = _keyword(short)
+        value = self.find(keyword.encode('utf-8'))
+        if value is None:
+            return None
+        return self._to_link(keyword, value)
+
+    def _to_link(self, keyword, value):
+        link = _json_to_shortened_url(json.loads(value.decode('utf-8')))
+        link.keyword = keyword
+        link.stale = True
+        return link
+
+    def __contains__(self, short):
+        return self.find(_keyword(short).encode('utf-8')) is not None
+
+    def __iter__(self):
+        """Iterate over links in keyword order."""
+        for key, value in self.items():
+            yield self._to_link(key.decode('utf-8'), value)
+
+
+class KeywordIndex(_Table):
+    """Read-only keyword to long URL index written by :func:`write_index`.
+
+    Lookups are a binary search of the mapped file, so they take
+    O(log n) time and don't read the index into memory. The file can be
+    opened by many processes at once.
+
+    Parameters:
+        path: Index file path.
+
+    Raises:
+        ValueError: `path` isn't an index file.
+
+    .. attribute:: created
+
+       :py:class:`~datetime.datetime` the index was written.
+    """
+    _magic = INDEX_MAGIC
+    _kind = 'keyword index'
+
+    def get(self, short, default=None):
+        """Return long URL for short URL or keyword `short`, or `default` if
+        it isn't in the index.
+        """
+        offset = self._find(_keyword(short).encode('utf-8'))
+        if offset is None:
+            return default
+        return self._value(offset).decode('utf-8')
+
+    def get_bytes(self, short):
+        """Like :meth:`get`, but return the UTF-8 encoded URL without copying
+        it, as a :py:class:`memoryview` of the mapped file, or
+        :py:data:`None`. Views must be released before the index is closed.
+        """
+        offset = self._find(_keyword(short).encode('utf-8'))
+        if offset is None:
+            return None
+        return self._value_view(offset)
+
+    def __contains__(self, short):
+        return self._find(_keyword(short).encode('utf-8')) is not None
+
+    def __iter__(self):
+        """Iterate over ``(keyword, url)`` pairs in keyword order."""
+        for key, value in self.items():
+            yield key.decode('utf-8'), value.decode('utf-8')
+
+
+def write_snapshot(path, links):
+    """Write snapshot of `links` to `path`.
+
+    The new snapshot replaces any existing file at `path` atomically, so
+    processes that have the old snapshot open can keep using it.
+
+    Parameters:
+        path: Snapshot file path.
+        links: Iterable of :class:`~yourls.data.ShortenedURL`.
+
+    Returns:
+        Number of links written.
+    """
+    def records():
+        for link in links:
+            keyword = link.keyword or _keyword(link.shorturl)
+            value = json.dumps(_shortened_url_to_json(link), separators=(',', ':'))
+            yield keyword.encode('utf-8'), value.encode('utf-8')
+
+    return _write_table(path, records(), MAGIC)
+
+
+def build_snapshot(yourls, path, filter='last', page_size=1000):
+    """Write snapshot of every link in the database to `path`, using
+    :func:`~yourls.export.iter_links`.
+
+    Parameters:
+        yourls: :class:`~yourls.core.YOURLSClient` instance.
+        path: Snapshot file path.
+        filter: Sort order passed to :func:`~yourls.export.iter_links`.
+        page_size: Number of links requested per ``stats`` call.
+
+    Returns:
+        Number of links written.
+    """
+    from .export import iter_links
+
+    links = iter_links(yourls, filter=filter, page_size=page_size)
+    return write_snapshot(path, links)
+
+
+def write_index(path, links):
+    """Write keyword index of `links` to `path`.
+
+    The new index replaces any existing file at `path` atomically, so
+    processes that have the old index open can keep using it.
+
+    Parameters:
+        path: Index file path.
+        links: Iterable of :class:`~yourls.data.ShortenedURL`, or of
+            ``(keyword, url)`` tuples.
+
+    Returns:
+        Number of links written.
+    """
+    def records():
+        for link in links:
+            if isinstance(link, tuple):
+                keyword, url = link
+            else:
+                keyword, url = link.keyword or _keyword(link.shorturl), link.url
+            yield keyword.encode('utf-8'), url.encode('utf-8')
+
+    return _write_table(path, records(), INDEX_MAGIC)
+
+
+def build_index(yourls, path, filter='last', page_size=1000):
+    """Write keyword index of every link in the database to `path`, using
+    :func:`~yourls.export.iter_links`.
+
+    Parameters:
+        yourls: :class:`~yourls.core.YOURLSClient` instance.
+        path: Index file path.
+        filter: Sort order passed to :func:`~yourls.export.iter_links`.
+        page_size: Number of links requested per ``stats`` call.
+
+    Returns:
+        Number of links written.
+    """
+    from .export import iter_links
+
+    links = iter_links(yourls, filter=filter, page_size=page_size)
+    return write_index(path, links)
@@ -0,0 +1,384 @@
+# coding: utf-8
+"""Transports send API requests for :class:`~yourls.core.YOURLSClientBase`.
+
+The default :class:`RequestsTransport` uses :py:mod:`requests`, and
+:class:`HTTPXTransport` supports HTTP/2. To use a different HTTP library,
+subclass :class:`Transport` and pass an instance to the client:
+
+.. code-block:: python
+
+    yourls = YOURLSClient(apiurl, signature='6f344c2a8p', transport=transport)
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import threading
+import weakref
+
+import requests
+import requests.adapters
+from requests.structures import CaseInsensitiveDict
+
+
+class Transport(object):
+    """Interface for sending API requests."""
+
+    def send(self, method, url, params=None, data=None, stream=False, timeout=None):
+        """Send HTTP request.
+
+        Parameters:
+            method: ``'GET'`` or ``'POST'``.
+            url: Request URL, which may already include a query string.
+            params: Optional dictionary of query parameters to add to `url`.
+                Parameters with value :py:data:`None` are omitted.
+            data: Optional dictionary of form parameters to send in the body.
+            stream: If true, return as soon as the headers have been
+                received. The body is read with ``iter_content``.
+            timeout: Seconds to wait for the server, or :py:data:`None` for
+                the transport's default. The client only passes it when it's
+                set, e.g. for background refreshes of cached results.
+
+        Returns:
+            :class:`requests.Response` or :class:`TransportResponse`.
+
+        Raises:
+            requests.exceptions.RequestException: Connection errors and
+                timeouts should be raised as the equivalent :py:mod:`requests`
+                exceptions, so that callers can handle every transport the
+                same way.
+        """
+        raise NotImplementedError
+
+    def send_query(self, url, query, stream=False, timeout=None):
+        """Send GET request to `url` with an already encoded query string.
+
+        The client calls this instead of :meth:`send` for GET requests, which
+        are always sent to the same URL. Transports can override it to reuse
+        the parts of the request that don't change. By default, :meth:`send`
+        is called.
+
+        Parameters:
+            url: Request URL, which may already include a query string.
+            query: URL-encoded query string to add to `url`.
+            stream: See :meth:`send`.
+            timeout: See :meth:`send`.
+        """
+        separator = '&' if '?' in url else '?'
+        kwargs = {} if timeout is None else dict(timeout=timeout)
+        return self.send('GET', url + separator + query, stream=stream, **kwargs)
+
+    def close(self):
+        """Close connections."""
+
+
+class _RequestTemplate(object):
+    """Prepared request and environment settings for a URL."""
+    __slots__ = ('prefix', 'headers', 'cookies', 'hooks', 'settings')
+
+    def __init__(self, session, url):
+        prepared = session.prepare_request(requests.Request('GET', url))
+        self.prefix = prepared.url + ('&' if '?' in prepared.url else '?')
+        self.headers = prepared.headers
+        self.cookies = prepared._cookies
+        self.hooks = prepared.hooks
+        settings = session.merge_environment_settings(
+            prepared.url, {}, None, None, None)
+        del settings['stream']
+        self.settings = settings
+
+    def prepare(self, query):
+        request = requests.PreparedRequest()
+        request.method = 'GET'
+        request.url = self.prefix + query
+        request.headers = self.headers.copy()
+        request._cookies = self.cookies
+        request.body = None
+        request.hooks = self.hooks
+        return request
+
+
+class _SessionCloser(object):
+    """Close a per-thread session when the thread exits, which discards its
+    thread-local data.
+    """
+    __slots__ = ('session',)
+
+    def __init__(self, session):
+        self.session = session
+
+    def __del__(self):
+        self.session.close()
+
+
+class RequestsTransport(Transport):
+    """Send requests using a :class:`requests.Session`.
+
+    A session can be shared by many threads: its connection pool is
+    thread-safe, and only one thread uses each connection at a time. By
+    default, the pool keeps 10 connections per host, so with more threads
+    than that, connections are closed and reopened. Set `pool_size` to the
+    number of threads to avoid this, or use `per_thread` sessions.
+
+    Parameters:
+        session: Optional :class:`requests.Session`, used for connection
+            pooling. A new session is created by default.
+        pool_size: Optional maximum number of connections kept open per host.
+            Mounts a :class:`requests.adapters.HTTPAdapter` for ``http://``
+            and ``https://`` URLs.
+        per_thread: If true, create a separate session for each thread that
+            sends requests, instead of sharing one. Each session is closed
+            when its thread exits. Can't be used with `session`.
+
+    Raises:
+        TypeError: `per_thread` is true and `session` was passed.
+
+    GET requests to the same URL reuse a request prepared by the session,
+    including its headers, authentication and environment settings such as
+    proxies, so only the query string is encoded for each request. Call
+    :meth:`clear_templates` after changing these on the session. Sessions
+    with cookies prepare every request.
+
+    .. attribute:: session
+
+       :class:`requests.Session` used to send requests. Mount adapters on it
+       to configure connection pool sizes or retries. With `per_thread`
+       sessions, this is the session for the current thread.
+    """
+    def __init__(self, session=None, pool_size=None, per_thread=False):
+        if per_thread and session is not None:
+            raise TypeError('session cannot be passed with per_thread=True.')
+
+        self.pool_size = pool_size
+        self.per_thread = per_thread
+        self._local = threading.local()
+        # Per-thread sessions are closed when their thread exits, so only
+        # sessions that are still in use are kept here.
+        self._sessions = weakref.WeakSet()
+        self._lock = threading.Lock()
+        # Request templates by session, then URL.
+        self._templates = weakref.WeakKeyDictionary()
+        if not per_thread:
+            self._shared = self._create_session(session)
+
+    def _create_session(self, session=None):
+        if session is None:
+            session = requests.Session()
+        if self.pool_size is not None:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    @property
+    def session(self):
+        if not self.per_thread:
+            return self._shared
+        try:
+            return self._local.session
+        except AttributeError:
+            session = self._local.session = self._create_session()
+            self._local.closer = _SessionCloser(session)
+            return session
+
+    def send(self, method, url, params=None, data=None, stream=False, timeout=None):
+        return self.session.request(method, url, params=params, data=data,
+                                    stream=stream, timeout=timeout)
+
+    def send_query(self, url, query, stream=False, timeout=None):
+        session = self.session
+        if session.cookies:
+            # The Cookie header depends on the session's cookie jar.
+            return Transport.send_query(self, url, query, stream=stream,
+                                        timeout=timeout)
+
+        try:
+            template = self._templates[session][url]
+        except KeyError:
+            template = _RequestTemplate(session, url)
+            with self._lock:
+                self._templates.setdefault(session, {})[url] = template
+
+        return session.send(template.prepare(query), stream=stream,
+                            timeout=timeout, **template.settings)
+
+    def clear_templates(self):
+        """Prepare the next request to each URL again, e.g. after changing
+        the session's headers or authentication.
+        """
+        with self._lock:
+            self._templates.clear()
+
+    def close(self):
+        """Close all sessions."""
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+
+
+class HTTPXTransport(Transport):
+    """Send requests using `HTTPX`_, which supports HTTP/2.
+
+    With HTTP/2, concurrent requests from many threads are multiplexed over a
+    few connections, instead of each in-flight request needing its own
+    connection. Requires Python 3 and the ``http2`` extra:
+    ``pip install yourls[http2]``.
+
+    Requests are sent by an :class:`httpx.AsyncClient` running in a
+    background thread, because HTTPX's synchronous HTTP/2 implementation
+    isn't safe to share between threads.
+
+    Parameters:
+        http2: Use HTTP/2 if the server supports it. For ``https`` URLs, this
+            is negotiated during the TLS handshake.
+        http1: Allow HTTP/1.1. Set to :py:data:`False` to use HTTP/2 without
+            TLS, if the server supports it.
+        client: Optional :class:`httpx.AsyncClient`, in which case the other
+            parameters are ignored.
+        kwargs: Passed to :class:`httpx.AsyncClient`, e.g. ``limits`` or
+            ``timeout``.
+
+    .. attribute:: client
+
+       :class:`httpx.AsyncClient` used to send requests.
+
+    .. _HTTPX: https://www.python-httpx.org
+    """
+    def __init__(self, http2=True, http1=True, client=None, **kwargs):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                'HTTPXTransport requires httpx. Install yourls[http2].')
+
+        import asyncio
+
+        self._httpx = httpx
+        self._asyncio = asyncio
+        if client is None:
+            client = httpx.AsyncClient(http1=http1, http2=http2, **kwargs)
+        self.client = client
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='yourls-httpx')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, coroutine):
+        """Run `coroutine` in the event loop thread and return its result."""
+        httpx = self._httpx
+        future = self._asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result()
+        except httpx.TimeoutException as exc:
+            raise requests.Timeout(exc)
+        except httpx.TransportError as exc:
+            raise requests.ConnectionError(exc)
+
+    def _iter_chunks(self, response):
+        chunks = response.aiter_bytes()
+        while True:
+            # run_coroutine_threadsafe needs a coroutine, not an awaitable.
+            step = self._asyncio.wait_for(chunks.__anext__(), None)
+            try:
+                yield self._run(step)
+            except StopAsyncIteration:  # noqa: F821
+                return
+
+    def send(self, method, url, params=None, data=None, stream=False, timeout=None):
+        if params is not None:
+            params = dict((k, v) for k, v in params.items() if v is not None)
+        if data is not None:
+            data = dict((k, v) for k, v in data.items() if v is not None)
+
+        kwargs = {} if timeout is None else dict(timeout=timeout)
+        request = self.client.build_request(method, url, params=params, data=data,
+                                            **kwargs)
+        response = self._run(self.client.send(request, stream=stream))
+
+        if stream:
+            return TransportResponse(
+                response.status_code, response.headers,
+                chunks=self._iter_chunks(response), url=str(response.url),
+                reason=response.reason_phrase,
+                close=lambda: self._run(response.aclose()))
+
+        return TransportResponse(
+            response.status_code, response.headers, response.content,
+            url=str(response.url), reason=response.reason_phrase)
+
+    def close(self):
+        self._run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class TransportResponse(object):
+    """Response for transports that don't use :py:mod:`requests`.
+
+    Implements the parts of the :class:`requests.Response` interface used by
+    the client.
+
+    Parameters:
+        status_code: HTTP status code.
+        headers: Dictionary of response headers.
+        content: Response body as :py:class:`bytes`, or :py:data:`None` if
+            `chunks` is given.
+        chunks: Iterable of :py:class:`bytes` for streamed responses.
+        url: Request URL, used in error messages.
+        reason: HTTP reason phrase.
+        close: Optional callable to release the connection.
+    """
+    def __init__(self, status_code, headers, content=None, chunks=None, url=None,
+                 reason=None, close=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.url = url
+        self.reason = reason
+        self._content = content
+        self._chunks = chunks
+        self._close = close
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b''.join(self._chunks)
+            self.close()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def iter_content(self, chunk_size=1):
+        if self._content is not None:
+            content = self._content
+            for i in range(0, len(content), chunk_size):
+                yield content[i:i + chunk_size]
+        else:
+            for chunk in self._chunks:
+                yield chunk
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            message = '{} {} Error: {} for url: {}'.format(
+                self.status_code, kind, self.reason, self.url)
+            raise requests.HTTPError(message, response=self)
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None